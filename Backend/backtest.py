@@ -0,0 +1,227 @@
+# backend/backtest.py
+"""
+Walk-forward backtesting of the two-stage model over HMI_CLEANED_DATA.
+
+A random train_test_split mixes future days into the training set. Here
+every window trains on the days before t and scores the next `horizon_days`
+(t .. t+k), then t moves forward by `horizon_days`:
+
+- the matrix, targets and DATE column are sorted by time once and written
+  as .npy files that every worker process memory-maps; since windows are
+  contiguous in time, each one is just a pair of [lo:hi] slices (views) -
+  nothing is re-sliced from a DataFrame or copied per window
+- windows are independent, so they are fitted in a process pool
+- per-window metrics are stored column-wise in one small JSON file
+  (backtest_results.json in MODEL_DIR) that /model-performance serves,
+  together with metrics pooled over every out-of-sample day. The file
+  records the sha256 of the CSV and of the Random Forest pickle active
+  when it was written, so results older than the served model show up
+  as stale
+
+Run from the backend directory:  python train_models.py backtest
+"""
+import json
+import os
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from model_registry import MODEL_DIR, file_sha256, read_active_version, resolve_model_dir
+
+RESULTS_FILE = 'backtest_results.json'
+RESULTS_PATH = os.path.join(MODEL_DIR, RESULTS_FILE)
+DATA_DIR = os.path.join('cache', 'backtest')
+
+# Same settings as train_flare_models
+RF_PARAMS = dict(n_estimators=100, max_depth=10, min_samples_split=5, min_samples_leaf=2,
+                 class_weight='balanced', random_state=42)
+ISO_PARAMS = dict(contamination=0.1, random_state=42)
+GATE_PROBABILITY = 0.3
+ANOMALY_THRESHOLD = -0.1
+
+WINDOW_COLUMNS = ('train_start', 'test_start', 'test_end', 'n_train', 'n_test', 'positives',
+                  'predicted_positive', 'accuracy', 'precision', 'recall', 'f1_score', 'auc_roc',
+                  'brier', 'anomalies', 'fit_seconds')
+
+_shared = {}
+
+
+def prepare_data(data_dir=DATA_DIR, csv_path='HMI_CLEANED_DATA.csv'):
+    """Time-sorted X / targets / DATE as .npy for the workers to mmap; returns the row count"""
+    import data_cache
+    from train_models import FEATURE_COLUMNS, SIGNIFICANT_CLASSES
+
+    os.makedirs(data_dir, exist_ok=True)
+    dates = np.asarray(data_cache.load_columns(['DATE'], csv_path)['DATE'])
+    order = np.argsort(dates, kind='stable')
+    X = data_cache.load_feature_matrix(FEATURE_COLUMNS, csv_path)[order]
+    codes, categories = data_cache.load_flare_categories(csv_path)
+    significant = np.isin(codes, [categories.index(c) for c in SIGNIFICANT_CLASSES])[order]
+    np.save(os.path.join(data_dir, 'X.npy'), np.ascontiguousarray(X))
+    np.save(os.path.join(data_dir, 'y.npy'), significant.astype(np.int8))
+    np.save(os.path.join(data_dir, 'dates.npy'), dates[order])
+    return len(order)
+
+
+def make_windows(dates, train_days=730, horizon_days=30, window='expanding'):
+    """
+    [(train_lo, test_lo, test_hi)] row ranges over time-sorted epoch-second
+    dates: train on [train_lo, test_lo), score [test_lo, test_hi).
+    'expanding' keeps all history, 'sliding' only the last train_days.
+    """
+    day = 86400
+    windows = []
+    t = dates[0] + train_days * day
+    while t <= dates[-1]:
+        test_lo, test_hi = np.searchsorted(dates, [t, t + horizon_days * day])
+        train_lo = 0 if window == 'expanding' else int(np.searchsorted(dates, t - train_days * day))
+        if test_hi > test_lo:
+            windows.append((int(train_lo), int(test_lo), int(test_hi)))
+        t += horizon_days * day
+    return windows
+
+
+def _init_worker(data_dir):
+    warnings.filterwarnings('ignore')
+    for name in ('X', 'y', 'dates'):
+        _shared[name] = np.load(os.path.join(data_dir, f'{name}.npy'), mmap_mode='r')
+
+
+def _safe(metric, *args, **kwargs):
+    try:
+        return float(metric(*args, **kwargs))
+    except ValueError:
+        return float('nan')
+
+
+def evaluate_window(train_lo, test_lo, test_hi):
+    """Fit on one window and score its out-of-sample days (runs in a worker)"""
+    from sklearn.ensemble import RandomForestClassifier, IsolationForest
+    from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, roc_auc_score
+
+    start = time.perf_counter()
+    X, y, dates = _shared['X'], _shared['y'], _shared['dates']
+    X_train, y_train = X[train_lo:test_lo], np.asarray(y[train_lo:test_lo])
+    X_test, y_test = X[test_lo:test_hi], np.asarray(y[test_lo:test_hi])
+
+    if y_train.min() == y_train.max():
+        # One class only (no significant flares yet): predict the constant base rate
+        probabilities = np.full(len(y_test), float(y_train[0]))
+        anomalies = np.zeros(len(y_test), dtype=bool)
+    else:
+        rf = RandomForestClassifier(n_jobs=1, **RF_PARAMS).fit(X_train, y_train)
+        probabilities = rf.predict_proba(X_test)[:, 1]
+        anomalies = np.zeros(len(y_test), dtype=bool)
+        gated = probabilities > GATE_PROBABILITY
+        if gated.any():
+            iso = IsolationForest(**ISO_PARAMS).fit(X_train[y_train == 1])
+            anomalies[gated] = iso.decision_function(X_test[gated]) < ANOMALY_THRESHOLD
+
+    predictions = (probabilities > 0.5).astype(int)
+    row = {
+        'train_start': int(dates[train_lo]), 'test_start': int(dates[test_lo]), 'test_end': int(dates[test_hi - 1]),
+        'n_train': test_lo - train_lo, 'n_test': test_hi - test_lo,
+        'positives': int(y_test.sum()), 'predicted_positive': int(predictions.sum()),
+        'accuracy': float(accuracy_score(y_test, predictions)),
+        'precision': float(precision_score(y_test, predictions, zero_division=0)),
+        'recall': float(recall_score(y_test, predictions, zero_division=0)),
+        'f1_score': float(f1_score(y_test, predictions, zero_division=0)),
+        'auc_roc': _safe(roc_auc_score, y_test, probabilities) if 0 < y_test.sum() < len(y_test) else float('nan'),
+        'brier': float(np.mean((probabilities - y_test) ** 2)),
+        'anomalies': int(anomalies.sum()),
+        'fit_seconds': time.perf_counter() - start,
+    }
+    return row, probabilities
+
+
+def _pooled_metrics(y, probabilities):
+    from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, roc_auc_score
+
+    predictions = (probabilities > 0.5).astype(int)
+    return {
+        'accuracy': float(accuracy_score(y, predictions)),
+        'precision': float(precision_score(y, predictions, zero_division=0)),
+        'recall': float(recall_score(y, predictions, zero_division=0)),
+        'f1_score': float(f1_score(y, predictions, zero_division=0)),
+        'auc_roc': _safe(roc_auc_score, y, probabilities),
+        'brier': float(np.mean((probabilities - y) ** 2)),
+    }
+
+
+def _round(value, digits=4):
+    if isinstance(value, float):
+        return None if np.isnan(value) else round(value, digits)
+    return value
+
+
+def _active_rf_sha256(model_dir=MODEL_DIR):
+    path = os.path.join(resolve_model_dir(model_dir), 'rf_significance_model.pkl')
+    return file_sha256(path) if os.path.exists(path) else None
+
+
+def run_backtest(train_days=730, horizon_days=30, window='expanding', n_workers=None,
+                 csv_path='HMI_CLEANED_DATA.csv', results_path=RESULTS_PATH, data_dir=DATA_DIR,
+                 model_dir=MODEL_DIR):
+    """Walk-forward evaluation; writes results_path and returns the results dict"""
+    import data_cache
+
+    n_workers = n_workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    n_rows = prepare_data(data_dir, csv_path)
+    dates = np.load(os.path.join(data_dir, 'dates.npy'))
+    y = np.load(os.path.join(data_dir, 'y.npy'))
+    windows = make_windows(dates, train_days, horizon_days, window)
+    print(f"🔧 Walk-forward backtest: {len(windows)} {window} windows "
+          f"({train_days}d min training, {horizon_days}d horizon) over {n_rows} days, {n_workers} workers")
+
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker, initargs=(data_dir,)) as pool:
+        outcomes = list(pool.map(evaluate_window, *zip(*windows), chunksize=max(1, len(windows) // (4 * n_workers))))
+
+    rows = [row for row, _ in outcomes]
+    tested = np.concatenate([np.arange(test_lo, test_hi) for _, test_lo, test_hi in windows])
+    probabilities = np.concatenate([p for _, p in outcomes])
+    elapsed = time.perf_counter() - start
+
+    results = {
+        'evaluation': 'walk_forward',
+        'generated_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        # What the numbers belong to: the data, and the served model trained with the same settings
+        'data_sha256': data_cache.ensure_columnar_cache(csv_path)['source']['sha256'],
+        'rf_sha256': _active_rf_sha256(model_dir),
+        'model_version': read_active_version(model_dir),
+        'params': {'train_days': train_days, 'horizon_days': horizon_days, 'window': window,
+                   'rf': RF_PARAMS, 'iso': ISO_PARAMS},
+        'summary': {
+            'windows': len(windows),
+            'out_of_sample_days': int(len(tested)),
+            'significant_flares': int(y[tested].sum()),
+            'first_test_day': time.strftime('%Y-%m-%d', time.gmtime(dates[tested[0]])),
+            'last_test_day': time.strftime('%Y-%m-%d', time.gmtime(dates[tested[-1]])),
+            'elapsed_seconds': round(elapsed, 2),
+            **{name: _round(value) for name, value in _pooled_metrics(y[tested], probabilities).items()},
+        },
+        # Column-wise: one list per metric, one entry per window (dates are epoch seconds)
+        'windows': {column: [_round(row[column]) for row in rows] for column in WINDOW_COLUMNS},
+    }
+
+    os.makedirs(os.path.dirname(results_path) or '.', exist_ok=True)
+    with open(results_path + '.tmp', 'w') as f:
+        json.dump(results, f, separators=(',', ':'))
+    os.replace(results_path + '.tmp', results_path)
+
+    summary = results['summary']
+    print(f"✅ Backtest finished in {elapsed:.1f}s -> {results_path}")
+    print(f"   Out-of-sample: AUC {summary['auc_roc']}, precision {summary['precision']}, "
+          f"recall {summary['recall']}, F1 {summary['f1_score']}")
+    return results
+
+
+def load_backtest_results(results_path=RESULTS_PATH):
+    """Parsed results file, or None if no backtest has been run"""
+    try:
+        with open(results_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
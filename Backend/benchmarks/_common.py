@@ -0,0 +1,198 @@
+# backend/benchmarks/_common.py
+"""Shared helpers for the offline backend benchmarks"""
+import os
+import sys
+import time
+import contextlib
+import io
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_backend():
+    """Make the backend modules importable and run from the backend directory
+    (model paths such as 'models/...' are relative to it)"""
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+    os.chdir(BACKEND_DIR)
+
+
+@contextlib.contextmanager
+def quiet():
+    """Silence the emoji progress prints while timing"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def best_of(fn, repeat=5, number=1):
+    """Best wall time in seconds for `number` calls of fn, over `repeat` runs"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def load_feature_matrix(n_rows=None):
+    """HMI feature rows from HMI_CLEANED_DATA.csv, tiled up to n_rows"""
+    import numpy as np
+    import pandas as pd
+    with quiet():
+        import model_utils
+
+    df = pd.read_csv(os.path.join(BACKEND_DIR, "HMI_CLEANED_DATA.csv"))
+    matrix = df[model_utils.feature_names].to_numpy(dtype=np.float64)
+    if n_rows is None:
+        return matrix
+    reps = -(-n_rows // len(matrix))
+    return np.tile(matrix, (reps, 1))[:n_rows]
+
+
+def print_table(headers, rows):
+    widths = [max(len(str(h)), *(len(str(r[i])) for r in rows)) for i, h in enumerate(headers)]
+    print("  ".join(str(h).rjust(w) for h, w in zip(headers, widths)))
+    for r in rows:
+        print("  ".join(str(v).rjust(w) for v, w in zip(r, widths)))
+
+
+def free_port():
+    import socket
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextlib.contextmanager
+def uvicorn_server(env=None, extra_args=(), startup_timeout=60, return_process=False, command=None):
+    """Run `uvicorn main:app` (or `python <command>`, which must accept the same
+    --host/--port/--log-level options) in a subprocess and yield its base URL
+    (or (base_url, Popen) with return_process=True)"""
+    import subprocess
+    import urllib.request
+
+    port = free_port()
+    # Keep benchmark servers offline unless a scenario opts back in
+    proc_env = dict(os.environ, XRAY_INGEST="0", DONKI_POLL="0")
+    proc_env.update(env or {})
+    proc = subprocess.Popen(
+        [sys.executable, *(command or ("-m", "uvicorn", "main:app")), "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning", *extra_args],
+        cwd=BACKEND_DIR, env=proc_env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.time() + startup_timeout
+        while True:
+            try:
+                urllib.request.urlopen(base_url + "/", timeout=1).read()
+                break
+            except Exception:
+                if proc.poll() is not None or time.time() > deadline:
+                    raise RuntimeError("uvicorn did not start")
+                time.sleep(0.1)
+        yield (base_url, proc) if return_process else base_url
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def percentile(values, q):
+    import numpy as np
+    return float(np.percentile(values, q)) if len(values) else float("nan")
+
+
+class StubUpstream:
+    """
+    Local stand-in for the NASA DONKI / NOAA SWPC APIs.
+    `routes` maps a path to a callable(query: dict) -> JSON-serialisable body,
+    or (status, body) to answer with another HTTP status.
+    Counts calls per path and can add a fixed delay to every response.
+    """
+
+    def __init__(self, routes, delay=0.0):
+        import threading
+        from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+        from urllib.parse import urlparse, parse_qs
+
+        self.routes = routes
+        self.delay = delay
+        self.calls = {path: 0 for path in routes}
+        lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                import json
+                url = urlparse(self.path)
+                route = stub.routes.get(url.path)
+                if route is None:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                with lock:
+                    stub.calls[url.path] += 1
+                if stub.delay:
+                    time.sleep(stub.delay)
+                result = route({k: v[0] for k, v in parse_qs(url.query).items()})
+                status, result = result if isinstance(result, tuple) else (200, result)
+                body = json.dumps(result).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def process_rss_mb(pid):
+    """Resident set size of a process in MB (Linux /proc)"""
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def child_pids(pid):
+    """Direct children of a process (Linux /proc)"""
+    children = []
+    for task in os.listdir(f"/proc/{pid}/task"):
+        with open(f"/proc/{pid}/task/{task}/children") as f:
+            children.extend(int(p) for p in f.read().split())
+    return children
+
+
+def process_memory_mb(pid):
+    """RSS, PSS (shared pages split between their users) and USS (private pages) in MB,
+    from /proc/<pid>/smaps_rollup"""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return {
+        "rss_mb": fields.get("Rss", float("nan")),
+        "pss_mb": fields.get("Pss", float("nan")),
+        "uss_mb": fields.get("Private_Clean", 0.0) + fields.get("Private_Dirty", 0.0),
+    }
@@ -0,0 +1,50 @@
+# backend/benchmarks/bench_backtest.py
+"""
+Wall time of the full 2010-present walk-forward backtest (backtest.py,
+expanding window, 30-day horizon) at 1 worker and at os.cpu_count()
+workers, plus the time to prepare the shared time-sorted matrices.
+Results go to a temporary file so models/backtest_results.json is untouched.
+
+Run from the backend directory:  python benchmarks/bench_backtest.py
+"""
+import os
+import tempfile
+import time
+
+from _common import setup_backend, quiet, print_table
+
+setup_backend()
+
+
+def run(quick=False):
+    import backtest
+
+    cpus = os.cpu_count() or 1
+    horizon = 180 if quick else 30
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        backtest.prepare_data(os.path.join(tmp, "data"))
+        prepare_s = time.perf_counter() - start
+        for workers in sorted({1, cpus}):
+            start = time.perf_counter()
+            with quiet():
+                out = backtest.run_backtest(horizon_days=horizon, n_workers=workers,
+                                            results_path=os.path.join(tmp, "results.json"),
+                                            data_dir=os.path.join(tmp, "data"))
+            results.append({"workers": workers, "windows": out["summary"]["windows"],
+                            "seconds": time.perf_counter() - start,
+                            "auc_roc": out["summary"]["auc_roc"],
+                            "results_bytes": os.path.getsize(os.path.join(tmp, "results.json"))})
+    return {"backtest": {"cpu_count": cpus, "horizon_days": horizon, "prepare_seconds": prepare_s,
+                         "results": results}}
+
+
+if __name__ == "__main__":
+    out = run()["backtest"]
+    print(f"cpu_count={out['cpu_count']}, horizon={out['horizon_days']}d, data prep {out['prepare_seconds']:.2f}s")
+    print_table(
+        ["workers", "windows", "wall s", "s/window", "pooled AUC", "results file"],
+        [[r["workers"], r["windows"], f"{r['seconds']:.1f}", f"{r['seconds'] / r['windows']:.2f}",
+          r["auc_roc"], f"{r['results_bytes'] / 1024:.1f} KB"] for r in out["results"]],
+    )
@@ -0,0 +1,60 @@
+# backend/benchmarks/bench_batch_predict.py
+"""
+Rows/second of the vectorized batch pipeline (predict_flare_two_stage_batch)
+versus looping over the single-row path (predict_flare_two_stage), for batch
+sizes from 1 to 10k rows.
+
+Run from the backend directory:  python benchmarks/bench_batch_predict.py
+"""
+import warnings
+
+from _common import setup_backend, quiet, best_of, load_feature_matrix, print_table
+
+setup_backend()
+warnings.filterwarnings("ignore")
+
+with quiet():
+    import model_utils
+
+BATCH_SIZES = [1, 10, 100, 1000, 10000]
+# The single-row loop is slow; cap how many rows it is timed on
+LOOP_ROW_LIMIT = 1000
+
+
+def run(quick=False):
+    sizes = BATCH_SIZES[:4] if quick else BATCH_SIZES
+    matrix = load_feature_matrix(max(sizes))
+    results = []
+    for n in sizes:
+        rows = matrix[:n]
+        repeat = 5 if n <= 1000 else 3
+        with quiet():
+            batch_time = best_of(lambda: model_utils.predict_flare_two_stage_batch(rows), repeat=repeat)
+
+        loop_n = min(n, LOOP_ROW_LIMIT)
+        loop_rows = [list(r) for r in rows[:loop_n]]
+
+        def loop():
+            for r in loop_rows:
+                model_utils.predict_flare_two_stage(r)
+
+        with quiet():
+            loop_time = best_of(loop, repeat=1 if loop_n > 100 else 3)
+
+        batch_rps = n / batch_time
+        loop_rps = loop_n / loop_time
+        results.append({
+            "batch_size": n,
+            "batch_rows_per_s": batch_rps,
+            "loop_rows_per_s": loop_rps,
+            "speedup": batch_rps / loop_rps,
+        })
+    return {"batch_predict": results}
+
+
+if __name__ == "__main__":
+    results = run()["batch_predict"]
+    print_table(
+        ["batch", "batch rows/s", "single-row loop rows/s", "speedup"],
+        [[r["batch_size"], f"{r['batch_rows_per_s']:,.0f}", f"{r['loop_rows_per_s']:,.0f}", f"{r['speedup']:.1f}x"] for r in results],
+    )
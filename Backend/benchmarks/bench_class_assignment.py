@@ -0,0 +1,180 @@
+# backend/benchmarks/bench_class_assignment.py
+"""
+Class assignment stage (class_assignment.py): probability + anomaly flag -> flare class.
+
+1. agreement: the legacy threshold table (batch searchsorted and the
+   single-row bisect) must give exactly what get_flare_class_from_probability
+   gives, including probabilities sitting on and next to every threshold;
+   the served two-stage pipeline over the whole dataset must match scoring
+   every row with both forests and the per-row function; unlabeled rows
+   (flare_category code -1) must count as Insignificant, not X-class
+2. throughput of class assignment alone for 1k / 100k / 1M rows: the
+   per-row function, the previous np.select version and the table
+   (legacy and fitted/calibrated)
+3. stage 2 gating: Isolation Forest time on a whole batch versus only the
+   rows whose probability passes the gate
+4. fitted tables (isotonic / Platt) on the training held-out split: class
+   accuracy and Brier score against the legacy thresholds
+
+Run from the backend directory:  python benchmarks/bench_class_assignment.py
+"""
+import os
+import warnings
+
+import numpy as np
+
+from _common import setup_backend, quiet, best_of, load_feature_matrix, print_table
+
+setup_backend()
+warnings.filterwarnings("ignore")
+
+os.environ.update(PREDICTION_CACHE_SIZE="0", LOG_LEVEL="WARNING")
+
+with quiet():
+    import model_utils  # noqa: E402
+    import train_models  # noqa: E402
+from class_assignment import LEGACY, LABELS, category_classes, fit_class_table, evaluate_class_table  # noqa: E402
+from model_registry import registry  # noqa: E402
+
+
+def select_classes(probabilities, is_anomaly):
+    """The previous vectorized implementation (np.select over string choices)"""
+    conditions = [is_anomaly & (probabilities > 0.6), probabilities > 0.7, probabilities > 0.4, probabilities > 0.2]
+    choices = ["X-Class", "X-Class", "M-Class", "C-Class"]
+    return np.select(conditions, choices, default="Insignificant (A/B-class)").astype(object)
+
+
+def probe_probabilities(n, seed=11):
+    """Uniform probabilities plus every threshold and its floating-point neighbours"""
+    rng = np.random.default_rng(seed)
+    edges = np.array([0.0, 0.2, 0.3, 0.4, 0.6, 0.7, 1.0])
+    around = np.concatenate([edges, np.nextafter(edges, -1), np.nextafter(edges, 2)])
+    probabilities = np.concatenate([around, rng.random(n)])[:max(n, len(around))]
+    return probabilities, rng.random(len(probabilities)) < 0.3
+
+
+def per_row(probabilities, is_anomaly):
+    return [model_utils.get_flare_class_from_probability(p, a) for p, a in zip(probabilities.tolist(), is_anomaly.tolist())]
+
+
+def check_agreement(bundle, matrix, single_rows):
+    probabilities, is_anomaly = probe_probabilities(100_000)
+    reference = per_row(probabilities, is_anomaly)
+    table_agrees = LEGACY.assign(probabilities, is_anomaly).tolist() == reference
+    single_agrees = [LEGACY.assign_one(p, a) for p, a in zip(probabilities.tolist(), is_anomaly.tolist())] == reference
+
+    # Served pipeline vs scoring every row with both forests, then the per-row function
+    processed = model_utils.preprocess_hmi_batch(matrix, bundle)
+    classes, served = model_utils._two_stage_scores(processed, bundle)
+    rf = model_utils.rf_significance_probabilities(processed, bundle)
+    scores = model_utils.iso_anomaly_scores(processed, bundle) if bundle.iso_available else np.zeros(len(rf))
+    expected = [model_utils.get_flare_class_from_probability(p, bundle.iso_available and p > 0.3 and s < -0.1)
+                for p, s in zip(rf.tolist(), scores.tolist())]
+    single = [model_utils.predict_flare_two_stage(row) for row in single_rows.tolist()]
+    # Code -1 is an empty flare_category (unlabeled row), not the last category
+    unlabeled = LABELS[category_classes([-1, 0, 2, 4], ["A", "B", "C", "M", "X"])].tolist()
+    return {
+        "table_agrees": table_agrees,
+        "single_row_agrees": single_agrees,
+        "pipeline_agrees": classes.tolist() == expected and bool(np.allclose(served, rf)),
+        "single_row_pipeline_agrees": [c for c, _ in single] == expected[:len(single_rows)],
+        "unlabeled_rows_insignificant": unlabeled == [LABELS[0], LABELS[0], "C-Class", "X-Class"],
+        "probabilities_checked": len(probabilities),
+        "pipeline_rows_checked": len(matrix),
+    }
+
+
+def bench_assign(sizes, fitted, per_row_limit):
+    results = {}
+    for n in sizes:
+        probabilities, is_anomaly = probe_probabilities(n)
+        repeat = 5 if n <= 100_000 else 3
+        select_seconds = best_of(lambda: select_classes(probabilities, is_anomaly), repeat)
+        table_seconds = best_of(lambda: LEGACY.assign(probabilities, is_anomaly), repeat)
+        entry = {
+            "select_rows_per_second": round(n / select_seconds),
+            "table_rows_per_second": round(n / table_seconds),
+            "speedup_vs_select": round(select_seconds / table_seconds, 2),
+        }
+        if fitted is not None:
+            entry["fitted_rows_per_second"] = round(n / best_of(lambda: fitted.assign(probabilities, is_anomaly), repeat))
+        if n <= per_row_limit:
+            entry["per_row_rows_per_second"] = round(n / best_of(lambda: per_row(probabilities, is_anomaly), 1))
+        results[str(n)] = entry
+    return results
+
+
+def bench_gating(bundle, matrix, batch_sizes):
+    results = {}
+    processed_all = model_utils.preprocess_hmi_batch(matrix, bundle)
+    for n in batch_sizes:
+        processed = processed_all[:n]
+        gated = np.flatnonzero(model_utils.rf_significance_probabilities(processed, bundle) > LEGACY.gate)
+        all_seconds = best_of(lambda: model_utils.iso_anomaly_scores(processed, bundle), 5)
+        gated_seconds = best_of(lambda: model_utils.iso_anomaly_scores(processed[gated], bundle), 5) if len(gated) else 0.0
+        results[str(n)] = {
+            "gated_fraction": round(len(gated) / n, 3),
+            "iso_all_rows_ms": round(all_seconds * 1000, 3),
+            "iso_gated_ms": round(gated_seconds * 1000, 3),
+            "batch_ms": round(best_of(lambda: model_utils._two_stage_scores(processed, bundle), 5) * 1000, 3),
+        }
+    return results
+
+
+def held_out_split():
+    """Raw Random Forest probabilities + true classes of the training held-out rows"""
+    from sklearn.model_selection import train_test_split
+
+    bundle = registry.get()
+    with quiet():
+        X, y_significant, _ = train_models.load_training_data()
+    classes = train_models.load_flare_classes()
+    _, X_test, _, classes_test = train_test_split(X[bundle.feature_names], classes, test_size=0.2,
+                                                  random_state=42, stratify=y_significant)
+    return bundle.rf_model.predict_proba(X_test)[:, 1], classes_test
+
+
+def bench_fitted(probabilities, classes):
+    results = {"legacy": evaluate_class_table(LEGACY, probabilities, classes)}
+    tables = {}
+    for method in ("isotonic", "platt"):
+        tables[method] = fit_class_table(probabilities, classes, method=method)
+        results[method] = evaluate_class_table(tables[method], probabilities, classes)
+        grid, flags = probe_probabilities(10_000)
+        results[method]["single_row_agrees"] = [tables[method].assign_one(p, a) for p, a in
+                                                zip(grid.tolist(), flags.tolist())] == tables[method].assign(grid, flags).tolist()
+    return results, tables["isotonic"]
+
+
+def run(quick=False):
+    bundle = registry.get()
+    matrix = load_feature_matrix()
+    fitted, fitted_table = bench_fitted(*held_out_split())
+    sizes = (1_000, 100_000) if quick else (1_000, 100_000, 1_000_000)
+    return {"class_assignment": {
+        "agreement": check_agreement(bundle, matrix, matrix[:100 if quick else 1000]),
+        "assign": bench_assign(sizes, fitted_table, per_row_limit=100_000),
+        "gating": bench_gating(bundle, matrix, (256, len(matrix))),
+        "fitted": fitted,
+    }}
+
+
+if __name__ == "__main__":
+    results = run()["class_assignment"]
+    print("Agreement with get_flare_class_from_probability")
+    print_table(["check", "result"], [[k, v] for k, v in results["agreement"].items()])
+    print()
+    print("Class assignment only (rows/s)")
+    print_table(["rows", "per-row function", "np.select", "table", "table (isotonic)", "speedup vs np.select"],
+                [[n, r.get("per_row_rows_per_second", "-"), r["select_rows_per_second"], r["table_rows_per_second"],
+                  r.get("fitted_rows_per_second", "-"), r["speedup_vs_select"]] for n, r in results["assign"].items()])
+    print()
+    print("Stage 2 on the gated rows only")
+    print_table(["batch", "gated", "ISO all rows ms", "ISO gated ms", "whole batch ms"],
+                [[n, r["gated_fraction"], r["iso_all_rows_ms"], r["iso_gated_ms"], r["batch_ms"]]
+                 for n, r in results["gating"].items()])
+    print()
+    print("Held-out split (class accuracy against the true A-B / C / M / X class)")
+    print_table(["table", "class accuracy", "Brier", "assigned shares"],
+                [[name, round(r["class_accuracy"], 3), round(r["brier"], 4), r["assigned_shares"]]
+                 for name, r in results["fitted"].items()])
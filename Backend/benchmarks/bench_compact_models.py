@@ -0,0 +1,122 @@
+# backend/benchmarks/bench_compact_models.py
+"""
+Compact forest artifacts (compact_models.py, MODEL_FORMAT=compact) against
+the compiled arrays and the sklearn pickles.
+
+The compact forests are written to a temporary copy of models/ (the
+repository's models/ is not touched), then each serving format runs in a
+fresh interpreter: load the bundle, score one row and a 1000-row batch
+(above COMPILED_MAX_ROWS, so the compiled format falls back to sklearn).
+Reported: model load time, first prediction, batch rows/s, max RSS and
+whether sklearn got imported.
+
+In process: the size / load time / accuracy report of compact_models for
+8-bit and full-width leaves, with all / half of the Random Forest trees.
+
+Run from the backend directory:  python benchmarks/bench_compact_models.py
+"""
+import contextlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import warnings
+
+from _common import setup_backend, quiet, BACKEND_DIR, print_table
+
+setup_backend()
+warnings.filterwarnings("ignore")
+
+with quiet():
+    import compact_models  # noqa: E402
+
+CHILD = r"""
+import contextlib, io, json, sys, time
+import numpy as np
+t0 = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    import model_utils
+    from model_registry import registry
+    bundle = registry.get()
+    t1 = time.perf_counter()
+    rows = np.load(sys.argv[1])
+    model_utils.predict_flare_anomaly(rows[0].tolist())
+    t2 = time.perf_counter()
+    model_utils.predict_flare_anomaly_batch(rows)
+    t3 = time.perf_counter()
+    model_utils.predict_flare_anomaly_batch(rows)
+    t4 = time.perf_counter()
+print(json.dumps({
+    "model_format": bundle.model_format,
+    "version": bundle.version,
+    "load_ms": bundle.load_times.get("total"),
+    "import_and_load_ms": (t1 - t0) * 1000,
+    "first_prediction_ms": (t2 - t1) * 1000,
+    "first_batch_ms": (t3 - t2) * 1000,
+    "batch_rows_per_second": len(rows) / (t4 - t3),
+    # VmHWM: peak RSS of this process image (ru_maxrss would include the parent's, from before exec)
+    "max_rss_mb": next(int(line.split()[1]) for line in open("/proc/self/status") if line.startswith("VmHWM")) / 1024,
+    "sklearn_imported": "sklearn" in sys.modules,
+}))
+"""
+
+SCENARIOS = [
+    ("sklearn pickles", {"USE_COMPILED_FORESTS": "0"}),
+    ("compiled", {"MODEL_FORMAT": "compiled"}),
+    ("compact", {"MODEL_FORMAT": "compact"}),
+]
+
+
+def measure(model_dir, rows_path, env, runs):
+    samples = []
+    for _ in range(runs):
+        proc_env = dict(os.environ, MODEL_DIR=model_dir, MODEL_WARMUP="0", PREDICTION_CACHE_SIZE="0",
+                        LOG_LEVEL="WARNING", **env)
+        out = subprocess.run([sys.executable, "-W", "ignore", "-c", CHILD, rows_path], cwd=BACKEND_DIR,
+                             env=proc_env, capture_output=True, text=True, check=True).stdout
+        samples.append(json.loads(out.strip().splitlines()[-1]))
+    # Fastest start (least disturbed run)
+    return min(samples, key=lambda r: r["import_and_load_ms"])
+
+
+def run(quick=False):
+    import numpy as np
+    from _common import load_feature_matrix
+
+    with tempfile.TemporaryDirectory() as directory:
+        model_dir = os.path.join(directory, "models")
+        shutil.copytree(os.path.join(BACKEND_DIR, "models"), model_dir,
+                        ignore=shutil.ignore_patterns("versions", "CURRENT", "compact"))
+        with contextlib.redirect_stdout(io.StringIO()):
+            exported = compact_models.export_compact_models(model_dir)
+            context = compact_models.CompactionContext(model_dir)
+            report = compact_models.compaction_report(context, keep_fractions=(1.0, 0.5), bits_options=(8, 64))
+            baselines = context.baselines()
+        rows_path = os.path.join(directory, "rows.npy")
+        np.save(rows_path, load_feature_matrix(1000))
+        serving = {name: measure(model_dir, rows_path, env, 2 if quick else 5) for name, env in SCENARIOS}
+    return {"compact_models": {
+        "exported": exported,
+        "serving": serving,
+        "artifacts": {**{name: dict(b) for name, b in baselines.items()},
+                      **{r["variant"]: {k: v for k, v in r.items() if k != "variant"} for r in report}},
+    }}
+
+
+if __name__ == "__main__":
+    results = run()["compact_models"]
+    print(f"Exported: {results['exported']['variant']}")
+    print_table(["format", "load ms", "import+load ms", "first prediction ms", "1000-row batch rows/s",
+                 "max RSS MB", "sklearn imported"],
+                [[name, r["load_ms"], f"{r['import_and_load_ms']:.0f}", f"{r['first_prediction_ms']:.1f}",
+                  f"{r['batch_rows_per_second']:.0f}", f"{r['max_rss_mb']:.0f}", r["sklearn_imported"]]
+                 for name, r in results["serving"].items()])
+    print()
+    print_table(["artifacts", "size KB", "load ms", "RF max err", "AUC Δ", "acc Δ", "class agreement"],
+                [[name, r["size_kb"], r["load_ms"]] + ([f"{r['rf_max_error']:.1e}", f"{r['auc_delta']:+.4f}",
+                                                         f"{r['accuracy_delta']:+.3f}", f"{r['class_agreement']:.4f}"]
+                                                        if "rf_max_error" in r else ["-"] * 4)
+                 for name, r in results["artifacts"].items()])
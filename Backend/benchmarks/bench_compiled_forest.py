@@ -0,0 +1,105 @@
+# backend/benchmarks/bench_compiled_forest.py
+"""
+Parity and speed of the compiled (flat array) forest evaluator against the
+sklearn estimators, on HMI_CLEANED_DATA.csv.
+
+Parity: predict_proba / decision_function must agree with sklearn within
+PARITY_TOLERANCE on every row, raw and preprocessed; the script exits
+non-zero otherwise. Speed: latency for 1 row and rows/s for 10k rows, plus
+the load time of the pickles versus the .npy arrays.
+
+Run from the backend directory:  python benchmarks/bench_compiled_forest.py
+"""
+import sys
+import time
+import warnings
+
+import joblib
+
+from _common import setup_backend, quiet, best_of, load_feature_matrix, print_table
+
+setup_backend()
+warnings.filterwarnings("ignore")
+
+with quiet():
+    import model_utils
+
+PARITY_TOLERANCE = 1e-9
+
+
+def check_parity():
+    import numpy as np
+
+    rf_model = joblib.load("models/rf_significance_model.pkl")
+    iso_model = joblib.load("models/iso_anomaly_model.pkl")
+    rf = model_utils.load_compiled_forest("rf_significance", "models/rf_significance_model.pkl")
+    iso = model_utils.load_compiled_forest("iso_anomaly", "models/iso_anomaly_model.pkl")
+    if rf is None or iso is None:
+        raise SystemExit("Compiled forests missing or stale - run: python train_models.py export")
+
+    raw = load_feature_matrix()
+    with quiet():
+        processed = model_utils.preprocess_hmi_batch(raw)
+    errors = {}
+    for label, X in (("raw", raw), ("preprocessed", processed)):
+        errors[f"rf_{label}"] = float(np.max(np.abs(rf_model.predict_proba(X)[:, 1] - model_utils.compiled_predict_proba(rf, X))))
+        errors[f"iso_{label}"] = float(np.max(np.abs(iso_model.decision_function(X) - model_utils.compiled_decision_function(iso, X))))
+    return rf_model, iso_model, rf, iso, errors
+
+
+def run(quick=False):
+    rf_model, iso_model, rf, iso, errors = check_parity()
+    failures = {k: v for k, v in errors.items() if v > PARITY_TOLERANCE}
+    if failures:
+        raise AssertionError(f"Compiled forest parity failed: {failures}")
+
+    one = load_feature_matrix(1)
+    big = load_feature_matrix(1000 if quick else 10000)
+    timings = {
+        "rf_1_row_us": {
+            "sklearn": best_of(lambda: rf_model.predict_proba(one), repeat=20) * 1e6,
+            "compiled": best_of(lambda: model_utils.compiled_predict_proba(rf, one), repeat=20, number=10) / 10 * 1e6,
+        },
+        "iso_1_row_us": {
+            "sklearn": best_of(lambda: iso_model.decision_function(one), repeat=20) * 1e6,
+            "compiled": best_of(lambda: model_utils.compiled_decision_function(iso, one), repeat=20, number=10) / 10 * 1e6,
+        },
+        "rf_rows_per_s": {
+            "sklearn": len(big) / best_of(lambda: rf_model.predict_proba(big), repeat=3),
+            "compiled": len(big) / best_of(lambda: model_utils.compiled_predict_proba(rf, big), repeat=3),
+        },
+        "iso_rows_per_s": {
+            "sklearn": len(big) / best_of(lambda: iso_model.decision_function(big), repeat=3),
+            "compiled": len(big) / best_of(lambda: model_utils.compiled_decision_function(iso, big), repeat=3),
+        },
+    }
+
+    start = time.perf_counter()
+    joblib.load("models/rf_significance_model.pkl")
+    joblib.load("models/iso_anomaly_model.pkl")
+    pickle_load = time.perf_counter() - start
+    start = time.perf_counter()
+    model_utils.load_compiled_forest("rf_significance", "models/rf_significance_model.pkl")
+    model_utils.load_compiled_forest("iso_anomaly", "models/iso_anomaly_model.pkl")
+    compiled_load = time.perf_counter() - start
+    timings["load_ms"] = {"sklearn": pickle_load * 1000, "compiled": compiled_load * 1000}
+
+    return {"compiled_forest": {"parity_max_error": errors, "timings": timings}}
+
+
+if __name__ == "__main__":
+    try:
+        results = run()["compiled_forest"]
+    except AssertionError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print("Parity (max abs error vs sklearn):")
+    for name, err in results["parity_max_error"].items():
+        print(f"  {name:18s} {err:.2e}")
+    print()
+    print_table(
+        ["metric", "sklearn", "compiled", "speedup"],
+        [[name, f"{t['sklearn']:,.1f}", f"{t['compiled']:,.1f}",
+          f"{(t['compiled'] / t['sklearn']) if 'rows_per_s' in name else (t['sklearn'] / t['compiled']):.1f}x"]
+         for name, t in results["timings"].items()],
+    )
@@ -0,0 +1,153 @@
+# backend/benchmarks/bench_flare_store.py
+"""
+DONKI backfill into the flare store, and range queries over it.
+
+A local stub stands in for DONKI FLR with ~15 years of synthetic events
+(2010-05-01 .. 2025-04-18, ~8 flares a day, each response delayed) and
+fails some first attempts with 429 / 503 so the retry path is exercised.
+
+1. backfill at several concurrency levels into a fresh store: wall time,
+   retries, and whether every event arrived; then a rerun that must skip
+   every settled range
+2. /flares-style queries (1 day .. the full span, with and without a
+   min_class filter) against the SQLite index, compared with scanning the
+   raw event list the way a client holding DONKI JSON would
+
+Run from the backend directory:  python benchmarks/bench_flare_store.py
+"""
+import asyncio
+import bisect
+import os
+import random
+import tempfile
+import time
+import zlib
+from datetime import date, timedelta
+
+import httpx
+
+from _common import setup_backend, StubUpstream, print_table
+
+setup_backend()
+
+import flare_store  # noqa: E402
+
+START, END = date(2010, 5, 1), date(2025, 4, 18)
+FLARES_PER_DAY = 8
+UPSTREAM_DELAY = 0.05
+
+
+def synthetic_events(seed=7):
+    rng = random.Random(seed)
+    events, day = [], START
+    while day <= END:
+        for _ in range(rng.randint(0, 2 * FLARES_PER_DAY)):
+            minute = rng.randrange(24 * 60)
+            peak = f"{day.isoformat()}T{minute // 60:02d}:{minute % 60:02d}Z"
+            # Power-law peak flux: mostly C, some M, few X
+            flux = 1e-6 * (1 - rng.random()) ** -1.1
+            letter, base = ("X", 1e-4) if flux >= 1e-4 else ("M", 1e-5) if flux >= 1e-5 else ("C", 1e-6)
+            events.append({
+                "flrID": f"{peak}-FLR-{len(events):06d}", "beginTime": peak, "peakTime": peak, "endTime": peak,
+                "classType": f"{letter}{min(flux / base, 99.9):.1f}", "sourceLocation": "N10W20",
+                "activeRegion": rng.choice([None, rng.randint(11000, 14100)]),
+            })
+        day += timedelta(days=1)
+    # Flare ids are unique; several flares may share a peak minute (and region)
+    return sorted(events, key=lambda e: (e["peakTime"], e["flrID"]))
+
+
+def donki_stub(events):
+    days = [e["peakTime"][:10] for e in events]
+    attempts = {}
+
+    def flr(query):
+        key = query["startDate"]
+        attempts[key] = attempts.get(key, 0) + 1
+        if attempts[key] == 1 and zlib.crc32(key.encode()) % 5 == 0:
+            return 503, {"error": "upstream busy"}
+        if attempts[key] == 1 and zlib.crc32(key.encode()) % 7 == 0:
+            return 429, {"error": "rate limited"}
+        lo = bisect.bisect_left(days, query["startDate"])
+        hi = bisect.bisect_right(days, query["endDate"])
+        return events[lo:hi]
+
+    return StubUpstream({"/DONKI/FLR": flr}, delay=UPSTREAM_DELAY)
+
+
+async def _backfill(store, url, concurrency):
+    async with httpx.AsyncClient(timeout=30) as client:
+        return await flare_store.backfill(store, START, END, chunk_days=30, concurrency=concurrency,
+                                          url=url, api_key="TEST", client=client, base_delay=0.05)
+
+
+def bench_backfill(events, concurrency_levels, directory):
+    expected = len(events)
+    results, store = {}, None
+    for concurrency in concurrency_levels:
+        with donki_stub(events) as stub:
+            store = flare_store.FlareStore(os.path.join(directory, f"flares-{concurrency}.sqlite"))
+            summary = asyncio.run(_backfill(store, stub.url + "/DONKI/FLR", concurrency))
+            stored = store.stats()["events"]
+            rerun = asyncio.run(_backfill(store, stub.url + "/DONKI/FLR", concurrency))
+        results[str(concurrency)] = {
+            "chunks": summary["chunks"], "seconds": summary["elapsed_seconds"], "retries": summary["retries"],
+            "failed": len(summary["failed"]), "events_stored": stored, "events_expected": expected,
+            "rerun_skipped": rerun["skipped"], "rerun_fetched": rerun["fetched"],
+        }
+    return results, store
+
+
+def _scan(events, start, end, min_flux):
+    """Baseline: filter the raw DONKI JSON list"""
+    return [e for e in events if start <= e["peakTime"] < end
+            and (min_flux is None or (flare_store.class_flux(e["classType"]) or 0) >= min_flux)]
+
+
+def bench_queries(store, events, repeats):
+    rng = random.Random(1)
+    span = (END - START).days
+    results = {}
+    for window_days in (1, 30, 365, span + 1):
+        for min_class in (None, "M", "X"):
+            min_flux = flare_store.class_flux(min_class) if min_class else None
+            starts = [START + timedelta(days=rng.randrange(max(1, span - window_days + 1))) for _ in range(repeats)]
+            windows = [(d, d + timedelta(days=window_days)) for d in starts]
+
+            t0 = time.perf_counter()
+            rows = [store.query(flare_store.parse_time(a.isoformat()), flare_store.parse_time(b.isoformat()),
+                                min_flux, limit=None) for a, b in windows]
+            indexed = (time.perf_counter() - t0) / repeats
+            scan_repeats = max(1, repeats // 10)
+            t0 = time.perf_counter()
+            scanned = [_scan(events, a.isoformat(), b.isoformat(), min_flux) for a, b in windows[:scan_repeats]]
+            scan = (time.perf_counter() - t0) / scan_repeats
+            assert [len(r) for r in rows[:scan_repeats]] == [len(r) for r in scanned]
+            results[f"{window_days}d, min_class={min_class or '-'}"] = {
+                "mean_rows": round(sum(map(len, rows)) / repeats, 1),
+                "indexed_ms": round(indexed * 1000, 3),
+                "json_scan_ms": round(scan * 1000, 3),
+            }
+    return results
+
+
+def run(quick=False):
+    events = synthetic_events()
+    with tempfile.TemporaryDirectory() as directory:
+        backfill, store = bench_backfill(events, (4, 16) if quick else (1, 4, 16), directory)
+        queries = bench_queries(store, events, 20 if quick else 100)
+        store.close()
+    return {"flare_store": {"synthetic_events": len(events), "backfill": backfill, "queries": queries}}
+
+
+if __name__ == "__main__":
+    results = run()["flare_store"]
+    print(f"{results['synthetic_events']} synthetic DONKI events, {UPSTREAM_DELAY * 1000:.0f} ms per stub response")
+    print_table(["concurrency", "chunks", "seconds", "retries", "failed", "stored/expected", "rerun skipped/fetched"],
+                [[c, r["chunks"], r["seconds"], r["retries"], r["failed"],
+                  f"{r['events_stored']}/{r['events_expected']}", f"{r['rerun_skipped']}/{r['rerun_fetched']}"]
+                 for c, r in results["backfill"].items()])
+    print()
+    print_table(["query", "rows", "indexed ms", "JSON scan ms", "speed-up"],
+                [[name, r["mean_rows"], r["indexed_ms"], r["json_scan_ms"],
+                  f"{r['json_scan_ms'] / r['indexed_ms']:.0f}x"] for name, r in results["queries"].items()])
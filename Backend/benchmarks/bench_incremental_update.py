@@ -0,0 +1,84 @@
+# backend/benchmarks/bench_incremental_update.py
+"""
+Wall time of `train_models.py update` (incremental: warm-started trees on
+the new rows + recent context, reservoir-refitted Isolation Forest,
+versioned artifact write) against a full train_flare_models run, as a
+function of how many new daily rows arrived since the last training.
+
+A base model is trained on HMI_CLEANED_DATA.csv minus its last year; each
+measurement then appends N rows, copies the base artifacts and runs the
+update (or a full retrain) in a fresh subprocess. Both timings include
+refreshing the columnar cache for the grown CSV.
+
+Run from the backend directory:  python benchmarks/bench_incremental_update.py
+"""
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from _common import setup_backend, BACKEND_DIR, print_table
+
+setup_backend()
+
+NEW_ROWS = [1, 7, 30, 90, 365]
+HOLDBACK = 365
+
+CHILD = r"""
+import contextlib, io, json, sys, time
+csv_path, model_dir, mode = sys.argv[1:4]
+import train_models, model_update
+start = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    if mode == 'update':
+        model_update.update_models(csv_path, model_dir)
+    else:
+        train_models.train_flare_models(csv_path, model_dir=model_dir)
+print(json.dumps({"seconds": time.perf_counter() - start}))
+"""
+
+
+def _child(tmp, csv_path, model_dir, mode):
+    env = dict(os.environ, HMI_CACHE_DIR=os.path.join(tmp, "cache", os.path.basename(csv_path)))
+    out = subprocess.run([sys.executable, "-c", CHILD, csv_path, model_dir, mode], cwd=BACKEND_DIR,
+                         env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])["seconds"]
+
+
+def _write_csv(path, header, lines):
+    with open(path, "w") as f:
+        f.write(header)
+        f.writelines(lines)
+    return path
+
+
+def run(quick=False):
+    with open(os.path.join(BACKEND_DIR, "HMI_CLEANED_DATA.csv")) as f:
+        header, *lines = f.readlines()
+    base_lines = lines[:-HOLDBACK]
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        base_csv = _write_csv(os.path.join(tmp, "base.csv"), header, base_lines)
+        base_models = os.path.join(tmp, "base_models")
+        _child(tmp, base_csv, base_models, "full")
+
+        for n in (NEW_ROWS[:3] if quick else NEW_ROWS):
+            csv_path = _write_csv(os.path.join(tmp, f"plus{n}.csv"), header, lines[:len(base_lines) + n])
+            update_dir = os.path.join(tmp, f"update{n}")
+            shutil.copytree(base_models, update_dir)
+            update_s = _child(tmp, csv_path, update_dir, "update")
+            full_s = _child(tmp, csv_path, os.path.join(tmp, f"full{n}"), "full")
+            results.append({"new_rows": n, "update_s": update_s, "full_retrain_s": full_s})
+    return {"incremental_update": {"base_rows": len(base_lines), "results": results}}
+
+
+if __name__ == "__main__":
+    out = run()["incremental_update"]
+    print(f"base model trained on {out['base_rows']} rows")
+    print_table(
+        ["new rows", "incremental s", "full retrain s", "speedup"],
+        [[r["new_rows"], f"{r['update_s']:.2f}", f"{r['full_retrain_s']:.2f}",
+          f"{r['full_retrain_s'] / r['update_s']:.1f}x"] for r in out["results"]],
+    )
@@ -0,0 +1,140 @@
+# backend/benchmarks/bench_labeling.py
+"""
+Labeling SHARP rows with the flares that follow them (labeling.py) at 1x,
+10x and 100x the current dataset.
+
+The scaled datasets keep the real 3677 days and add active regions: at
+scale k every day has k region rows (NOAA numbers that live ~2 weeks),
+and each region-day produces a Poisson number of flares with power-law
+fluxes - so rows and events both grow k-fold.
+
+1. index build + in-memory labeling throughput for time-only and
+   region joins at 24 h and 48 h horizons
+2. chunked labeling (10k-row chunks) must agree with the in-memory result
+3. end-to-end label_csv (CSV in -> labeled CSV out, streamed)
+4. at 1x, a naive pandas cross join + filter + idxmax as the baseline,
+   which must produce the same labels
+
+Run from the backend directory:  python benchmarks/bench_labeling.py
+"""
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from _common import setup_backend, print_table
+
+setup_backend()
+
+import data_cache  # noqa: E402
+import labeling  # noqa: E402
+
+DAY = 86400
+REGION_LIFETIME_DAYS = 14
+FLARES_PER_REGION_DAY = 0.6
+
+
+def synthetic(scale, seed=3):
+    """(rows DataFrame with DATE / NOAA_AR / a feature column, (peak_times, fluxes, class codes, regions))"""
+    rng = np.random.default_rng(seed)
+    days = data_cache.load_columns(['DATE'])['DATE']
+    day_index = np.repeat(np.arange(len(days)), scale)
+    slot = np.tile(np.arange(scale), len(days))
+    regions = 11000 + (day_index // REGION_LIFETIME_DAYS) * scale + slot
+    rows = pd.DataFrame({
+        'DATE': pd.to_datetime(np.repeat(days, scale), unit='s').strftime('%Y-%m-%d'),
+        'NOAA_AR': regions,
+        'USFLUX': rng.lognormal(50, 1, len(regions)),
+    })
+
+    counts = rng.poisson(FLARES_PER_REGION_DAY, len(regions))
+    event_rows = np.repeat(np.arange(len(regions)), counts)
+    peak_times = np.repeat(days, scale)[event_rows] + rng.integers(0, DAY, len(event_rows))
+    fluxes = 1e-7 * (1 - rng.random(len(event_rows))) ** -1.2
+    codes = np.clip(np.floor(np.log10(fluxes)).astype(int) + 8, 0, 4).astype(np.int8)
+    return rows, (peak_times, fluxes, codes, regions[event_rows])
+
+
+def _best_of(fn, repeat):
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def naive_labels(rows, events, horizon_hours, by_region):
+    """Baseline: materialize every (row, event) pair, filter the window, take the max"""
+    peak_times, fluxes, codes, regions = events
+    ev = pd.DataFrame({'peak': peak_times, 'flux': fluxes, 'code': codes, 'region': regions})
+    ev = ev.sort_values(['region', 'peak'] if by_region else ['peak'], kind='stable')
+    left = pd.DataFrame({'row': np.arange(len(rows)), 't': labeling._epochs(rows['DATE']),
+                         'region': rows['NOAA_AR'].to_numpy()})
+    pairs = left.merge(ev, on='region') if by_region else left.merge(ev.drop(columns='region'), how='cross')
+    pairs = pairs[(pairs['peak'] >= pairs['t']) & (pairs['peak'] < pairs['t'] + int(horizon_hours * 3600))]
+    best = pairs.loc[pairs.groupby('row', sort=False)['flux'].idxmax()]
+    peaks = np.full(len(rows), labeling.NAT, dtype=np.int64)
+    peaks[best['row'].to_numpy()] = best['peak'].to_numpy()
+    return peaks
+
+
+def bench_scale(scale, repeat, with_csv, with_naive, directory):
+    rows, events = synthetic(scale)
+    build_seconds, region_index = _best_of(lambda: labeling.FlareIndex(*events), repeat)
+    time_index = labeling.FlareIndex(*events[:3])
+    times = labeling._epochs(rows['DATE'])
+    regions = rows['NOAA_AR'].to_numpy()
+    results = {'rows': len(rows), 'events': len(region_index), 'index_build_ms': round(build_seconds * 1000, 1), 'joins': {}}
+
+    for by_region in (False, True):
+        for horizon in (24, 48):
+            join_regions, index = (regions, region_index) if by_region else (None, time_index)
+            seconds, (categories, peaks) = _best_of(
+                lambda: labeling.label_rows(times, index, horizon, join_regions), repeat)
+
+            chunked = np.concatenate([labeling.label_rows(times[i:i + 10_000], index, horizon,
+                                                          None if join_regions is None else join_regions[i:i + 10_000])[1]
+                                      for i in range(0, len(times), 10_000)])
+            entry = {
+                'rows_per_second': round(len(rows) / seconds),
+                'labeled_fraction': round(float(np.mean(peaks != labeling.NAT)), 3),
+                'chunked_agrees': bool(np.array_equal(chunked, peaks)),
+            }
+            if with_naive:
+                naive_seconds, naive = _best_of(lambda: naive_labels(rows, events, horizon, by_region), 1)
+                entry['naive_rows_per_second'] = round(len(rows) / naive_seconds)
+                entry['naive_agrees'] = bool(np.array_equal(naive, peaks))
+            results['joins'][f"{'region' if by_region else 'time'} {horizon}h"] = entry
+
+    if with_csv:
+        rows_csv = os.path.join(directory, f'rows-{scale}.csv')
+        rows.to_csv(rows_csv, index=False)
+        summary = labeling.label_csv(rows_csv, region_index, os.path.join(directory, f'labeled-{scale}.csv'),
+                                     horizon_hours=24, region_column='NOAA_AR', chunksize=50_000)
+        results['csv_rows_per_second'] = round(summary['rows'] / summary['seconds'])
+    return results
+
+
+def run(quick=False):
+    scales = (1, 10) if quick else (1, 10, 100)
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for scale in scales:
+            results[f'{scale}x'] = bench_scale(scale, repeat=1 if quick else 3, with_csv=scale <= 10 or not quick,
+                                               with_naive=scale == 1, directory=directory)
+    return {'labeling': results}
+
+
+if __name__ == "__main__":
+    results = run()['labeling']
+    print_table(['scale', 'rows', 'events', 'index build ms', 'CSV rows/s (streamed)'],
+                [[scale, r['rows'], r['events'], r['index_build_ms'], r.get('csv_rows_per_second', '-')]
+                 for scale, r in results.items()])
+    print()
+    print_table(['scale', 'join', 'rows/s', 'labeled', 'chunked ok', 'naive rows/s', 'naive ok'],
+                [[scale, name, j['rows_per_second'], j['labeled_fraction'], j['chunked_agrees'],
+                  j.get('naive_rows_per_second', '-'), j.get('naive_agrees', '-')]
+                 for scale, r in results.items() for name, j in r['joins'].items()])
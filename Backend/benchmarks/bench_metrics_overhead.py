@@ -0,0 +1,131 @@
+# backend/benchmarks/bench_metrics_overhead.py
+"""
+Cost of the /metrics instrumentation on the prediction hot path.
+
+The same single-row predict_flare_anomaly call and a 1000-row
+predict_flare_anomaly_batch call are timed with recording on and off
+(metrics.set_enabled), interleaved so both see the same cache/CPU state.
+The per-operation cost of Counter.inc, Histogram.observe and a stage
+timer is measured directly, and the old per-request stdout prints are
+compared with the DEBUG log calls that replaced them (filtered out at the
+default INFO level).
+
+The on/off difference of a ~ms call is within run-to-run noise, so the
+budget is checked against the modelled cost instead: the metric operations
+one single-row /predict performs (OPS_PER_REQUEST) times their measured
+per-op cost. Budget: at most OVERHEAD_BUDGET of the single-row latency and
+OVERHEAD_BUDGET_US microseconds per request; exits 1 otherwise.
+
+Run from the backend directory:  python benchmarks/bench_metrics_overhead.py
+"""
+import io
+import logging
+import sys
+import contextlib
+import warnings
+
+from _common import setup_backend, quiet, best_of, load_feature_matrix
+
+setup_backend()
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+OVERHEAD_BUDGET = 0.10
+OVERHEAD_BUDGET_US = 20.0
+
+# One gated single-row /predict: stage timers (validation, cap_outliers, rf,
+# iso, serialization), counters (requests, rows, gate hit) and the
+# request-latency histogram
+OPS_PER_REQUEST = {"stage_timer_us": 5, "counter_inc_us": 3, "histogram_observe_us": 1}
+
+
+def _per_call_us(fn, number):
+    return best_of(fn, repeat=7, number=number) / number * 1e6
+
+
+def run(quick=False):
+    import metrics
+    with quiet():
+        import model_utils
+        model_utils.registry.get()
+
+    rows = load_feature_matrix(1000)
+    single = rows[0].tolist()
+    number = 50 if quick else 200
+
+    def predict_single():
+        model_utils.predict_flare_anomaly(single)
+
+    def predict_batch():
+        model_utils.predict_flare_anomaly_batch(rows)
+
+    results = {}
+    for name, fn, n in (("single_row", predict_single, number), ("batch_1000", predict_batch, max(5, number // 20))):
+        fn()  # warm
+        on, off = [], []
+        for _ in range(5):
+            metrics.set_enabled(True)
+            on.append(_per_call_us(fn, n))
+            metrics.set_enabled(False)
+            off.append(_per_call_us(fn, n))
+        metrics.set_enabled(True)
+        results[name] = {"enabled_us": min(on), "disabled_us": min(off),
+                         "overhead_us": min(on) - min(off), "overhead_pct": (min(on) - min(off)) / min(off) * 100}
+
+    hist, counter = metrics.PREDICT_STAGE_SECONDS, metrics.PREDICT_ROWS
+
+    def timed_block():
+        with hist.time("bench"):
+            pass
+
+    ops = {
+        "counter_inc_us": _per_call_us(lambda: counter.inc(), 20000),
+        "histogram_observe_us": _per_call_us(lambda: hist.observe(1e-4, "bench"), 20000),
+        "stage_timer_us": _per_call_us(timed_block, 20000),
+        "render_us": _per_call_us(metrics.render, 200),
+    }
+    metrics.reset_all()
+
+    # The four per-request prints the hot path used to make vs the DEBUG logs that replaced them
+    logger = logging.getLogger("model_utils")
+    sink = io.StringIO()
+
+    def old_prints():
+        with contextlib.redirect_stdout(sink):
+            print("🔧 Processing 23 HMI features...")
+            print("✅ Preprocessed 23 features successfully")
+            print("🎯 Anomaly detection: score=-0.050, is_anomaly=False")
+            print("✅ Two-stage prediction: 41.0% significance -> M-Class")
+        sink.seek(0)
+        sink.truncate()
+
+    def new_logs():
+        logger.debug("🔧 Processing %d HMI features...", 23)
+        logger.debug("✅ Preprocessed %d features successfully", 23)
+        logger.debug("🎯 Anomaly detection: score=%.3f, is_anomaly=%s", -0.05, False)
+        logger.debug("✅ Two-stage prediction: %.1f%% significance -> %s", 41.0, "M-Class")
+
+    logging_cost = {"prints_to_buffer_us": _per_call_us(old_prints, 5000),
+                    "debug_logs_filtered_us": _per_call_us(new_logs, 5000)}
+
+    modelled_us = sum(ops[op] * count for op, count in OPS_PER_REQUEST.items())
+    modelled_pct = modelled_us / results["single_row"]["disabled_us"] * 100
+    within_budget = modelled_pct <= OVERHEAD_BUDGET * 100 and modelled_us <= OVERHEAD_BUDGET_US
+    return {"metrics_overhead": {"pipeline": results, "operations": ops, "logging": logging_cost,
+                                 "modelled_request_overhead_us": modelled_us, "modelled_request_overhead_pct": modelled_pct,
+                                 "budget_pct": OVERHEAD_BUDGET * 100, "budget_us": OVERHEAD_BUDGET_US,
+                                 "within_budget": within_budget}}
+
+
+if __name__ == "__main__":
+    out = run()["metrics_overhead"]
+    for name, r in out["pipeline"].items():
+        print(f"{name:>10}: {r['disabled_us']:9.1f} us off  {r['enabled_us']:9.1f} us on  "
+              f"overhead {r['overhead_us']:+.1f} us ({r['overhead_pct']:+.2f}%)")
+    print("per op: " + ", ".join(f"{k} {v:.2f}" for k, v in out["operations"].items()))
+    print(f"4 prints (to a buffer) {out['logging']['prints_to_buffer_us']:.2f} us vs "
+          f"4 filtered debug logs {out['logging']['debug_logs_filtered_us']:.2f} us")
+    print(f"modelled instrumentation cost per single-row request: {out['modelled_request_overhead_us']:.1f} us "
+          f"({out['modelled_request_overhead_pct']:.2f}%)")
+    print(f"budget: <= {out['budget_pct']:.0f}% and <= {out['budget_us']:.0f} us per single-row request -> "
+          f"{'OK' if out['within_budget'] else 'EXCEEDED'}")
+    sys.exit(0 if out["within_budget"] else 1)
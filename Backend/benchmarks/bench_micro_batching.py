@@ -0,0 +1,82 @@
+# backend/benchmarks/bench_micro_batching.py
+"""
+Throughput/latency tradeoff of the /predict micro-batcher versus the
+per-request path, with many concurrent callers.
+
+Both paths go through the same InferencePool (4 worker threads); the
+per-request path runs predict_flare_anomaly once per call, the batched path
+goes through MicroBatcher.submit with a sweep of max-wait / max-batch knobs
+(with at least max-batch concurrent callers so batches can fill).
+
+Run from the backend directory:  python benchmarks/bench_micro_batching.py
+"""
+import asyncio
+import time
+import warnings
+
+from _common import setup_backend, quiet, load_feature_matrix, percentile, print_table
+
+setup_backend()
+warnings.filterwarnings("ignore")
+
+with quiet():
+    import model_utils
+from inference_pool import InferencePool
+from micro_batcher import MicroBatcher
+
+CONCURRENCY = 64
+KNOBS = [(1, 16), (2, 32), (5, 64), (10, 128), (20, 256)]  # (max_wait_ms, max_batch)
+
+
+async def drive(call, rows, n_requests, concurrency):
+    """`concurrency` clients issue n_requests calls in total; returns (req/s, latencies)"""
+    latencies = []
+    counter = iter(range(n_requests))
+
+    async def client():
+        for i in counter:
+            start = time.perf_counter()
+            await call(rows[i % len(rows)])
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return n_requests / (time.perf_counter() - start), latencies
+
+
+async def run_async(quick):
+    rows = load_feature_matrix(512).tolist()
+    pool = InferencePool(max_workers=4, queue_depth=10_000)
+    results = []
+
+    n_single = 100 if quick else 300
+    with quiet():
+        rps, lat = await drive(lambda f: pool.run(model_utils.predict_flare_anomaly, f), rows, n_single, CONCURRENCY)
+    results.append({"mode": "per-request", "max_wait_ms": None, "max_batch": None, "req_per_s": rps,
+                    "p50_ms": percentile(lat, 50) * 1000, "p99_ms": percentile(lat, 99) * 1000})
+
+    n_batched = 2000 if quick else 10000
+    for max_wait_ms, max_batch in (KNOBS[:3] if quick else KNOBS):
+        batcher = MicroBatcher(model_utils.predict_flare_anomaly_rows, pool.run, max_wait_ms=max_wait_ms, max_batch=max_batch)
+        await batcher.start()
+        with quiet():
+            rps, lat = await drive(batcher.submit, rows, n_batched, max(CONCURRENCY, max_batch))
+        await batcher.stop()
+        results.append({"mode": "micro-batched", "max_wait_ms": max_wait_ms, "max_batch": max_batch,
+                        "req_per_s": rps, "p50_ms": percentile(lat, 50) * 1000, "p99_ms": percentile(lat, 99) * 1000,
+                        "mean_batch_size": batcher.stats()["mean_batch_size"]})
+    pool.shutdown()
+    return results
+
+
+def run(quick=False):
+    return {"micro_batching": asyncio.run(run_async(quick))}
+
+
+if __name__ == "__main__":
+    results = run()["micro_batching"]
+    print_table(
+        ["mode", "max wait ms", "max batch", "req/s", "p50 ms", "p99 ms", "mean batch"],
+        [[r["mode"], r["max_wait_ms"] or "-", r["max_batch"] or "-", f"{r['req_per_s']:,.0f}",
+          f"{r['p50_ms']:.1f}", f"{r['p99_ms']:.1f}", f"{r.get('mean_batch_size', 1):.1f}"] for r in results],
+    )
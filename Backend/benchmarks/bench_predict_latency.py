@@ -0,0 +1,77 @@
+# backend/benchmarks/bench_predict_latency.py
+"""
+Single-row POST /predict latency through the full FastAPI stack, in
+process: an httpx client on an ASGITransport drives main.app (routing,
+body parsing, validation, the inference pool, JSON encoding) without a
+socket or a server process, so the numbers are the app's own overhead
+plus the model.
+
+Every request sends a different real HMI row and the prediction cache is
+disabled, so each one is scored. Reported per scenario: p50 / p95 / p99
+and mean latency, and sequential requests/second.
+
+Run from the backend directory:  python benchmarks/bench_predict_latency.py
+"""
+import asyncio
+import os
+import time
+import warnings
+
+from _common import setup_backend, quiet, load_feature_matrix, percentile, print_table
+
+setup_backend()
+warnings.filterwarnings("ignore")
+
+# Offline, uncached, no background warm-up racing the first requests
+os.environ.update(XRAY_INGEST="0", DONKI_POLL="0", PREDICTION_CACHE_SIZE="0", MODEL_WARMUP="0", LOG_LEVEL="WARNING")
+
+import httpx  # noqa: E402
+
+with quiet():
+    import main  # noqa: E402
+
+
+async def measure(client, rows, n_requests, path="/predict", batch=1):
+    latencies = []
+    warm = await client.post(path, json={"features": rows[0] if batch == 1 else rows[:batch]})
+    assert warm.status_code == 200, warm.text[:200]
+    start = time.perf_counter()
+    for i in range(n_requests):
+        body = rows[i % len(rows)] if batch == 1 else rows[(i * batch) % len(rows):][:batch]
+        t0 = time.perf_counter()
+        response = await client.post(path, json={"features": body})
+        latencies.append(time.perf_counter() - t0)
+        assert response.status_code == 200, response.text[:200]
+    elapsed = time.perf_counter() - start
+    return {
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+        "requests_per_second": round(n_requests / elapsed, 1),
+    }
+
+
+async def run_async(rows, n_requests):
+    transport = httpx.ASGITransport(app=main.app)
+    # The lifespan starts (and on exit shuts down) the inference pool
+    async with main.app.router.lifespan_context(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            return {
+                "predict": await measure(client, rows, n_requests),
+                "predict/batch x100": await measure(client, rows, max(20, n_requests // 20), "/predict/batch", 100),
+            }
+
+
+def run(quick=False):
+    n_requests = 200 if quick else 2000
+    rows = load_feature_matrix().tolist()
+    return {"predict_latency": {"requests": n_requests, "results": asyncio.run(run_async(rows, n_requests))}}
+
+
+if __name__ == "__main__":
+    results = run()["predict_latency"]
+    print(f"{results['requests']} sequential in-process requests, prediction cache off")
+    print_table(["endpoint", "p50 ms", "p95 ms", "p99 ms", "mean ms", "req/s"],
+                [[name, r["p50_ms"], r["p95_ms"], r["p99_ms"], r["mean_ms"], r["requests_per_second"]]
+                 for name, r in results["results"].items()])
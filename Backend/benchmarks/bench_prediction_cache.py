@@ -0,0 +1,95 @@
+# backend/benchmarks/bench_prediction_cache.py
+"""
+Latency of single-row predict_flare_anomaly with and without the
+prediction cache on a request stream with a realistic duplicate rate.
+
+The stream mimics dashboards polling and clients retrying: each request
+repeats one of the last RECENT_WINDOW vectors with probability
+DUPLICATE_RATE, otherwise it is a new SHARP row. A second stream repeats
+vectors with tiny float noise (as after a JSON round trip through another
+language) to show what mantissa quantization buys.
+
+Run from the backend directory:  python benchmarks/bench_prediction_cache.py
+"""
+import time
+import warnings
+
+import numpy as np
+
+from _common import setup_backend, quiet, load_feature_matrix, percentile, print_table
+
+setup_backend()
+warnings.filterwarnings("ignore")
+
+DUPLICATE_RATE = 0.35
+RECENT_WINDOW = 500
+
+
+def make_stream(rows, n_requests, duplicate_rate=DUPLICATE_RATE, noise=0.0, seed=0):
+    rng = np.random.default_rng(seed)
+    stream, fresh = [], 0
+    for _ in range(n_requests):
+        if stream and rng.random() < duplicate_rate:
+            base = np.array(stream[-rng.integers(1, min(len(stream), RECENT_WINDOW) + 1)])
+            if noise:
+                base = base * (1 + rng.uniform(-noise, noise, base.shape))
+            stream.append(base.tolist())
+        else:
+            stream.append(rows[fresh % len(rows)].tolist())
+            fresh += 1
+    return stream
+
+
+def _replay(model_utils, stream, cache):
+    model_utils.prediction_cache = cache
+    latencies, hit_latencies, miss_latencies = [], [], []
+    for features in stream:
+        hits = cache.hits if cache else 0
+        start = time.perf_counter()
+        model_utils.predict_flare_anomaly(features)
+        elapsed = (time.perf_counter() - start) * 1e6
+        latencies.append(elapsed)
+        (hit_latencies if cache and cache.hits > hits else miss_latencies).append(elapsed)
+    return {
+        "mean_us": float(np.mean(latencies)),
+        "hit_p50_us": percentile(hit_latencies, 50),
+        "miss_p50_us": percentile(miss_latencies, 50),
+        "p50_us": percentile(latencies, 50),
+        "p99_us": percentile(latencies, 99),
+        "hit_rate": cache.stats()["hit_rate"] if cache else 0.0,
+    }
+
+
+def run(quick=False):
+    from prediction_cache import PredictionCache
+    with quiet():
+        import model_utils
+        model_utils.registry.get()
+    original = model_utils.prediction_cache
+
+    rows = load_feature_matrix()
+    n_requests = 1000 if quick else 5000
+    exact = make_stream(rows, n_requests)
+    noisy = make_stream(rows, n_requests, noise=1e-12, seed=1)
+    _replay(model_utils, exact[:200], None)  # warm up
+
+    results = {
+        "no_cache": _replay(model_utils, exact, None),
+        "cache_exact": _replay(model_utils, exact, PredictionCache()),
+        "noisy_no_quantization": _replay(model_utils, noisy, PredictionCache()),
+        "noisy_24_bit_mantissa": _replay(model_utils, noisy, PredictionCache(mantissa_bits=24)),
+    }
+    model_utils.prediction_cache = original
+    return {"prediction_cache": {"requests": n_requests, "duplicate_rate": DUPLICATE_RATE, "results": results}}
+
+
+if __name__ == "__main__":
+    out = run()["prediction_cache"]
+    print(f"{out['requests']} requests, {out['duplicate_rate']:.0%} duplicates from the last {RECENT_WINDOW}")
+    base = out["results"]["no_cache"]["mean_us"]
+    print_table(
+        ["stream / cache", "hit rate", "mean us", "p50 us", "p99 us", "hit p50 us", "miss p50 us", "mean speedup"],
+        [[name, f"{r['hit_rate']:.1%}", f"{r['mean_us']:.1f}", f"{r['p50_us']:.1f}", f"{r['p99_us']:.1f}",
+          f"{r['hit_p50_us']:.1f}", f"{r['miss_p50_us']:.1f}",
+          f"{base / r['mean_us']:.2f}x"] for name, r in out["results"].items()],
+    )
@@ -0,0 +1,106 @@
+# backend/benchmarks/bench_preprocessing.py
+"""
+Preprocessing microbenchmark: the previous pandas path (one-row DataFrame,
+ffill/bfill/fillna, per-column np.clip in a loop over the ranges) against
+the NumPy path (NaN fill + one np.clip over precomputed bound vectors).
+
+Sizes: 1 row, and 10k rows - the old function once per row (how a stream
+of single requests pays for it; timed on 1000 rows and scaled), the old column loop over one 10k-row
+DataFrame, and preprocess_hmi_batch on the whole (10000, 23) array.
+Outputs are checked to be identical, including rows with NaNs and
+out-of-range values.
+
+Run from the backend directory:  python benchmarks/bench_preprocessing.py
+"""
+import sys
+
+import numpy as np
+
+from _common import setup_backend, quiet, best_of, load_feature_matrix, print_table
+
+setup_backend()
+
+
+def legacy_cap_outliers(df, ranges):
+    for col in df.columns:
+        if col in ranges:
+            min_val, max_val = ranges[col]
+            df[col] = np.clip(df[col], min_val, max_val)
+    return df
+
+
+def legacy_preprocess(input_features, feature_names, ranges):
+    """preprocess_hmi_data as it was before the NumPy rewrite"""
+    import pandas as pd
+
+    if len(input_features) != len(feature_names):
+        raise ValueError("wrong number of features")
+    features_df = pd.DataFrame([input_features], columns=feature_names)
+    features_df = features_df.ffill().bfill()
+    features_df = features_df.fillna(0)
+    features_df = legacy_cap_outliers(features_df, ranges)
+    return features_df.values[0]
+
+
+def _with_edge_cases(rows):
+    rows = rows.copy()
+    rows[::7, 3] = np.nan
+    rows[::11, 0] = 1e9        # R_VALUE far above its range
+    rows[::13, 15] = -50.0     # MEANJZD below its range
+    return rows
+
+
+def run(quick=False):
+    import pandas as pd
+    with quiet():
+        import model_utils
+        bundle = model_utils.registry.get()
+    names, ranges = bundle.feature_names, model_utils.HMI_FEATURE_RANGES
+
+    rows = _with_edge_cases(load_feature_matrix(10000))
+    single = rows[0].tolist()
+
+    # Parity first
+    expected = np.array([legacy_preprocess(r.tolist(), names, ranges) for r in rows[:500]])
+    new_single = np.array([model_utils.preprocess_hmi_data(r.tolist()) for r in rows[:500]])
+    new_batch = model_utils.preprocess_hmi_batch(rows[:500])
+    parity = bool(np.array_equal(expected, new_single) and np.array_equal(expected, new_batch))
+
+    # The pandas path takes ~15 ms per row: time a slice and scale it to 10k rows
+    n_loop = 200 if quick else 1000
+    legacy_single_us = best_of(lambda: legacy_preprocess(single, names, ranges), repeat=5, number=200) / 200 * 1e6
+    new_single_us = best_of(lambda: model_utils.preprocess_hmi_data(single), repeat=5, number=2000) / 2000 * 1e6
+    legacy_loop_ms = best_of(lambda: [legacy_preprocess(r, names, ranges) for r in rows[:n_loop].tolist()], repeat=1) * 1e3
+    new_loop_ms = best_of(lambda: [model_utils.preprocess_hmi_data(r) for r in rows[:n_loop].tolist()], repeat=3) * 1e3
+    frame = pd.DataFrame(rows, columns=names)
+    legacy_frame_ms = best_of(lambda: legacy_cap_outliers(frame.fillna(0), ranges), repeat=5) * 1e3
+    new_batch_ms = best_of(lambda: model_utils.preprocess_hmi_batch(rows), repeat=5) * 1e3
+
+    scale = 10000 / n_loop
+    return {"preprocessing": {
+        "parity": parity,
+        "single_row": {"legacy_us": legacy_single_us, "numpy_us": new_single_us},
+        "rows_10k": {
+            "legacy_per_row_ms": legacy_loop_ms * scale,
+            "numpy_per_row_ms": new_loop_ms * scale,
+            "legacy_dataframe_ms": legacy_frame_ms,
+            "numpy_batch_ms": new_batch_ms,
+        },
+    }}
+
+
+if __name__ == "__main__":
+    out = run()["preprocessing"]
+    s, b = out["single_row"], out["rows_10k"]
+    print_table(
+        ["case", "pandas (before)", "numpy (now)", "speedup"],
+        [
+            ["1 row", f"{s['legacy_us']:.1f} us", f"{s['numpy_us']:.1f} us", f"{s['legacy_us'] / s['numpy_us']:.0f}x"],
+            ["10k rows, one call per row", f"{b['legacy_per_row_ms']:.0f} ms", f"{b['numpy_per_row_ms']:.0f} ms",
+             f"{b['legacy_per_row_ms'] / b['numpy_per_row_ms']:.0f}x"],
+            ["10k rows, one call", f"{b['legacy_dataframe_ms']:.2f} ms", f"{b['numpy_batch_ms']:.2f} ms",
+             f"{b['legacy_dataframe_ms'] / b['numpy_batch_ms']:.1f}x"],
+        ],
+    )
+    print(f"parity with the pandas path: {'OK' if out['parity'] else 'MISMATCH'}")
+    sys.exit(0 if out["parity"] else 1)
@@ -0,0 +1,173 @@
+# backend/benchmarks/bench_region_features.py
+"""
+Streaming SHARP updates across many active regions (region_features.py).
+
+1. engine only: updates/second for 100 / 500 / 1000 concurrently tracked
+   regions, interleaved round-robin at the 12-minute SHARP cadence (some
+   updates skip bins to exercise gap filling), versus recomputing the
+   same deltas / slopes / EWMA from each region's stored history on every
+   update - which slows down as the history grows (1 day and 2 weeks)
+2. end to end: POST /regions/{id}/update (update + a fresh prediction)
+   through main.app with an in-process ASGI client, several concurrent
+   callers spread over the regions
+
+Run from the backend directory:  python benchmarks/bench_region_features.py
+"""
+import asyncio
+import os
+import time
+import warnings
+
+import numpy as np
+
+from _common import setup_backend, quiet, load_feature_matrix, percentile, print_table
+
+setup_backend()
+warnings.filterwarnings("ignore")
+
+os.environ.update(XRAY_INGEST="0", DONKI_POLL="0", PREDICTION_CACHE_SIZE="0", MODEL_WARMUP="0", LOG_LEVEL="WARNING")
+
+import httpx  # noqa: E402
+
+with quiet():
+    import main  # noqa: E402
+    from model_utils import HMI_FEATURE_RANGES  # noqa: E402
+from region_features import RegionFeatureEngine  # noqa: E402
+
+FEATURE_NAMES = list(HMI_FEATURE_RANGES)
+START = 1_700_000_000
+CADENCE = 720
+
+
+def update_stream(n_regions, rounds, seed=5, prefix="AR"):
+    """[(region_id, epoch, parameters)] round-robin over the regions, ~10% of steps skip 1-3 bins"""
+    rng = np.random.default_rng(seed)
+    rows = load_feature_matrix()
+    clocks = np.full(n_regions, START)
+    stream = []
+    for _ in range(rounds):
+        steps = CADENCE * np.where(rng.random(n_regions) < 0.1, rng.integers(2, 5, n_regions), 1)
+        clocks += steps
+        picks = rng.integers(0, len(rows), n_regions)
+        for region in range(n_regions):
+            stream.append((f"{prefix}{13000 + region}", int(clocks[region]),
+                           dict(zip(FEATURE_NAMES, rows[picks[region]].tolist()))))
+    return stream
+
+
+class HistoryRecompute:
+    """Baseline: keep every update per region and recompute the features from it each time"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.history = {}
+
+    def append(self, region_id, epoch, parameters):
+        times, values = self.history.setdefault(region_id, ([], []))
+        times.append(epoch)
+        values.append([parameters[p] for p in self.engine.tracked])
+
+    def update(self, region_id, epoch, parameters):
+        self.append(region_id, epoch, parameters)
+        times, values = self.history[region_id]
+        t = np.array(times, dtype=np.float64)
+        v = np.array(values)
+        features = []
+        for hours in self.engine.windows_hours:
+            inside = t > epoch - hours * 3600
+            tw, vw = (t[inside] - epoch) / 3600, v[inside]
+            back = np.searchsorted(t, epoch - hours * 3600)
+            features.append(v[-1] - v[back] if back < len(t) else np.nan)
+            features.append(np.polyfit(tw, vw, 1)[0] if len(tw) >= 2 else np.nan)
+            weights = np.exp((t - epoch) / (hours * 3600))
+            features.append((weights[:, None] * v).sum(axis=0) / weights.sum())
+        return features
+
+
+def bench_engine(n_regions, rounds):
+    stream = update_stream(n_regions, rounds)
+    engine = RegionFeatureEngine(FEATURE_NAMES, capacity=max(1024, n_regions))
+    start = time.perf_counter()
+    for region_id, epoch, parameters in stream:
+        engine.update(region_id, epoch, parameters)
+    engine_seconds = time.perf_counter() - start
+    return {
+        "updates": len(stream),
+        "updates_per_second": round(len(stream) / engine_seconds),
+        "us_per_update": round(engine_seconds / len(stream) * 1e6, 2),
+    }
+
+
+def bench_recompute(history_lengths, n_regions=100):
+    """
+    Baseline updates/second once every region already holds `history` updates -
+    its cost per update depends on the history length, not on the number of regions
+    """
+    results = {}
+    for history in history_lengths:
+        stream = update_stream(n_regions, history + 1)
+        baseline = HistoryRecompute(RegionFeatureEngine(FEATURE_NAMES, capacity=n_regions))
+        for region_id, epoch, parameters in stream[:-n_regions]:
+            baseline.append(region_id, epoch, parameters)
+        start = time.perf_counter()
+        for region_id, epoch, parameters in stream[-n_regions:]:
+            baseline.update(region_id, epoch, parameters)
+        results[str(history)] = {"updates_per_second": round(n_regions / (time.perf_counter() - start))}
+    return results
+
+
+async def _drive_endpoint(client, stream, concurrency):
+    latencies = []
+    # Each caller owns a disjoint set of regions, so per-region updates stay in time order
+    lanes = [[u for u in stream if int(u[0][-5:]) % concurrency == lane] for lane in range(concurrency)]
+
+    async def caller(updates):
+        for region_id, epoch, parameters in updates:
+            t0 = time.perf_counter()
+            response = await client.post(f"/regions/{region_id}/update", json={
+                "parameters": parameters, "time": f"{np.datetime64(epoch, 's')}Z"})
+            latencies.append(time.perf_counter() - t0)
+            assert response.status_code == 200, response.text[:200]
+
+    start = time.perf_counter()
+    await asyncio.gather(*(caller(lane) for lane in lanes))
+    elapsed = time.perf_counter() - start
+    return {
+        "updates": len(stream),
+        "updates_per_second": round(len(stream) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+async def bench_endpoint(region_counts, rounds, concurrency=16):
+    transport = httpx.ASGITransport(app=main.app)
+    # One lifespan for every scenario: leaving it shuts the inference pool down
+    async with main.app.router.lifespan_context(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            return {str(n): await _drive_endpoint(client, update_stream(n, rounds, prefix=f"E{n}-"), concurrency)
+                    for n in region_counts}
+
+
+def run(quick=False):
+    region_counts = (100, 500) if quick else (100, 500, 1000)
+    engine = {str(n): bench_engine(n, rounds=20 if quick else 120) for n in region_counts}
+    # One day and two weeks (a region's disk passage) of 12-minute updates
+    recompute = bench_recompute((120, 1680))
+    endpoint = asyncio.run(bench_endpoint(region_counts[:2], rounds=2 if quick else 5))
+    return {"region_features": {"engine": engine, "recompute": recompute, "endpoint": endpoint}}
+
+
+if __name__ == "__main__":
+    results = run()["region_features"]
+    print_table(["regions", "updates", "updates/s", "us/update"],
+                [[n, r["updates"], r["updates_per_second"], r["us_per_update"]] for n, r in results["engine"].items()])
+    print()
+    print("Recomputing from each region's stored history instead (100 regions)")
+    print_table(["history (updates)", "updates/s"],
+                [[h, r["updates_per_second"]] for h, r in results["recompute"].items()])
+    print()
+    print("POST /regions/{id}/update, in-process ASGI client, 16 concurrent callers, prediction cache off")
+    print_table(["regions", "updates", "updates/s", "p50 ms", "p99 ms"],
+                [[n, r["updates"], r["updates_per_second"], r["p50_ms"], r["p99_ms"]]
+                 for n, r in results["endpoint"].items()])
@@ -0,0 +1,75 @@
+# backend/benchmarks/bench_startup.py
+"""
+Cold start: interpreter launch -> `import main` -> first successful
+prediction, measured in fresh subprocesses.
+
+Compares the compiled-forest path (default) with USE_COMPILED_FORESTS=0,
+which has to import sklearn and unpickle both estimators.
+
+Run from the backend directory:  python benchmarks/bench_startup.py
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+
+from _common import setup_backend, BACKEND_DIR, print_table
+
+setup_backend()
+
+CHILD = r"""
+import contextlib, io, json, resource, sys, time
+t0 = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    import main
+    t1 = time.perf_counter()
+    from model_registry import registry
+    import model_utils
+    features = [0.0] * len(registry.get().feature_names)
+    model_utils.predict_flare_anomaly(features)
+t2 = time.perf_counter()
+print(json.dumps({
+    "import_main_ms": (t1 - t0) * 1000,
+    "first_prediction_ms": (t2 - t1) * 1000,
+    "load_times_ms": registry.status()["load_times_ms"],
+    "sklearn_imported": "sklearn" in sys.modules,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}))
+"""
+
+SCENARIOS = [
+    ("compiled (default)", {}),
+    ("sklearn pickles", {"USE_COMPILED_FORESTS": "0"}),
+]
+
+
+def measure(env, runs):
+    samples = []
+    for _ in range(runs):
+        proc_env = dict(os.environ, MODEL_WARMUP="0", **env)
+        start = time.perf_counter()
+        out = subprocess.run([sys.executable, "-W", "ignore", "-c", CHILD], cwd=BACKEND_DIR, env=proc_env,
+                             capture_output=True, text=True, check=True).stdout
+        total = (time.perf_counter() - start) * 1000
+        result = json.loads(out.strip().splitlines()[-1])
+        result["process_total_ms"] = total
+        samples.append(result)
+    # Report the fastest run (least disturbed by other activity)
+    return min(samples, key=lambda r: r["process_total_ms"])
+
+
+def run(quick=False):
+    runs = 2 if quick else 5
+    return {"startup": {name: measure(env, runs) for name, env in SCENARIOS}}
+
+
+if __name__ == "__main__":
+    results = run()["startup"]
+    print_table(
+        ["mode", "import main ms", "first prediction ms", "process total ms", "max RSS MB", "sklearn imported"],
+        [[name, f"{r['import_main_ms']:.0f}", f"{r['first_prediction_ms']:.0f}", f"{r['process_total_ms']:.0f}",
+          f"{r['max_rss_mb']:.0f}", r["sklearn_imported"]] for name, r in results.items()],
+    )
+    for name, r in results.items():
+        print(f"{name}: per-artifact load ms {r['load_times_ms']}")
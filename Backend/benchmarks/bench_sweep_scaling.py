@@ -0,0 +1,50 @@
+# backend/benchmarks/bench_sweep_scaling.py
+"""
+Scaling of `train_models.py sweep`: wall time of the same fixed set of
+configs (a small RF + IsolationForest sample, 3-fold CV) at 1, 2, 4 and
+N (= os.cpu_count()) worker processes, each into a fresh sweep directory
+so nothing is resumed. Speedup and parallel efficiency are relative to
+the 1-worker run; on a machine with fewer cores than workers the extra
+processes only time-slice, so expect flat or slightly worse numbers there.
+
+Run from the backend directory:  python benchmarks/bench_sweep_scaling.py
+"""
+import os
+import tempfile
+import time
+
+from _common import setup_backend, quiet, print_table
+
+setup_backend()
+
+
+def run(quick=False):
+    import model_sweep
+
+    configs = model_sweep.build_configs(n_iter=2 if quick else 6, seed=7)
+    cpus = os.cpu_count() or 1
+    worker_counts = sorted({1, 2, 4, cpus}) if not quick else sorted({1, 2})
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for workers in worker_counts:
+            start = time.perf_counter()
+            with quiet():
+                model_sweep.run_sweep(name=f"w{workers}", n_workers=workers, folds=3,
+                                      configs=configs, sweep_root=tmp)
+            results.append({"workers": workers, "configs": len(configs),
+                            "seconds": time.perf_counter() - start})
+    base = results[0]["seconds"]
+    for r in results:
+        r["speedup"] = base / r["seconds"]
+        r["efficiency"] = r["speedup"] / r["workers"]
+    return {"sweep_scaling": {"cpu_count": cpus, "results": results}}
+
+
+if __name__ == "__main__":
+    out = run()["sweep_scaling"]
+    print(f"cpu_count={out['cpu_count']}")
+    print_table(
+        ["workers", "configs", "wall s", "speedup", "efficiency"],
+        [[r["workers"], r["configs"], f"{r['seconds']:.1f}", f"{r['speedup']:.2f}x", f"{r['efficiency']:.0%}"]
+         for r in out["results"]],
+    )
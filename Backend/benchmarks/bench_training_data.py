@@ -0,0 +1,104 @@
+# backend/benchmarks/bench_training_data.py
+"""
+Peak RSS and wall time of getting the training matrices, current path
+(pd.read_csv of the whole file) versus the typed columnar cache
+(memory-mapped float32 feature columns + int8 flare_category).
+
+HMI_CLEANED_DATA.csv is tiled into larger synthetic copies to show how
+both paths scale; each measurement runs in a fresh subprocess. The cache
+build (one-off per source file) is reported separately, and a full
+train_flare_models run is timed on the real file for both paths.
+
+Run from the backend directory:  python benchmarks/bench_training_data.py
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from _common import setup_backend, BACKEND_DIR, print_table
+
+setup_backend()
+
+SCALES = [1, 10, 50]
+
+CHILD = r"""
+import json, resource, sys, time, warnings
+warnings.filterwarnings('ignore')
+csv_path, mode = sys.argv[1], sys.argv[2]
+import data_cache   # HMI_CACHE_DIR is set by the parent
+import train_models
+from sklearn.model_selection import train_test_split
+start = time.perf_counter()
+if mode == 'train':
+    import contextlib, io, tempfile
+    with contextlib.redirect_stdout(io.StringIO()), tempfile.TemporaryDirectory() as model_dir:
+        train_models.train_flare_models(csv_path, model_dir=model_dir, use_cache=sys.argv[3] == 'cache')
+else:
+    if mode == 'csv':
+        X, y, _ = train_models.load_training_data(csv_path, use_cache=False)
+    else:
+        X = data_cache.load_feature_matrix(train_models.FEATURE_COLUMNS, csv_path, data_cache.CACHE_DIR)
+        y = data_cache.load_flare_categories(csv_path, data_cache.CACHE_DIR)[0]
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+print(json.dumps({"seconds": time.perf_counter() - start,
+                  "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+"""
+
+
+def _child(cache_dir, *args):
+    env = dict(os.environ, HMI_CACHE_DIR=cache_dir)
+    out = subprocess.run([sys.executable, "-c", CHILD, *args], cwd=BACKEND_DIR, env=env,
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def _tiled_csv(directory, scale):
+    src = os.path.join(BACKEND_DIR, "HMI_CLEANED_DATA.csv")
+    if scale == 1:
+        return src
+    path = os.path.join(directory, f"hmi_x{scale}.csv")
+    with open(src) as f:
+        header, *lines = f.readlines()
+    with open(path, "w") as f:
+        f.write(header)
+        for _ in range(scale):
+            f.writelines(lines)
+    return path
+
+
+def run(quick=False):
+    import data_cache
+
+    scales = SCALES[:2] if quick else SCALES
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in scales:
+            csv_path = _tiled_csv(tmp, scale)
+            cache_dir = os.path.join(tmp, f"cache_x{scale}")
+            manifest = data_cache.build_columnar_cache(csv_path, cache_dir)
+            csv_run = _child(cache_dir, csv_path, "csv")
+            cache_run = _child(cache_dir, csv_path, "cache")
+            results.append({
+                "scale": scale, "rows": manifest["rows"], "cache_build_s": manifest["build_seconds"],
+                "csv_s": csv_run["seconds"], "csv_peak_rss_mb": csv_run["peak_rss_mb"],
+                "cache_s": cache_run["seconds"], "cache_peak_rss_mb": cache_run["peak_rss_mb"],
+            })
+
+        src = os.path.join(BACKEND_DIR, "HMI_CLEANED_DATA.csv")
+        cache_dir = os.path.join(tmp, "cache_x1")
+        full = {"csv": _child(cache_dir, src, "train", "csv"), "cache": _child(cache_dir, src, "train", "cache")}
+    return {"training_data": {"load": results, "full_training": full}}
+
+
+if __name__ == "__main__":
+    results = run()["training_data"]
+    print_table(
+        ["scale", "rows", "cache build s", "read_csv s", "read_csv peak MB", "cache s", "cache peak MB"],
+        [[r["scale"], r["rows"], f"{r['cache_build_s']:.2f}", f"{r['csv_s']:.3f}", f"{r['csv_peak_rss_mb']:.0f}",
+          f"{r['cache_s']:.3f}", f"{r['cache_peak_rss_mb']:.0f}"] for r in results["load"]],
+    )
+    full = results["full_training"]
+    print(f"\nFull train_flare_models on the shipped CSV: read_csv {full['csv']['seconds']:.2f}s / "
+          f"{full['csv']['peak_rss_mb']:.0f} MB peak, cache {full['cache']['seconds']:.2f}s / {full['cache']['peak_rss_mb']:.0f} MB peak")
@@ -0,0 +1,83 @@
+# backend/benchmarks/bench_upstream_cache.py
+"""
+Upstream calls saved by the pooled client + TTL cache for /solar-now and
+/xray-flux.
+
+A local stub stands in for NASA DONKI and NOAA SWPC (with a fixed response
+delay); uvicorn runs against it and many concurrent "browser tabs" poll
+both endpoints. Without the cache every request was one upstream call, so
+the saving is 1 - upstream_calls / requests. A second phase uses a short TTL
+to show stale-while-revalidate keeping latency flat while refreshes happen.
+
+Run from the backend directory:  python benchmarks/bench_upstream_cache.py
+"""
+import asyncio
+import time
+
+import httpx
+
+from _common import setup_backend, uvicorn_server, percentile, StubUpstream, print_table
+
+setup_backend()
+
+UPSTREAM_DELAY = 0.25  # seconds per stub response
+
+FLARES = [
+    {"flrID": "2024-05-14T16:46:00-FLR-001", "classType": "X8.7", "beginTime": "2024-05-14T16:46Z",
+     "peakTime": "2024-05-14T16:51Z", "endTime": "2024-05-14T17:02Z", "activeRegion": 13664},
+]
+XRAYS = [{"time_tag": f"2024-05-14T16:{m:02d}:00Z", "flux": 1e-6 * (m + 1), "energy": "0.1-0.8nm"} for m in range(60)]
+
+
+async def poll(base_url, clients, rounds, interval):
+    latencies = []
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        async def tab():
+            for _ in range(rounds):
+                for path in ("/solar-now", "/xray-flux"):
+                    start = time.perf_counter()
+                    (await client.get(path)).raise_for_status()
+                    latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(interval)
+
+        await asyncio.gather(*(tab() for _ in range(clients)))
+    return latencies
+
+
+def scenario(clients, rounds, interval, ttl):
+    routes = {"/DONKI/FLR": lambda q: FLARES, "/xrays.json": lambda q: XRAYS}
+    with StubUpstream(routes, delay=UPSTREAM_DELAY) as stub:
+        env = {
+            "NASA_DONKI_URL": stub.url + "/DONKI/FLR",
+            "NOAA_XRAY_URL": stub.url + "/xrays.json",
+            "DONKI_CACHE_TTL": str(ttl),
+            "XRAY_CACHE_TTL": str(ttl),
+            "MODEL_WARMUP": "0",
+        }
+        with uvicorn_server(env=env) as base_url:
+            latencies = asyncio.run(poll(base_url, clients, rounds, interval))
+        upstream_calls = sum(stub.calls.values())
+    requests_made = len(latencies)
+    return {
+        "clients": clients, "requests": requests_made, "upstream_calls": upstream_calls,
+        "upstream_calls_saved": requests_made - upstream_calls,
+        "saved_pct": 100.0 * (1 - upstream_calls / requests_made),
+        "p50_ms": percentile(latencies, 50) * 1000, "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def run(quick=False):
+    rounds = 3 if quick else 5
+    return {"upstream_cache": {
+        "warm_cache (ttl 60s)": scenario(clients=100, rounds=rounds, interval=0.2, ttl=60),
+        "stale_while_revalidate (ttl 0.5s)": scenario(clients=100, rounds=rounds, interval=0.5, ttl=0.5),
+    }}
+
+
+if __name__ == "__main__":
+    results = run()["upstream_cache"]
+    print_table(
+        ["scenario", "clients", "requests", "upstream calls", "saved", "p50 ms", "p99 ms"],
+        [[name, r["clients"], r["requests"], r["upstream_calls"], f"{r['saved_pct']:.1f}%",
+          f"{r['p50_ms']:.1f}", f"{r['p99_ms']:.1f}"] for name, r in results.items()],
+    )
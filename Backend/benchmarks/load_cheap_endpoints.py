@@ -0,0 +1,97 @@
+# backend/benchmarks/load_cheap_endpoints.py
+"""
+Latency of the cheap endpoints while /predict is saturated.
+
+Starts uvicorn in a subprocess, hammers POST /predict from several client
+threads and meanwhile probes GET /system-status and GET / , reporting the
+probe p50/p99 latency. Runs once with INFERENCE_WORKERS=0 (inference inline
+on the event loop - the old behaviour) and once with the bounded pool.
+/xray-flux is left out because it calls NOAA; the event loop effect is the
+same for any cheap endpoint.
+
+Run from the backend directory:  python benchmarks/load_cheap_endpoints.py
+"""
+import http.client
+import json
+import threading
+import time
+from urllib.parse import urlparse
+
+from _common import setup_backend, uvicorn_server, percentile, load_feature_matrix, print_table
+
+setup_backend()
+
+PREDICT_CLIENTS = 16
+PROBE_PATHS = ["/system-status", "/"]
+PROBE_INTERVAL = 0.02
+
+SCENARIOS = [
+    ("inline (event loop)", {"INFERENCE_WORKERS": "0"}),
+    ("pool 4 workers, queue 8", {"INFERENCE_WORKERS": "4", "INFERENCE_QUEUE_DEPTH": "8"}),
+]
+
+
+def _request(conn, method, path, body=None):
+    headers = {"Content-Type": "application/json"} if body is not None else {}
+    start = time.perf_counter()
+    conn.request(method, path, body=body, headers=headers)
+    response = conn.getresponse()
+    response.read()
+    return response.status, time.perf_counter() - start
+
+
+def run_scenario(base_url, duration, feature_rows):
+    host = urlparse(base_url)
+    stop = threading.Event()
+    predict_status = {}
+    probe_latencies = {path: [] for path in PROBE_PATHS}
+    lock = threading.Lock()
+
+    def predict_client(i):
+        conn = http.client.HTTPConnection(host.hostname, host.port, timeout=60)
+        body = json.dumps({"features": feature_rows[i % len(feature_rows)]})
+        while not stop.is_set():
+            status, _ = _request(conn, "POST", "/predict", body)
+            with lock:
+                predict_status[status] = predict_status.get(status, 0) + 1
+
+    def probe(path):
+        conn = http.client.HTTPConnection(host.hostname, host.port, timeout=60)
+        while not stop.is_set():
+            _, elapsed = _request(conn, "GET", path)
+            probe_latencies[path].append(elapsed)
+            time.sleep(PROBE_INTERVAL)
+
+    threads = [threading.Thread(target=predict_client, args=(i,)) for i in range(PREDICT_CLIENTS)]
+    threads += [threading.Thread(target=probe, args=(p,)) for p in PROBE_PATHS]
+    for t in threads:
+        t.start()
+    time.sleep(duration)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    result = {"predict_status_counts": predict_status, "predict_rps": sum(predict_status.values()) / duration}
+    for path, lat in probe_latencies.items():
+        result[path] = {"p50_ms": percentile(lat, 50) * 1000, "p99_ms": percentile(lat, 99) * 1000, "n": len(lat)}
+    return result
+
+
+def run(quick=False):
+    duration = 3 if quick else 10
+    feature_rows = load_feature_matrix(64).tolist()
+    results = {}
+    for name, env in SCENARIOS:
+        with uvicorn_server(env=env) as base_url:
+            results[name] = run_scenario(base_url, duration, feature_rows)
+    return {"load_cheap_endpoints": results}
+
+
+if __name__ == "__main__":
+    results = run()["load_cheap_endpoints"]
+    rows = []
+    for name, r in results.items():
+        for path in PROBE_PATHS:
+            rows.append([name, path, f"{r[path]['p50_ms']:.1f}", f"{r[path]['p99_ms']:.1f}",
+                         f"{r['predict_rps']:.0f}", r["predict_status_counts"]])
+    print_table(["mode", "probe", "p50 ms", "p99 ms", "/predict req/s", "/predict statuses"], rows)
@@ -0,0 +1,128 @@
+# backend/benchmarks/load_multi_worker.py
+"""
+Memory per worker and aggregate /predict throughput at 1, 2, 4 and 8
+workers, for the pre-fork launcher (python serve.py) and for plain
+`uvicorn main:app --workers N` (spawned workers that each import and load
+everything themselves).
+
+Per worker it reports RSS, PSS (shared pages split between the processes
+mapping them) and USS (pages only that worker holds), read from
+/proc/<pid>/smaps_rollup after the load run; RSS counts shared pages once
+per worker, so the total footprint is the PSS summed over all processes
+(supervisor included). The prediction cache is disabled so every request
+is scored. Client threads run in this process: on a machine with fewer
+cores than workers they compete with the server for CPU, so throughput
+stops scaling at the core count.
+
+Run from the backend directory:  python benchmarks/load_multi_worker.py
+"""
+import http.client
+import json
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+from _common import (setup_backend, uvicorn_server, load_feature_matrix, print_table, child_pids,
+                     process_memory_mb)
+
+setup_backend()
+
+CLIENTS = 32
+SERVER_ENV = {"PREDICTION_CACHE_SIZE": "0", "LOG_LEVEL": "WARNING"}
+
+LAUNCHERS = {
+    "serve.py (pre-fork)": lambda n: {"command": ("serve.py",), "extra_args": ("--workers", str(n))},
+    "uvicorn --workers": lambda n: {"extra_args": ("--workers", str(n))},
+}
+
+
+def _worker_pids(server_pid):
+    pids = []
+    for pid in child_pids(server_pid):
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            if b"resource_tracker" not in f.read():
+                pids.append(pid)
+    return pids
+
+
+def drive_load(base_url, duration, bodies):
+    """Closed-loop /predict load from CLIENTS keep-alive connections; returns (requests, errors)"""
+    host = urlparse(base_url)
+    stop = threading.Event()
+    counts = [0, 0]
+    lock = threading.Lock()
+
+    def client(i):
+        conn = http.client.HTTPConnection(host.hostname, host.port, timeout=60)
+        ok = errors = 0
+        j = i
+        while not stop.is_set():
+            conn.request("POST", "/predict", body=bodies[j % len(bodies)],
+                         headers={"Content-Type": "application/json"})
+            response = conn.getresponse()
+            response.read()
+            if response.status == 200:
+                ok += 1
+            else:
+                errors += 1
+            j += CLIENTS
+        with lock:
+            counts[0] += ok
+            counts[1] += errors
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(CLIENTS)]
+    for t in threads:
+        t.start()
+    time.sleep(duration)
+    stop.set()
+    for t in threads:
+        t.join()
+    return counts
+
+
+def measure(launcher, n_workers, duration, bodies):
+    options = LAUNCHERS[launcher](n_workers)
+    with uvicorn_server(env=SERVER_ENV, return_process=True, startup_timeout=120, **options) as (base_url, proc):
+        deadline = time.time() + 60
+        while n_workers > 1 and len(_worker_pids(proc.pid)) < n_workers and time.time() < deadline:
+            time.sleep(0.1)
+        drive_load(base_url, 1.0, bodies)  # warm every worker
+        ok, errors = drive_load(base_url, duration, bodies)
+
+        pids = _worker_pids(proc.pid)
+        # uvicorn --workers 1 serves from the main process itself, without a supervisor
+        workers = [process_memory_mb(pid) for pid in pids or [proc.pid]]
+        supervisor = process_memory_mb(proc.pid) if pids else {"pss_mb": 0.0}
+    mean = {key: sum(w[key] for w in workers) / len(workers) for key in ("rss_mb", "pss_mb", "uss_mb")}
+    return {
+        "workers": len(workers),
+        "rss_mb_per_worker": round(mean["rss_mb"], 1),
+        "pss_mb_per_worker": round(mean["pss_mb"], 1),
+        "uss_mb_per_worker": round(mean["uss_mb"], 1),
+        "total_pss_mb": round(sum(w["pss_mb"] for w in workers) + supervisor["pss_mb"], 1),
+        "requests_per_second": round(ok / duration, 1),
+        "errors": errors,
+    }
+
+
+def run(quick=False):
+    duration = 2 if quick else 8
+    worker_counts = (1, 2, 4) if quick else (1, 2, 4, 8)
+    bodies = [json.dumps({"features": row}) for row in load_feature_matrix(2048).tolist()]
+    results = {"cpu_count": os.cpu_count()}
+    for launcher in LAUNCHERS:
+        results[launcher] = {str(n): measure(launcher, n, duration, bodies) for n in worker_counts}
+    return {"multi_worker": results}
+
+
+if __name__ == "__main__":
+    results = run()["multi_worker"]
+    print(f"CPU cores: {results.pop('cpu_count')}")
+    rows = []
+    for launcher, by_count in results.items():
+        for n, r in by_count.items():
+            rows.append([launcher, n, r["rss_mb_per_worker"], r["pss_mb_per_worker"], r["uss_mb_per_worker"],
+                         r["total_pss_mb"], r["requests_per_second"], r["errors"]])
+    print_table(["launcher", "workers", "RSS MB/worker", "PSS MB/worker", "USS MB/worker", "total PSS MB",
+                 "/predict req/s", "errors"], rows)
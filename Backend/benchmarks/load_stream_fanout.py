@@ -0,0 +1,97 @@
+# backend/benchmarks/load_stream_fanout.py
+"""
+Fan-out latency and per-connection memory of the /stream SSE endpoint.
+
+Opens SUBSCRIBERS concurrent /stream connections against a uvicorn
+subprocess, then triggers 'prediction' events with POST /predict. For each
+event it records how long after publication every subscriber received it
+(p50/p99 over all deliveries, and the time until the last subscriber got
+it), plus the server RSS growth per open connection.
+
+Run from the backend directory:  python benchmarks/load_stream_fanout.py
+"""
+import asyncio
+import json
+import time
+
+import httpx
+
+from _common import setup_backend, uvicorn_server, percentile, process_rss_mb, load_feature_matrix, print_table
+
+setup_backend()
+
+SUBSCRIBERS = 1000
+EVENTS = 20
+
+
+async def subscriber(client, deliveries, ready):
+    async with client.stream("GET", "/stream") as response:
+        ready.release()
+        async for line in response.aiter_lines():
+            if line.startswith("data: "):
+                payload = json.loads(line[6:])
+                deliveries.setdefault(payload["timestamp"], []).append(time.time() - payload["published_at"])
+
+
+async def wait_for_subscribers(client, n, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = (await client.get("/system-status")).json()
+        if status["stream"]["subscribers"] >= n:
+            return status
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"only {status['stream']['subscribers']} of {n} subscribers connected")
+
+
+async def run_async(base_url, pid, n_subscribers, n_events):
+    features = load_feature_matrix(1)[0].tolist()
+    limits = httpx.Limits(max_connections=n_subscribers + 10, max_keepalive_connections=n_subscribers + 10)
+    async with httpx.AsyncClient(base_url=base_url, timeout=None, limits=limits) as client:
+        await client.post("/predict", json={"features": features})  # warm the model
+        rss_before = process_rss_mb(pid)
+
+        deliveries = {}
+        ready = asyncio.Semaphore(0)
+        tasks = [asyncio.create_task(subscriber(client, deliveries, ready)) for _ in range(n_subscribers)]
+        for _ in range(n_subscribers):
+            await ready.acquire()
+        await wait_for_subscribers(client, n_subscribers)
+        rss_after = process_rss_mb(pid)
+
+        for _ in range(n_events):
+            await client.post("/predict", json={"features": features})
+            await asyncio.sleep(0.25)
+        await asyncio.sleep(1.0)
+        status = (await client.get("/system-status")).json()
+
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    all_latencies = [lat for lats in deliveries.values() for lat in lats]
+    last_subscriber = [max(lats) for lats in deliveries.values()]
+    return {
+        "subscribers": n_subscribers,
+        "events": len(deliveries),
+        "deliveries": len(all_latencies),
+        "expected_deliveries": n_subscribers * n_events,
+        "delivery_p50_ms": percentile(all_latencies, 50) * 1000,
+        "delivery_p99_ms": percentile(all_latencies, 99) * 1000,
+        "last_subscriber_p50_ms": percentile(last_subscriber, 50) * 1000,
+        "rss_before_mb": rss_before,
+        "rss_after_mb": rss_after,
+        "kb_per_connection": (rss_after - rss_before) * 1024 / n_subscribers,
+        "dropped_slow_consumers": status["stream"]["dropped_slow_consumers"],
+    }
+
+
+def run(quick=False):
+    n_subscribers = 200 if quick else SUBSCRIBERS
+    n_events = 5 if quick else EVENTS
+    with uvicorn_server(return_process=True) as (base_url, proc):
+        return {"stream_fanout": asyncio.run(run_async(base_url, proc.pid, n_subscribers, n_events))}
+
+
+if __name__ == "__main__":
+    r = run()["stream_fanout"]
+    print_table(["metric", "value"], [[k, f"{v:.2f}" if isinstance(v, float) else v] for k, v in r.items()])
@@ -0,0 +1,98 @@
+# backend/benchmarks/load_wire_format.py
+"""
+End-to-end /predict/batch throughput with JSON bodies vs .npy bodies
+(Content-Type / Accept: application/x-npy, see wire_format.py), at several
+batch sizes, against a uvicorn subprocess.
+
+Each request is encoded and its response decoded on the client side
+(json.dumps/json.loads vs np.save/np.load), so rows/s covers the whole
+round trip. The prediction cache is disabled so every row is scored.
+
+Run from the backend directory:  python benchmarks/load_wire_format.py
+"""
+import http.client
+import io
+import json
+import time
+from urllib.parse import urlparse
+
+import numpy as np
+
+from _common import setup_backend, uvicorn_server, load_feature_matrix, print_table
+
+setup_backend()
+
+NPY = "application/x-npy"
+
+
+def _json_round_trip(conn, matrix):
+    body = json.dumps({"features": matrix.tolist()})
+    conn.request("POST", "/predict/batch", body=body, headers={"Content-Type": "application/json"})
+    response = conn.getresponse()
+    payload = response.read()
+    assert response.status == 200, payload[:200]
+    return len(body), len(payload), np.asarray(json.loads(payload)["predictions"])
+
+
+def _npy_round_trip(conn, matrix):
+    buffer = io.BytesIO()
+    np.save(buffer, matrix)
+    body = buffer.getvalue()
+    conn.request("POST", "/predict/batch", body=body, headers={"Content-Type": NPY, "Accept": NPY})
+    response = conn.getresponse()
+    payload = response.read()
+    assert response.status == 200, payload[:200]
+    return len(body), len(payload), np.load(io.BytesIO(payload))["probability"]
+
+
+FORMATS = {
+    "json": (_json_round_trip, np.float64),
+    "npy float64": (_npy_round_trip, np.float64),
+    "npy float32": (_npy_round_trip, np.float32),
+}
+
+
+def measure(base_url, matrix, round_trip, min_seconds):
+    host = urlparse(base_url)
+    conn = http.client.HTTPConnection(host.hostname, host.port, timeout=120)
+    round_trip(conn, matrix)  # warm up
+    requests = 0
+    start = time.perf_counter()
+    while True:
+        request_bytes, response_bytes, _ = round_trip(conn, matrix)
+        requests += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds and requests >= 3:
+            break
+    conn.close()
+    return {
+        "rows_per_second": round(requests * len(matrix) / elapsed, 1),
+        "ms_per_request": round(elapsed / requests * 1000, 3),
+        "request_bytes": request_bytes,
+        "response_bytes": response_bytes,
+    }
+
+
+def run(quick=False):
+    batch_sizes = (1, 100, 1000) if quick else (1, 10, 100, 1000, 10000)
+    min_seconds = 0.5 if quick else 2.0
+    source = load_feature_matrix(max(batch_sizes))
+    results = {}
+    with uvicorn_server(env={"PREDICTION_CACHE_SIZE": "0"}) as base_url:
+        for n in batch_sizes:
+            results[str(n)] = {
+                name: measure(base_url, np.ascontiguousarray(source[:n], dtype=dtype), round_trip, min_seconds)
+                for name, (round_trip, dtype) in FORMATS.items()
+            }
+    return {"wire_format": results}
+
+
+if __name__ == "__main__":
+    results = run()["wire_format"]
+    rows = []
+    for n, by_format in results.items():
+        json_rate = by_format["json"]["rows_per_second"]
+        for name, r in by_format.items():
+            rows.append([n, name, f"{r['rows_per_second']:.0f}", f"{r['ms_per_request']:.2f}",
+                         r["request_bytes"], r["response_bytes"], f"{r['rows_per_second'] / json_rate:.1f}x"])
+    print_table(["batch", "format", "rows/s", "ms/request", "request B", "response B", "vs json"], rows)
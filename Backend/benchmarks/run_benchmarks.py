@@ -0,0 +1,286 @@
+# backend/benchmarks/run_benchmarks.py
+"""
+Run the benchmark suite, write the results as JSON and compare them with a
+stored baseline.
+
+Every bench_*.py / load_*.py module in this directory is a suite member
+(its run(quick) -> dict). Each one runs in a fresh interpreter - several
+configure the app through environment variables before importing main -
+and one failing benchmark doesn't stop the rest.
+
+Comparison flattens both result trees to dotted keys and checks the
+metrics whose direction is clear from the key name:
+
+- higher is better: *per_second, *per_s, *_rps, *speedup*, *efficiency*
+- lower is better:  *_us, *_ms, *_s, *seconds, ms_per_*, *_mb, kb_per_*
+
+(on the leaf key or its parent, e.g. "load_ms.compiled"); p99 / max
+latencies are reported but not gated on.
+- booleans (parity / agreement checks) must not flip from true to false
+
+A metric regresses when it is worse than the baseline by more than
+--threshold (relative) and, for timings and sizes, by more than a small
+absolute noise floor. With --repeat N each benchmark runs N times and
+every metric keeps its best value, which takes most of the scheduling
+noise out of both the baseline and the run being checked. Any regression
+or failed benchmark makes the exit status non-zero, so the suite can gate
+performance work.
+
+Run from the backend directory:
+    python benchmarks/run_benchmarks.py --quick --repeat 3       # run + compare with baseline.json
+    python benchmarks/run_benchmarks.py --quick --only startup,predict_latency
+    python benchmarks/run_benchmarks.py --quick --repeat 3 --update-baseline
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+from _common import BACKEND_DIR, print_table
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+RESULTS_PATH = os.path.join(BENCH_DIR, "results.json")
+THRESHOLD = float(os.environ.get("BENCH_REGRESSION_THRESHOLD", 0.5))
+TIMEOUT = 1800
+
+# Absolute changes below these are noise, whatever the relative change
+NOISE_FLOOR = {"us": 5.0, "ms": 0.5, "s": 0.05, "mb": 5.0, "kb": 16.0}
+
+# Tail latencies are reported but too jittery to gate on
+TAIL_PREFIXES = ("p99", "max")
+
+CHILD = r"""
+import importlib, json, sys
+sys.path.insert(0, sys.argv[1])
+results = importlib.import_module(sys.argv[2]).run(quick=sys.argv[3] == "1")
+with open(sys.argv[4], "w") as f:
+    json.dump(results, f, default=str)
+"""
+
+
+def discover():
+    """Suite member names: module names without the bench_/load_ prefix"""
+    modules = sorted(glob.glob(os.path.join(BENCH_DIR, "bench_*.py"))) + \
+        sorted(glob.glob(os.path.join(BENCH_DIR, "load_*.py")))
+    return {os.path.basename(p)[:-3].split("_", 1)[1]: os.path.basename(p)[:-3] for p in modules}
+
+
+def run_one(module, quick, timeout=TIMEOUT):
+    """{"seconds", "results"} or {"seconds", "error"} for one benchmark module"""
+    out_path = os.path.join(BENCH_DIR, f".{module}.json")
+    start = time.perf_counter()
+    try:
+        proc = subprocess.run([sys.executable, "-c", CHILD, BENCH_DIR, module, "1" if quick else "0", out_path],
+                              cwd=BACKEND_DIR, capture_output=True, text=True, timeout=timeout)
+        seconds = round(time.perf_counter() - start, 1)
+        if proc.returncode != 0:
+            output = (proc.stderr or proc.stdout).strip()
+            return {"seconds": seconds, "error": output.splitlines()[-1] if output else f"exit status {proc.returncode}"}
+        with open(out_path) as f:
+            return {"seconds": seconds, "results": json.load(f)}
+    except subprocess.TimeoutExpired:
+        return {"seconds": round(time.perf_counter() - start, 1), "error": f"timed out after {timeout}s"}
+    finally:
+        if os.path.exists(out_path):
+            os.remove(out_path)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def best_of_runs(first, second, prefix=""):
+    """Merge two result trees of the same benchmark, keeping each metric's better value"""
+    if isinstance(first, dict) and isinstance(second, dict):
+        return {k: best_of_runs(v, second[k], f"{prefix}.{k}" if prefix else str(k)) if k in second else v
+                for k, v in first.items()}
+    if isinstance(first, list) and isinstance(second, list) and len(first) == len(second):
+        return [best_of_runs(a, b, f"{prefix}.{i}") for i, (a, b) in enumerate(zip(first, second))]
+    kind = metric_kind(prefix)
+    if kind is None or isinstance(first, bool) or not all(isinstance(v, (int, float)) for v in (first, second)):
+        return first
+    return max(first, second) if kind[0] == "higher" else min(first, second)
+
+
+def run_suite(names, quick, timeout=TIMEOUT, repeat=1):
+    members = discover()
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "quick": quick,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "benchmarks": {},
+    }
+    for name in names:
+        print(f"⏱️ {name} ...", flush=True)
+        entry = run_one(members[name], quick, timeout)
+        for _ in range(repeat - 1):
+            if "error" in entry:
+                break
+            again = run_one(members[name], quick, timeout)
+            if "error" in again:
+                entry = again
+                break
+            entry = {"seconds": entry["seconds"] + again["seconds"],
+                     "results": best_of_runs(entry["results"], again["results"])}
+        entry["runs"] = repeat
+        report["benchmarks"][name] = entry
+        status = f"❌ {entry['error']}" if "error" in entry else "✅"
+        print(f"   {status} ({entry['seconds']}s)", flush=True)
+    return report
+
+
+def flatten(tree, prefix=""):
+    """Nested dicts/lists -> {"a.b.0.c": leaf}"""
+    if isinstance(tree, dict):
+        items = tree.items()
+    elif isinstance(tree, list):
+        items = enumerate(tree)
+    else:
+        return {prefix: tree}
+    flat = {}
+    for key, value in items:
+        flat.update(flatten(value, f"{prefix}.{key}" if prefix else str(key)))
+    return flat
+
+
+def _segment_kind(name):
+    if name.endswith(("per_second", "per_s", "_rps")) or "speedup" in name or "efficiency" in name:
+        return "higher", 0.0
+    if name.endswith("_us"):
+        return "lower", NOISE_FLOOR["us"]
+    if name.endswith("_ms") or name.startswith("ms_per"):
+        return "lower", NOISE_FLOOR["ms"]
+    if name.endswith(("_s", "seconds")):
+        return "lower", NOISE_FLOOR["s"]
+    if name.endswith("_mb") or "_mb_per_" in name or name.startswith("mb_per"):
+        return "lower", NOISE_FLOOR["mb"]
+    if name.startswith("kb_per") or name.endswith("_kb"):
+        return "lower", NOISE_FLOOR["kb"]
+    return None
+
+
+def metric_kind(key):
+    """
+    ("higher" | "lower", noise floor) for a comparable metric, None otherwise.
+    The unit may sit on the leaf ("p50_ms") or its parent ("load_ms.compiled").
+    """
+    if key.lower().rsplit(".", 1)[-1].startswith(TAIL_PREFIXES):
+        return None
+    for name in reversed(key.lower().split(".")[-2:]):
+        kind = _segment_kind(name)
+        if kind:
+            return kind
+    return None
+
+
+def compare(report, baseline, threshold=THRESHOLD):
+    """(regressions, improvements) - lists of (metric, baseline, current, relative change)"""
+    regressions, improvements = [], []
+    for name, entry in report["benchmarks"].items():
+        base_entry = baseline.get("benchmarks", {}).get(name)
+        if "results" not in entry or not base_entry or "results" not in base_entry:
+            continue
+        current, base = flatten(entry["results"]), flatten(base_entry["results"])
+        for key in sorted(base.keys() & current.keys()):
+            old, new = base[key], current[key]
+            metric = f"{name}: {key}"
+            if isinstance(old, bool) or isinstance(new, bool):
+                if old is True and new is False:
+                    regressions.append((metric, old, new, None))
+                continue
+            kind = metric_kind(key)
+            if kind is None or not isinstance(old, (int, float)) or not isinstance(new, (int, float)) or old <= 0:
+                continue
+            direction, floor = kind
+            change = (new - old) / old
+            worse = -change if direction == "higher" else change
+            if abs(new - old) <= floor:
+                continue
+            if worse > threshold:
+                regressions.append((metric, old, new, change))
+            elif worse < -threshold:
+                improvements.append((metric, old, new, change))
+    return regressions, improvements
+
+
+def _print_changes(title, changes):
+    print(f"\n{title}")
+    print_table(["metric", "baseline", "current", "change"],
+                [[m, old, new, "-" if change is None else f"{change:+.0%}"] for m, old, new, change in changes])
+
+
+def main(argv=None):
+    members = discover()
+    parser = argparse.ArgumentParser(description="Run the backend benchmark suite and check for regressions")
+    parser.add_argument("--quick", action="store_true", help="smaller, faster configurations")
+    parser.add_argument("--only", default=None, help=f"comma-separated subset of: {', '.join(members)}")
+    parser.add_argument("--skip", default="", help="comma-separated benchmarks to leave out")
+    parser.add_argument("--output", default=RESULTS_PATH, help="where to write the JSON results")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline JSON to compare with")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="relative change that counts as a regression")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per benchmark, keeping each metric's best")
+    parser.add_argument("--timeout", type=int, default=TIMEOUT, help="seconds allowed per benchmark")
+    parser.add_argument("--update-baseline", action="store_true", help="store these results as the new baseline")
+    args = parser.parse_args(argv)
+
+    names = args.only.split(",") if args.only else list(members)
+    names = [n for n in names if n not in args.skip.split(",")]
+    unknown = [n for n in names if n not in members]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    report = run_suite(names, args.quick, args.timeout, args.repeat)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"💾 Results written to {args.output}")
+
+    failed = [n for n, e in report["benchmarks"].items() if "error" in e]
+    regressions = []
+    if args.update_baseline:
+        baseline = {"meta": report["meta"], "benchmarks": {}}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline["benchmarks"] = json.load(f).get("benchmarks", {})
+        # Merge, so a partial run only replaces the benchmarks it ran
+        baseline["benchmarks"].update({n: e for n, e in report["benchmarks"].items() if "error" not in e})
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2)
+        print(f"📌 Baseline updated: {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("meta", {}).get("quick") != args.quick:
+            print(f"⚠️ Baseline was recorded with quick={baseline.get('meta', {}).get('quick')}, "
+                  f"this run used quick={args.quick}; comparing anyway")
+        regressions, improvements = compare(report, baseline, args.threshold)
+        if improvements:
+            _print_changes(f"🚀 {len(improvements)} metric(s) improved by more than {args.threshold:.0%}", improvements)
+        if regressions:
+            _print_changes(f"🐢 {len(regressions)} metric(s) regressed by more than {args.threshold:.0%}", regressions)
+        else:
+            print(f"\n✅ No regressions over {args.threshold:.0%} against {args.baseline}")
+    else:
+        print(f"⚠️ No baseline at {args.baseline}; run with --update-baseline to record one")
+
+    if failed:
+        print(f"❌ Failed: {', '.join(failed)}")
+    return 1 if failed or regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
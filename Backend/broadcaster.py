@@ -0,0 +1,100 @@
+# backend/broadcaster.py
+"""
+Server-push fan-out for the /stream endpoint (Server-Sent Events).
+
+Each update (new X-ray sample, new DONKI flare, new prediction) is
+serialized to an SSE frame once and put on every subscriber's bounded
+queue. A subscriber whose queue is full is a slow consumer: it is dropped
+(its stream ends and the browser's EventSource reconnects) instead of
+letting memory grow or slowing everyone else down.
+"""
+import asyncio
+import json
+import os
+import time
+
+STREAM_QUEUE_SIZE = int(os.environ.get("STREAM_QUEUE_SIZE", 64))
+STREAM_HEARTBEAT_SECONDS = float(os.environ.get("STREAM_HEARTBEAT_SECONDS", 15))
+STREAM_MAX_SUBSCRIBERS = int(os.environ.get("STREAM_MAX_SUBSCRIBERS", 5000))
+
+HEARTBEAT_FRAME = b": keepalive\n\n"
+
+
+class Subscription:
+    __slots__ = ("queue", "dropped")
+
+    def __init__(self, queue_size):
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = False
+
+
+class Broadcaster:
+    def __init__(self, queue_size=STREAM_QUEUE_SIZE, max_subscribers=STREAM_MAX_SUBSCRIBERS):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._subscribers = set()
+        self._next_id = 0
+        self.published = 0
+        self.dropped_subscribers = 0
+
+    def __len__(self):
+        return len(self._subscribers)
+
+    def subscribe(self):
+        """Register a new subscriber (None if the server is at capacity)"""
+        if len(self._subscribers) >= self.max_subscribers:
+            return None
+        subscription = Subscription(self.queue_size)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self._subscribers.discard(subscription)
+
+    def publish(self, event, data):
+        """
+        Fan one event out to every subscriber. Must be called from the event
+        loop thread. Returns the number of subscribers it was queued for.
+        """
+        self._next_id += 1
+        payload = dict(data, published_at=time.time())
+        frame = f"id: {self._next_id}\nevent: {event}\ndata: {json.dumps(payload)}\n\n".encode()
+        self.published += 1
+
+        delivered = 0
+        for subscription in list(self._subscribers):
+            try:
+                subscription.queue.put_nowait(frame)
+                delivered += 1
+            except asyncio.QueueFull:
+                # Slow consumer: drop it rather than buffer without limit
+                subscription.dropped = True
+                self._subscribers.discard(subscription)
+                self.dropped_subscribers += 1
+                # Wake its stream so it can end
+                subscription.queue.get_nowait()
+                subscription.queue.put_nowait(b"")
+        return delivered
+
+    async def stream(self, subscription, heartbeat=STREAM_HEARTBEAT_SECONDS):
+        """Async iterator of SSE frames for one subscriber"""
+        try:
+            yield b"retry: 5000\n\n"
+            while True:
+                try:
+                    frame = await asyncio.wait_for(subscription.queue.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    frame = HEARTBEAT_FRAME
+                if subscription.dropped:
+                    break
+                yield frame
+        finally:
+            self.unsubscribe(subscription)
+
+    def stats(self):
+        return {
+            "subscribers": len(self._subscribers),
+            "queue_size": self.queue_size,
+            "events_published": self.published,
+            "dropped_slow_consumers": self.dropped_subscribers,
+        }
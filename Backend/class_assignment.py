@@ -0,0 +1,214 @@
+# backend/class_assignment.py
+"""
+Class assignment stage: significance probability + anomaly flag -> flare class.
+
+Everything the stage needs is a handful of small arrays (a ClassTable):
+
+- calibration_x / calibration_y: piecewise-linear map from the Random
+  Forest's raw probability to a calibrated one (the breakpoints of an
+  isotonic fit, or a Platt sigmoid tabulated on a grid); empty = identity
+- edges: ascending class thresholds on the calibrated probability. A row
+  gets LABELS[k] where k is the number of edges it strictly exceeds, i.e.
+  np.searchsorted(edges, p, side='left') for a whole batch at once
+- anomaly_edge: anomalous rows above it are X-class
+- gate / anomaly_threshold: the Isolation Forest only scores rows whose
+  raw probability is above gate; a score below anomaly_threshold is an anomaly
+
+LEGACY reproduces get_flare_class_from_probability exactly (raw
+probabilities, edges 0.2 / 0.4 / 0.7, anomaly edge 0.6, gate 0.3,
+threshold -0.1). It serves until `train_models.py calibrate` (also run by
+a full training and by `train_models.py update`, on the rows it holds out)
+writes models/class_assignment.npz. That file is tied to the Random Forest
+pickle it was fitted on and is ignored, with a warning, once the forest
+changes without a refit.
+
+Calibration only drives the class: predictions keep reporting the raw
+probability, which the confidence cut-offs in main.py are set against.
+
+CLASS_ASSIGNMENT=legacy keeps the legacy table even when a fitted one exists.
+"""
+import bisect
+import hashlib
+import logging
+import os
+
+import numpy as np
+
+from wire_format import FLARE_CLASS_LABELS
+
+logger = logging.getLogger(__name__)
+
+CLASS_ASSIGNMENT = os.environ.get('CLASS_ASSIGNMENT', 'fitted')
+CLASS_ASSIGNMENT_FILE = 'class_assignment.npz'
+CALIBRATION_METHODS = ('isotonic', 'platt')
+PLATT_GRID_POINTS = 1001
+
+LABELS = np.array(FLARE_CLASS_LABELS, dtype=object)
+X_CLASS = len(FLARE_CLASS_LABELS) - 1
+# flare_category letter -> index into LABELS
+CATEGORY_CLASSES = {'A': 0, 'B': 0, 'C': 1, 'M': 2, 'X': 3}
+
+
+class ClassTable:
+    """Calibration + class thresholds as lookup arrays (see the module docstring)"""
+
+    def __init__(self, edges, anomaly_edge, gate, anomaly_threshold,
+                 calibration_x=(), calibration_y=(), method='legacy', source_sha256=None):
+        self.edges = np.asarray(edges, dtype=np.float64)
+        if len(self.edges) != X_CLASS or np.any(np.diff(self.edges) < 0):
+            raise ValueError(f"need {X_CLASS} ascending class edges, got {list(self.edges)}")
+        self.anomaly_edge = float(anomaly_edge)
+        self.gate = float(gate)
+        self.anomaly_threshold = float(anomaly_threshold)
+        self.calibration_x = np.asarray(calibration_x, dtype=np.float64)
+        self.calibration_y = np.asarray(calibration_y, dtype=np.float64)
+        if self.calibration_x.shape != self.calibration_y.shape:
+            raise ValueError("calibration_x and calibration_y differ in length")
+        self.method = method
+        self.source_sha256 = source_sha256
+        # bisect on a list is much cheaper than a NumPy call for one row
+        self._edge_list = self.edges.tolist()
+
+    @property
+    def calibrated(self):
+        return len(self.calibration_x) > 0
+
+    def calibrate(self, probabilities):
+        """Raw Random Forest probabilities -> calibrated probabilities (float64 array)"""
+        probabilities = np.asarray(probabilities, dtype=np.float64)
+        if not self.calibrated:
+            return probabilities
+        return np.interp(probabilities, self.calibration_x, self.calibration_y)
+
+    def calibrate_one(self, probability):
+        if not self.calibrated:
+            return float(probability)
+        return float(np.interp(probability, self.calibration_x, self.calibration_y))
+
+    def class_codes(self, probabilities, is_anomaly):
+        """Index into LABELS for every row of a batch of raw probabilities"""
+        probabilities = self.calibrate(probabilities)
+        codes = np.searchsorted(self.edges, probabilities, side='left')
+        codes[np.asarray(is_anomaly, dtype=bool) & (probabilities > self.anomaly_edge)] = X_CLASS
+        return codes
+
+    def assign(self, probabilities, is_anomaly):
+        """Flare class labels (object array) for a batch of raw probabilities"""
+        return LABELS[self.class_codes(probabilities, is_anomaly)]
+
+    def assign_one(self, probability, is_anomaly):
+        probability = self.calibrate_one(probability)
+        if is_anomaly and probability > self.anomaly_edge:
+            return LABELS[X_CLASS]
+        return LABELS[bisect.bisect_left(self._edge_list, probability)]
+
+    def digest(self):
+        """Short hash of the table contents"""
+        h = hashlib.sha256()
+        for array in (self.edges, self.calibration_x, self.calibration_y,
+                      np.array([self.anomaly_edge, self.gate, self.anomaly_threshold])):
+            h.update(array.tobytes())
+        return h.hexdigest()[:6]
+
+    def save(self, path):
+        """Write the table as .npz (atomic replace)"""
+        with open(path + '.tmp', 'wb') as f:
+            np.savez(f, edges=self.edges, anomaly_edge=self.anomaly_edge, gate=self.gate,
+                     anomaly_threshold=self.anomaly_threshold, calibration_x=self.calibration_x,
+                     calibration_y=self.calibration_y, method=self.method,
+                     source_sha256=self.source_sha256 or '')
+        os.replace(path + '.tmp', path)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data['edges'], data['anomaly_edge'], data['gate'], data['anomaly_threshold'],
+                       data['calibration_x'], data['calibration_y'], method=str(data['method']),
+                       source_sha256=str(data['source_sha256']) or None)
+
+
+LEGACY = ClassTable(edges=(0.2, 0.4, 0.7), anomaly_edge=0.6, gate=0.3, anomaly_threshold=-0.1)
+
+
+def load_class_table(path, source_sha256):
+    """
+    The fitted table at path if it belongs to the Random Forest with this
+    source_sha256, else LEGACY
+    """
+    if CLASS_ASSIGNMENT == 'legacy' or not os.path.exists(path):
+        return LEGACY
+    table = ClassTable.load(path)
+    if table.source_sha256 != source_sha256:
+        logger.warning("⚠️ %s was fitted on a different Random Forest, using the legacy class thresholds",
+                       os.path.basename(path))
+        return LEGACY
+    return table
+
+
+def category_classes(codes, categories):
+    """
+    flare_category codes (data_cache.load_flare_categories) -> indices into LABELS.
+    Unlabeled rows (code -1, e.g. no following flare in `train_models.py label`
+    output) and unknown categories are Insignificant.
+    """
+    codes = np.asarray(codes)
+    lookup = np.array([CATEGORY_CLASSES.get(c, 0) for c in categories] or [0], dtype=np.int64)
+    return np.where(codes < 0, 0, lookup[np.clip(codes, 0, None)])
+
+
+def fit_calibration(probabilities, significant, method='isotonic'):
+    """(x, y) breakpoints of a monotone map raw probability -> P(significant)"""
+    probabilities = np.asarray(probabilities, dtype=np.float64)
+    significant = np.asarray(significant, dtype=np.float64)
+    if method == 'isotonic':
+        from sklearn.isotonic import IsotonicRegression
+
+        iso = IsotonicRegression(y_min=0.0, y_max=1.0, out_of_bounds='clip').fit(probabilities, significant)
+        return iso.X_thresholds_, iso.y_thresholds_
+    if method == 'platt':
+        from sklearn.linear_model import LogisticRegression
+
+        def logit(p):
+            p = np.clip(p, 1e-6, 1 - 1e-6)
+            return np.log(p / (1 - p))
+
+        platt = LogisticRegression(C=1e6).fit(logit(probabilities)[:, None], significant)
+        grid = np.linspace(0.0, 1.0, PLATT_GRID_POINTS)
+        return grid, platt.predict_proba(logit(grid)[:, None])[:, 1]
+    raise ValueError(f"unknown calibration method {method!r}, expected one of {CALIBRATION_METHODS}")
+
+
+def fit_class_table(probabilities, classes, method='isotonic', source_sha256=None):
+    """
+    Fit calibration and class edges on held-out rows: raw Random Forest
+    probabilities and their true classes (indices into LABELS).
+
+    The edges are quantiles of the calibrated probabilities chosen so each
+    class is assigned to the same share of rows as it occurs in the data.
+    The legacy anomaly override (raw probability > 0.6) is carried over
+    through the calibration; the stage 2 gate stays on raw probabilities.
+    """
+    classes = np.asarray(classes)
+    x, y = fit_calibration(probabilities, classes >= CATEGORY_CLASSES['M'], method)
+    calibrated = np.interp(probabilities, x, y)
+    shares = np.cumsum(np.bincount(classes, minlength=len(LABELS)))[:X_CLASS] / len(classes)
+    edges = np.maximum.accumulate(np.quantile(calibrated, shares))
+    anomaly_edge = float(np.interp(LEGACY.anomaly_edge, x, y))
+    return ClassTable(edges, anomaly_edge, LEGACY.gate, LEGACY.anomaly_threshold,
+                      calibration_x=x, calibration_y=y, method=method, source_sha256=source_sha256)
+
+
+def evaluate_class_table(table, probabilities, classes, is_anomaly=None):
+    """Held-out quality of a table: class accuracy, Brier score and assigned class shares"""
+    classes = np.asarray(classes)
+    if is_anomaly is None:
+        is_anomaly = np.zeros(len(classes), dtype=bool)
+    calibrated = table.calibrate(probabilities)
+    codes = table.class_codes(probabilities, is_anomaly)
+    significant = classes >= CATEGORY_CLASSES['M']
+    return {
+        'class_accuracy': float(np.mean(codes == classes)),
+        'brier': float(np.mean((calibrated - significant) ** 2)),
+        'assigned_shares': dict(zip(FLARE_CLASS_LABELS, (np.bincount(codes, minlength=len(LABELS)) / len(codes)).round(4).tolist())),
+    }
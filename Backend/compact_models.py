@@ -0,0 +1,357 @@
+# backend/compact_models.py
+"""
+Compact forest artifacts (used by `python train_models.py compact`).
+
+Same flat node layout as models/compiled/ (see train_models.export_compiled_forests),
+written to models/compact/ with smaller types:
+
+- feature indices as int16
+- thresholds as float32, rounded down: the evaluator compares float32
+  inputs, and x > float32_down(t) is exactly x > t for every float32 x,
+  so this alone changes no prediction
+- children as offsets from the node (children always come after their
+  parent, leaves point to themselves with offset 0) in the smallest
+  unsigned type that fits - uint8 for trees under 256 nodes
+- leaf values (RF class-1 probabilities, ISO path lengths) optionally
+  quantized to 8 or 16 bits: value = value_offset + value_scale * q.
+  Both forests only ever sum/average their leaves, so the scale is applied
+  once to the aggregate
+- optionally only the Random Forest trees that matter most, chosen by
+  greedy backward elimination on a validation split: each step drops the
+  tree whose removal keeps the forest's probabilities closest to the full
+  forest's. The Isolation Forest is never pruned (its offset_ is tied to
+  the full set of trees and there are no labels to validate it against)
+
+model_utils evaluates these arrays directly (MODEL_FORMAT=compact), for
+every batch size, so neither sklearn nor the pickles are loaded. Versions
+written by `train_models.py update` have no compact forests; the registry
+falls back to their compiled ones.
+
+Validation rows are half of the training held-out split (same
+train_test_split as train_flare_models); accuracy / AUC deltas are
+reported on the other half, the prediction error and flare-class
+agreement on the whole dataset.
+"""
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from model_registry import MODEL_DIR
+
+COMPACT_SUBDIR = 'compact'
+LEAF_BITS = (8, 16, 32, 64)
+# Largest |score change| on the dataset that 'auto' leaf quantization accepts
+LEAF_TOLERANCE = 1e-3
+
+
+def round_down_float32(values):
+    """Largest float32 <= each value"""
+    values = np.asarray(values, dtype=np.float64)
+    rounded = values.astype(np.float32)
+    above = rounded.astype(np.float64) > values
+    rounded[above] = np.nextafter(rounded[above], np.float32(-np.inf))
+    return rounded
+
+
+def quantize_values(values, bits):
+    """(stored values, meta entries) for 8/16-bit linear quantization, float32 or float64"""
+    values = np.asarray(values, dtype=np.float64)
+    if bits == 64:
+        return values, {}
+    if bits == 32:
+        return values.astype(np.float32), {}
+    low, high = float(values.min()), float(values.max())
+    levels = 2 ** bits - 1
+    scale = (high - low) / levels or 1.0
+    quantized = np.rint((values - low) / scale).astype(np.uint8 if bits == 8 else np.uint16)
+    return quantized, {'value_scale': scale, 'value_offset': low}
+
+
+def compact_forest(arrays, meta, leaf_bits=64):
+    """Compiled forest arrays (train_models.flatten_*) -> compact arrays + meta"""
+    n_nodes = len(arrays['feature'])
+    offsets = np.asarray(arrays['children'], dtype=np.int64) - np.arange(n_nodes)[:, None]
+    if offsets.min() < 0:
+        raise ValueError("compact forests need every child stored after its parent")
+    if meta['n_features'] > np.iinfo(np.int16).max:
+        raise ValueError(f"{meta['n_features']} features do not fit int16 feature indices")
+    values, value_meta = quantize_values(arrays['value'], leaf_bits)
+    compact = {
+        'feature': np.asarray(arrays['feature']).astype(np.int16),
+        'threshold': round_down_float32(arrays['threshold']),
+        'children': offsets.astype(np.min_scalar_type(int(offsets.max()))),
+        'value': values,
+        'roots': np.asarray(arrays['roots'], dtype=np.int32),
+    }
+    meta = dict(meta, format='compact', relative_children=True, leaf_bits=leaf_bits, **value_meta)
+    return compact, meta
+
+
+def pruning_order(leaf_values):
+    """
+    Tree indices in the order greedy backward elimination drops them, from an
+    (n_rows, n_trees) matrix of validation leaf values: each step removes the
+    tree whose removal moves the forest's mean the least from the full forest's
+    """
+    leaf_values = np.asarray(leaf_values, dtype=np.float64)
+    n_trees = leaf_values.shape[1]
+    target = leaf_values.mean(axis=1)
+    total = leaf_values.sum(axis=1)
+    remaining = list(range(n_trees))
+    order = []
+    while len(remaining) > 1:
+        candidates = (total[:, None] - leaf_values[:, remaining]) / (len(remaining) - 1)
+        drop = remaining[int(np.argmin(((candidates - target[:, None]) ** 2).mean(axis=0)))]
+        order.append(drop)
+        total -= leaf_values[:, drop]
+        remaining.remove(drop)
+    return order + remaining
+
+
+def kept_trees(order, keep):
+    """Indices of the `keep` trees that survive longest in a pruning order"""
+    return sorted(order[len(order) - keep:])
+
+
+def forest_size_bytes(directory, name):
+    return sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory)
+               if f.startswith(name + '_'))
+
+
+def _load_seconds(directory, name):
+    """Time to read one forest's arrays into memory (without the pickle staleness hash)"""
+    from model_registry import load_compiled_forest
+
+    start = time.perf_counter()
+    forest = load_compiled_forest(name, '', directory, mmap_mode=None)
+    return time.perf_counter() - start, forest
+
+
+def _flare_classes(rf, iso, X):
+    """Flare classes with the legacy table and gate, for agreement checks"""
+    import model_utils
+    from class_assignment import LEGACY
+
+    probabilities = model_utils.compiled_predict_proba(rf, X)
+    is_anomaly = np.zeros(len(X), dtype=bool)
+    if iso is not None:
+        gated = np.flatnonzero(probabilities > LEGACY.gate)
+        if len(gated):
+            is_anomaly[gated] = model_utils.compiled_decision_function(iso, X[gated]) < LEGACY.anomaly_threshold
+    return LEGACY.assign(probabilities, is_anomaly)
+
+
+class CompactionContext:
+    """Models, data splits and full-precision reference scores shared by every setting"""
+
+    def __init__(self, model_dir=MODEL_DIR, csv_path=None):
+        import joblib
+        from sklearn.model_selection import train_test_split
+
+        import train_models
+
+        self.model_dir = model_dir
+        self.rf_path = os.path.join(model_dir, 'rf_significance_model.pkl')
+        self.iso_path = os.path.join(model_dir, 'iso_anomaly_model.pkl')
+        self.rf_model = joblib.load(self.rf_path)
+        self.iso_model = joblib.load(self.iso_path) if os.path.exists(self.iso_path) else None
+        self.feature_names = joblib.load(os.path.join(model_dir, 'feature_names.pkl'))
+
+        X, y, _ = train_models.load_training_data(csv_path or train_models.CSV_PATH)
+        X = X[self.feature_names]
+        _, X_held_out, _, y_held_out = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+        X_val, X_test, _, y_test = train_test_split(X_held_out.values, y_held_out.values, test_size=0.5,
+                                                    random_state=42, stratify=y_held_out)
+        self.X_all = np.ascontiguousarray(X.values, dtype=np.float64)
+        self.X_val, self.X_test, self.y_test = X_val, X_test, y_test
+
+        self.rf_arrays, self.rf_meta = train_models.flatten_random_forest(self.rf_model)
+        self.rf_meta['source_sha256'] = train_models.file_sha256(self.rf_path)
+        self.iso_arrays = self.iso_meta = None
+        if self.iso_model is not None:
+            self.iso_arrays, self.iso_meta = train_models.flatten_isolation_forest(self.iso_model)
+            self.iso_meta['source_sha256'] = train_models.file_sha256(self.iso_path)
+
+        self.rf_reference = self.rf_model.predict_proba(self.X_all)[:, 1]
+        self.iso_reference = self.iso_model.decision_function(self.X_all) if self.iso_model is not None else None
+        self.test_reference = self.rf_model.predict_proba(X_test)[:, 1]
+        self.reference_classes = _flare_classes(*self.reference_forests(), self.X_all)
+        self._order = None
+
+    @property
+    def order(self):
+        """RF pruning order from the validation rows (computed once)"""
+        if self._order is None:
+            import model_utils
+            from model_registry import make_compiled_forest
+
+            forest = make_compiled_forest(self.rf_arrays, self.rf_meta)
+            self._order = pruning_order(model_utils.compiled_leaf_values(forest, self.X_val))
+        return self._order
+
+    def build(self, rf_bits=64, iso_bits=64, keep_trees=None):
+        """(rf arrays, rf meta, iso arrays, iso meta) for one setting"""
+        import train_models
+
+        rf_arrays, rf_meta = self.rf_arrays, self.rf_meta
+        if keep_trees is not None and keep_trees < rf_meta['n_trees']:
+            rf_arrays, rf_meta = train_models.flatten_random_forest(self.rf_model, kept_trees(self.order, keep_trees))
+            rf_meta['source_sha256'] = self.rf_meta['source_sha256']
+        rf_arrays, rf_meta = compact_forest(rf_arrays, rf_meta, rf_bits)
+        rf_meta['variant'] = variant_name(rf_bits, iso_bits, rf_meta['n_trees'], self.rf_meta['n_trees'])
+        iso_arrays = iso_meta = None
+        if self.iso_arrays is not None:
+            iso_arrays, iso_meta = compact_forest(self.iso_arrays, self.iso_meta, iso_bits)
+            iso_meta['variant'] = rf_meta['variant']
+        return rf_arrays, rf_meta, iso_arrays, iso_meta
+
+    def errors(self, rf_bits, iso_bits):
+        """Max |score change| on the dataset for a leaf quantization (no pruning)"""
+        import model_utils
+        from model_registry import make_compiled_forest
+
+        rf_arrays, rf_meta, iso_arrays, iso_meta = self.build(rf_bits, iso_bits)
+        rf_error = np.max(np.abs(model_utils.compiled_predict_proba(make_compiled_forest(rf_arrays, rf_meta), self.X_all)
+                                 - self.rf_reference))
+        iso_error = None
+        if iso_arrays is not None:
+            iso_error = np.max(np.abs(model_utils.compiled_decision_function(make_compiled_forest(iso_arrays, iso_meta), self.X_all)
+                                      - self.iso_reference))
+        return float(rf_error), None if iso_error is None else float(iso_error)
+
+    def auto_leaf_bits(self, tolerance=LEAF_TOLERANCE):
+        """Smallest leaf width per forest whose scores stay within tolerance"""
+        rf_bits = next(bits for bits in LEAF_BITS if bits == 64 or self.errors(bits, 64)[0] <= tolerance)
+        iso_bits = 64
+        if self.iso_arrays is not None:
+            iso_bits = next(bits for bits in LEAF_BITS if bits == 64 or self.errors(64, bits)[1] <= tolerance)
+        return rf_bits, iso_bits
+
+    def evaluate(self, rf_bits=64, iso_bits=64, keep_trees=None):
+        """Size, load time and accuracy deltas of one setting (written to a temp dir)"""
+        import model_utils
+        from sklearn.metrics import accuracy_score, roc_auc_score
+        from train_models import save_compiled_forest
+
+        rf_arrays, rf_meta, iso_arrays, iso_meta = self.build(rf_bits, iso_bits, keep_trees)
+        with tempfile.TemporaryDirectory() as directory:
+            save_compiled_forest(rf_arrays, rf_meta, 'rf_significance', directory)
+            if iso_arrays is not None:
+                save_compiled_forest(iso_arrays, iso_meta, 'iso_anomaly', directory)
+            size = forest_size_bytes(directory, 'rf_significance') + forest_size_bytes(directory, 'iso_anomaly')
+            rf_seconds, rf = _load_seconds(directory, 'rf_significance')
+            iso_seconds, iso = _load_seconds(directory, 'iso_anomaly') if iso_arrays is not None else (0.0, None)
+
+        probabilities = model_utils.compiled_predict_proba(rf, self.X_all)
+        test = model_utils.compiled_predict_proba(rf, self.X_test)
+        result = {
+            'variant': rf_meta['variant'],
+            'rf_trees': rf_meta['n_trees'],
+            'rf_leaf_bits': rf_bits,
+            'iso_leaf_bits': iso_bits if iso is not None else None,
+            'size_kb': round(size / 1024, 1),
+            'load_ms': round((rf_seconds + iso_seconds) * 1000, 2),
+            'rf_max_error': float(np.max(np.abs(probabilities - self.rf_reference))),
+            'accuracy_delta': float(accuracy_score(self.y_test, test > 0.5)
+                                    - accuracy_score(self.y_test, self.test_reference > 0.5)),
+            'auc_delta': float(roc_auc_score(self.y_test, test) - roc_auc_score(self.y_test, self.test_reference)),
+            'class_agreement': float(np.mean(_flare_classes(rf, iso, self.X_all) == self.reference_classes)),
+        }
+        if iso is not None:
+            result['iso_max_error'] = float(np.max(np.abs(model_utils.compiled_decision_function(iso, self.X_all)
+                                                          - self.iso_reference)))
+        return result
+
+    def reference_forests(self):
+        from model_registry import make_compiled_forest
+
+        rf = make_compiled_forest(self.rf_arrays, self.rf_meta)
+        iso = make_compiled_forest(self.iso_arrays, self.iso_meta) if self.iso_arrays is not None else None
+        return rf, iso
+
+    def baselines(self):
+        """Size and load time of the sklearn pickles and of models/compiled/, for comparison"""
+        import joblib
+        from model_registry import COMPILED_SUBDIR
+
+        paths = [p for p in (self.rf_path, self.iso_path) if os.path.exists(p)]
+        start = time.perf_counter()
+        for path in paths:
+            joblib.load(path)
+        baselines = {'sklearn pickles': {'size_kb': round(sum(os.path.getsize(p) for p in paths) / 1024, 1),
+                                         'load_ms': round((time.perf_counter() - start) * 1000, 2)}}
+        compiled_dir = os.path.join(self.model_dir, COMPILED_SUBDIR)
+        if os.path.exists(os.path.join(compiled_dir, 'rf_significance_meta.json')):
+            names = [n for n in ('rf_significance', 'iso_anomaly')
+                     if os.path.exists(os.path.join(compiled_dir, f'{n}_meta.json'))]
+            baselines['compiled'] = {
+                'size_kb': round(sum(forest_size_bytes(compiled_dir, n) for n in names) / 1024, 1),
+                'load_ms': round(sum(_load_seconds(compiled_dir, n)[0] for n in names) * 1000, 2),
+            }
+        return baselines
+
+
+def variant_name(rf_bits, iso_bits, rf_trees, total_trees):
+    """Short tag for a setting, e.g. 'q8-8' or 'q8-8-t50' (part of the served model version)"""
+    name = f'q{rf_bits}-{iso_bits}'
+    return name if rf_trees == total_trees else f'{name}-t{rf_trees}'
+
+
+def compaction_report(context, keep_fractions=(1.0, 0.75, 0.5, 0.25), bits_options=LEAF_BITS):
+    """Evaluate every leaf width (both forests alike) x share of RF trees kept"""
+    n_trees = context.rf_meta['n_trees']
+    return [context.evaluate(bits, bits, max(1, round(n_trees * fraction)))
+            for fraction in keep_fractions for bits in bits_options]
+
+
+def print_report(rows, baselines):
+    for name, baseline in baselines.items():
+        print(f"📦 {name}: {baseline['size_kb']} KB, loaded in {baseline['load_ms']} ms")
+    header = ['variant', 'trees', 'size KB', 'load ms', 'RF max err', 'ISO max err', 'acc Δ', 'AUC Δ', 'class agree']
+    print('  '.join(f'{h:>11}' for h in header))
+    for r in rows:
+        cells = [r['variant'], r['rf_trees'], r['size_kb'], r['load_ms'], f"{r['rf_max_error']:.1e}",
+                 f"{r.get('iso_max_error', float('nan')):.1e}", f"{r['accuracy_delta']:+.3f}",
+                 f"{r['auc_delta']:+.4f}", f"{r['class_agreement']:.4f}"]
+        print('  '.join(f'{c:>11}' for c in cells))
+
+
+def export_compact_models(model_dir=MODEL_DIR, leaf_bits='auto', keep_trees=None, tolerance=LEAF_TOLERANCE,
+                          report=False, csv_path=None):
+    """
+    Write models/compact/ for the trained models in model_dir.
+    leaf_bits: 8 / 16 / 32 / 64 for both forests, or 'auto' (smallest width
+    within tolerance, per forest). keep_trees: Random Forest trees to keep.
+    With report, print every setting's size / load time / accuracy first.
+    """
+    from train_models import save_compiled_forest
+
+    print("🔧 Compacting forests...")
+    context = CompactionContext(model_dir, csv_path)
+    if report:
+        print_report(compaction_report(context), context.baselines())
+
+    rf_bits, iso_bits = context.auto_leaf_bits(tolerance) if leaf_bits == 'auto' else (int(leaf_bits), int(leaf_bits))
+    result = context.evaluate(rf_bits, iso_bits, keep_trees)
+    rf_arrays, rf_meta, iso_arrays, iso_meta = context.build(rf_bits, iso_bits, keep_trees)
+
+    # Write next to the target, then swap the whole directory in
+    directory = os.path.join(model_dir, COMPACT_SUBDIR)
+    staging = directory + '.tmp'
+    shutil.rmtree(staging, ignore_errors=True)
+    save_compiled_forest(rf_arrays, rf_meta, 'rf_significance', staging)
+    if iso_arrays is not None:
+        save_compiled_forest(iso_arrays, iso_meta, 'iso_anomaly', staging)
+    with open(os.path.join(staging, 'report.json'), 'w') as f:
+        json.dump(result, f, indent=2)
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(staging, directory)
+
+    print(f"✅ Compact forests ({result['variant']}) saved to {directory}/: {result['size_kb']} KB, "
+          f"RF max error {result['rf_max_error']:.1e}, AUC Δ {result['auc_delta']:+.4f}, "
+          f"class agreement {result['class_agreement']:.4f}")
+    return result
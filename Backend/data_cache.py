@@ -0,0 +1,228 @@
+# backend/data_cache.py
+"""
+Typed columnar cache of HMI_CLEANED_DATA.csv.
+
+The CSV is parsed once, in chunks, into one raw binary file per column
+(explicit dtypes: float32 features, int64 epoch seconds for DATE /
+peak_datetime, int8 codes for the categorical flare_category) plus a JSON
+manifest. Later runs memory-map only the columns they need instead of
+re-parsing the whole file. The cache is rebuilt when the source file's
+size/mtime change and its SHA-256 no longer matches.
+
+Every CSV gets its own cache under HMI_CACHE_DIR (a subdirectory named
+after the file and a hash of its absolute path), so switching between
+CSVs - e.g. a `train_models.py label` output and the default one - or
+using them from two processes at once never rebuilds or overwrites
+another file's cache. Text columns other than the known ones (region
+names, label metadata...) are left out of the cache.
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+CACHE_DIR = os.environ.get('HMI_CACHE_DIR', 'cache/hmi')
+CSV_PATH = 'HMI_CLEANED_DATA.csv'
+MANIFEST = 'manifest.json'
+CACHE_FORMAT_VERSION = 1
+
+# float32 is what sklearn's trees use internally, so training on it gives
+# the same forests at half the memory of float64
+FEATURE_DTYPE = np.float32
+DATETIME_COLUMNS = ('DATE', 'peak_datetime')
+CATEGORICAL_COLUMNS = {'flare_category': ['A', 'B', 'C', 'M', 'X']}
+NAT = np.iinfo(np.int64).min
+
+
+def cache_dir_for(csv_path=CSV_PATH, cache_root=CACHE_DIR):
+    """Cache directory of one CSV: <cache_root>/<file name>-<hash of its absolute path>"""
+    path = os.path.abspath(csv_path)
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(cache_root, f"{name}-{hashlib.sha1(path.encode()).hexdigest()[:10]}")
+
+
+def _sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _source_fingerprint(csv_path):
+    stat = os.stat(csv_path)
+    return {'path': os.path.abspath(csv_path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def _read_manifest(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_manifest(cache_dir, manifest):
+    tmp = os.path.join(cache_dir, MANIFEST + '.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, os.path.join(cache_dir, MANIFEST))
+
+
+def cache_is_fresh(csv_path=CSV_PATH, cache_dir=CACHE_DIR):
+    """True when the cache matches the CSV (refreshes the stored mtime if only that changed)"""
+    cache_dir = cache_dir_for(csv_path, cache_dir)
+    manifest = _read_manifest(cache_dir)
+    if manifest is None or manifest.get('format') != CACHE_FORMAT_VERSION:
+        return False
+    source = _source_fingerprint(csv_path)
+    cached = manifest['source']
+    if cached['size'] == source['size'] and cached['mtime_ns'] == source['mtime_ns']:
+        return True
+    # Touched but maybe not changed: compare content hashes
+    if cached['size'] == source['size'] and _sha256(csv_path) == cached['sha256']:
+        manifest['source'].update(source)
+        _write_manifest(cache_dir, manifest)
+        return True
+    return False
+
+
+def _is_numeric(values):
+    """True when a column (first chunk) parses as numbers, i.e. belongs in the float32 cache"""
+    import pandas as pd
+
+    if pd.api.types.is_numeric_dtype(values):
+        return True
+    try:
+        pd.to_numeric(values)
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+def _convert_chunk(chunk, name):
+    """One CSV column chunk -> typed NumPy array"""
+    import pandas as pd
+
+    if name in DATETIME_COLUMNS:
+        values = pd.to_datetime(chunk[name], errors='coerce')
+        epochs = values.to_numpy(dtype='datetime64[s]').astype(np.int64)
+        epochs[values.isna().to_numpy()] = NAT
+        return epochs, np.int64
+    if name in CATEGORICAL_COLUMNS:
+        categories = CATEGORICAL_COLUMNS[name]
+        lookup = {c: i for i, c in enumerate(categories)}
+        codes = np.array([lookup.get(v, -1) for v in chunk[name].astype(str).str.strip().str[:1]], dtype=np.int8)
+        return codes, np.int8
+    values = chunk[name]
+    if not pd.api.types.is_numeric_dtype(values):
+        # Stray text in a later chunk of a numeric column reads as missing
+        values = pd.to_numeric(values, errors='coerce')
+    return values.to_numpy(dtype=FEATURE_DTYPE, na_value=np.nan), FEATURE_DTYPE
+
+
+def build_columnar_cache(csv_path=CSV_PATH, cache_dir=CACHE_DIR, chunksize=100_000):
+    """
+    Convert the CSV into per-column binary files (in cache_dir_for(csv_path,
+    cache_dir)), streaming it in chunks so the whole frame is never held in
+    memory. Returns the manifest.
+    """
+    import pandas as pd
+
+    start = time.perf_counter()
+    cache_dir = cache_dir_for(csv_path, cache_dir)
+    tmp_dir = cache_dir.rstrip('/') + '.building'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    files, dtypes, skipped, rows = {}, {}, None, 0
+    try:
+        for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+            if skipped is None:
+                skipped = [name for name in chunk.columns if name not in DATETIME_COLUMNS
+                           and name not in CATEGORICAL_COLUMNS and not _is_numeric(chunk[name])]
+            for name in chunk.columns:
+                if name in skipped:
+                    continue
+                values, dtype = _convert_chunk(chunk, name)
+                if name not in files:
+                    files[name] = open(os.path.join(tmp_dir, f'{name}.bin'), 'wb')
+                    dtypes[name] = np.dtype(dtype).str
+                values.astype(dtype, copy=False).tofile(files[name])
+            rows += len(chunk)
+    finally:
+        for f in files.values():
+            f.close()
+
+    manifest = {
+        'format': CACHE_FORMAT_VERSION,
+        'source': dict(_source_fingerprint(csv_path), sha256=_sha256(csv_path)),
+        'rows': rows,
+        'columns': {name: {'file': f'{name}.bin', 'dtype': dtypes[name]} for name in dtypes},
+        'categories': {name: cats for name, cats in CATEGORICAL_COLUMNS.items() if name in dtypes},
+        'skipped_columns': skipped or [],
+        'build_seconds': round(time.perf_counter() - start, 3),
+    }
+    _write_manifest(tmp_dir, manifest)
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    os.replace(tmp_dir, cache_dir)
+    print(f"✅ Built columnar cache for {rows} rows in {manifest['build_seconds']:.2f}s -> {cache_dir}/")
+    return manifest
+
+
+def ensure_columnar_cache(csv_path=CSV_PATH, cache_dir=CACHE_DIR):
+    """Manifest of an up-to-date cache, building it if needed"""
+    if not cache_is_fresh(csv_path, cache_dir):
+        return build_columnar_cache(csv_path, cache_dir)
+    return _read_manifest(cache_dir_for(csv_path, cache_dir))
+
+
+def load_columns(columns=None, csv_path=CSV_PATH, cache_dir=CACHE_DIR):
+    """
+    {name: read-only np.memmap} for the requested columns (default: all).
+    Only the pages that are actually touched get read from disk.
+    """
+    manifest = ensure_columnar_cache(csv_path, cache_dir)
+    cache_dir = cache_dir_for(csv_path, cache_dir)
+    names = list(manifest['columns']) if columns is None else list(columns)
+    missing = [name for name in names if name not in manifest['columns']]
+    if missing:
+        raise KeyError(f"Columns not in {csv_path}: {missing}")
+    result = {}
+    for name in names:
+        spec = manifest['columns'][name]
+        if manifest['rows'] == 0:
+            result[name] = np.empty(0, dtype=spec['dtype'])
+            continue
+        result[name] = np.memmap(os.path.join(cache_dir, spec['file']), dtype=spec['dtype'],
+                                 mode='r', shape=(manifest['rows'],))
+    return result
+
+
+def available_columns(csv_path=CSV_PATH, cache_dir=CACHE_DIR):
+    return list(ensure_columnar_cache(csv_path, cache_dir)['columns'])
+
+
+def load_feature_matrix(feature_columns, csv_path=CSV_PATH, cache_dir=CACHE_DIR):
+    """(n_rows, n_features) float32 matrix assembled from the memory-mapped columns"""
+    columns = load_columns(feature_columns, csv_path, cache_dir)
+    n_rows = len(next(iter(columns.values()))) if columns else 0
+    X = np.empty((n_rows, len(feature_columns)), dtype=FEATURE_DTYPE)
+    for j, name in enumerate(feature_columns):
+        X[:, j] = columns[name]
+    return X
+
+
+def load_flare_categories(csv_path=CSV_PATH, cache_dir=CACHE_DIR, column='flare_category'):
+    """(int8 codes, category labels) for the flare class column"""
+    manifest = ensure_columnar_cache(csv_path, cache_dir)
+    codes = load_columns([column], csv_path, cache_dir)[column]
+    return codes, manifest['categories'][column]
+
+
+if __name__ == "__main__":
+    import sys
+    build_columnar_cache(sys.argv[1] if len(sys.argv) > 1 else CSV_PATH)
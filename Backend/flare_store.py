@@ -0,0 +1,375 @@
+# backend/flare_store.py
+"""
+Local, indexed history of DONKI flare events.
+
+DONKI is slow and rate limited (DEMO_KEY), and /solar-now only ever asks
+it for the last 3 days. The flare store keeps every event we have fetched
+in SQLite (cache/flares.sqlite) so /flares can answer questions about the
+past locally:
+
+- flares is keyed on DONKI's flrID (two flares can peak in the same
+  minute, often both without an active region) with a secondary index on
+  (peak_time, class_flux, active_region), so a date-range query is one
+  index seek plus a scan that only visits the table for matching rows;
+  the class is stored as its peak flux (W/m^2) so "M1.0 or stronger" is
+  a plain numeric comparison
+- backfill() pages DONKI in `chunk_days` date ranges on the pooled
+  upstream client, at most `concurrency` requests at a time, retrying
+  429 / 5xx / network errors with exponential backoff (honouring
+  Retry-After). Every fetched range is recorded in backfill_ranges, so a
+  rerun only fetches what is missing plus the last REFRESH_DAYS, which
+  DONKI still revises
+- WAL mode: API readers never wait for a running backfill
+
+Backfill from the backend directory:
+    python flare_store.py backfill --start 2010-05-01 --end 2025-04-18
+"""
+import argparse
+import asyncio
+import calendar
+import logging
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+FLARE_STORE_PATH = os.environ.get("FLARE_STORE_PATH", os.path.join("cache", "flares.sqlite"))
+BACKFILL_CHUNK_DAYS = int(os.environ.get("FLARE_BACKFILL_CHUNK_DAYS", 30))
+BACKFILL_CONCURRENCY = int(os.environ.get("FLARE_BACKFILL_CONCURRENCY", 4))
+BACKFILL_MAX_RETRIES = 5
+BACKFILL_BASE_DELAY = 2.0
+# Ranges ending less than this many days before they were fetched are fetched again
+REFRESH_DAYS = 7
+
+DAY = 86400
+# Peak flux of a 1.0 flare of each GOES class, W/m^2
+CLASS_FLUX = {"A": 1e-8, "B": 1e-7, "C": 1e-6, "M": 1e-5, "X": 1e-4}
+_CLASS_RE = re.compile(r"^\s*([ABCMX])\s*(\d+(?:\.\d+)?)?", re.IGNORECASE)
+
+# Field order of the dicts query() returns (DONKI's names)
+EVENT_FIELDS = ("flrID", "peakTime", "beginTime", "endTime", "activeRegion", "classType", "sourceLocation")
+_SQL_TIME_FORMAT = "%Y-%m-%dT%H:%MZ"
+
+COLUMNS = ("flr_id", "peak_time", "active_region", "class_type", "class_flux",
+           "begin_time", "end_time", "source_location")
+
+# PRAGMA user_version of the current layout. 0: flares keyed on (peak_time, active_region)
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS flares (
+    flr_id TEXT PRIMARY KEY NOT NULL,     -- DONKI flrID, e.g. 2024-05-14T16:46:00-FLR-001
+    peak_time INTEGER NOT NULL,           -- epoch seconds (UTC)
+    active_region INTEGER NOT NULL,       -- NOAA region number, 0 when DONKI has none
+    class_type TEXT,
+    class_flux REAL,                      -- peak flux in W/m^2, NULL if the class is unknown
+    begin_time INTEGER,
+    end_time INTEGER,
+    source_location TEXT
+);
+-- class_flux / active_region ride along so their filters are checked before the row lookup
+-- (a rowid table: SQLite only defers that lookup for those, not for WITHOUT ROWID tables)
+CREATE INDEX IF NOT EXISTS flares_peak_time ON flares (peak_time, class_flux, active_region);
+CREATE TABLE IF NOT EXISTS backfill_ranges (
+    start_time INTEGER NOT NULL,          -- [start_time, end_time) in epoch seconds
+    end_time INTEGER NOT NULL,
+    fetched_at REAL NOT NULL,
+    events INTEGER NOT NULL,
+    PRIMARY KEY (start_time, end_time)
+);
+"""
+
+
+def class_flux(class_type):
+    """'M2.3' -> 2.3e-5 W/m^2 (a bare letter means 1.0); None if unparseable"""
+    match = _CLASS_RE.match(class_type or "")
+    if not match:
+        return None
+    return CLASS_FLUX[match.group(1).upper()] * float(match.group(2) or 1.0)
+
+
+def parse_time(value):
+    """ISO 8601 date/datetime (DONKI style '2024-05-14T16:51Z' included) -> epoch seconds, None if empty"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(calendar.timegm(parsed.utctimetuple()))
+
+
+def format_time(epoch):
+    return None if epoch is None else time.strftime("%Y-%m-%dT%H:%MZ", time.gmtime(epoch))
+
+
+def flare_row(event):
+    """DONKI FLR event dict -> flares row tuple (None when it has no flrID or usable peakTime)"""
+    peak_time = parse_time(event.get("peakTime") or event.get("beginTime"))
+    if peak_time is None or not event.get("flrID"):
+        return None
+    return (
+        event.get("flrID"),
+        peak_time,
+        int(event.get("activeRegion") or 0),
+        event.get("classType"),
+        class_flux(event.get("classType")),
+        parse_time(event.get("beginTime")),
+        parse_time(event.get("endTime")),
+        event.get("sourceLocation"),
+    )
+
+
+class FlareStore:
+    def __init__(self, path=FLARE_STORE_PATH):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._connect()
+        with conn:
+            self._migrate(conn)
+            conn.executescript(SCHEMA)
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.close()
+
+    @staticmethod
+    def _migrate(conn):
+        """
+        Rekey a version 0 flares table on flr_id. Rows without one are dropped,
+        and flares that collided on the old key were never stored, so every
+        backfilled range is forgotten: the next backfill pages DONKI again
+        """
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'flares'").fetchone()
+        if version >= SCHEMA_VERSION or not exists:
+            return
+        conn.execute("ALTER TABLE flares RENAME TO flares_v0")
+        conn.executescript(SCHEMA)
+        conn.execute(f"INSERT OR IGNORE INTO flares ({', '.join(COLUMNS)}) "
+                     f"SELECT {', '.join(COLUMNS)} FROM flares_v0 WHERE flr_id IS NOT NULL")
+        conn.execute("DROP TABLE flares_v0")
+        conn.execute("DELETE FROM backfill_ranges")
+        logger.info("🗃️ Flare store rekeyed on flrID (%d events), backfill ranges reset", conn.execute("SELECT COUNT(*) FROM flares").fetchone()[0])
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @property
+    def conn(self):
+        """One connection per thread (sqlite3 connections are not shared across threads)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def add_events(self, events):
+        """Upsert DONKI events; returns how many were usable"""
+        rows = [row for row in map(flare_row, events) if row is not None]
+        with self.conn:
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO flares ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})", rows)
+        return len(rows)
+
+    def record_range(self, start_time, end_time, events, fetched_at=None):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO backfill_ranges VALUES (?, ?, ?, ?)",
+                              (start_time, end_time, fetched_at or time.time(), events))
+
+    def is_covered(self, start_time, end_time):
+        """True when [start_time, end_time) was fetched and has settled since"""
+        row = self.conn.execute(
+            "SELECT 1 FROM backfill_ranges WHERE start_time <= ? AND end_time >= ? AND fetched_at >= ? LIMIT 1",
+            (start_time, end_time, end_time + REFRESH_DAYS * DAY)).fetchone()
+        return row is not None
+
+    def query(self, start_time=None, end_time=None, min_flux=None, region=None, limit=None):
+        """Flares with start_time <= peak < end_time, oldest first, as DONKI-style dicts"""
+        # Times are formatted by SQLite, so each row costs one dict(zip()) in Python
+        sql = ("SELECT flr_id, " + ", ".join(f"strftime('{_SQL_TIME_FORMAT}', {column}, 'unixepoch')"
+                                             for column in ("peak_time", "begin_time", "end_time"))
+               + ", NULLIF(active_region, 0), class_type, source_location"
+               " FROM flares WHERE peak_time >= ? AND peak_time < ?")
+        params = [start_time if start_time is not None else -2**62, end_time if end_time is not None else 2**62]
+        if min_flux is not None:
+            sql += " AND class_flux >= ?"
+            params.append(min_flux)
+        if region is not None:
+            sql += " AND active_region = ?"
+            params.append(int(region))
+        sql += " ORDER BY peak_time"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        return [dict(zip(EVENT_FIELDS, row)) for row in self.conn.execute(sql, params)]
+
+    def stats(self):
+        count, first, last = self.conn.execute("SELECT COUNT(*), MIN(peak_time), MAX(peak_time) FROM flares").fetchone()
+        ranges, covered_from, covered_to = self.conn.execute(
+            "SELECT COUNT(*), MIN(start_time), MAX(end_time) FROM backfill_ranges").fetchone()
+        return {
+            "path": self.path,
+            "events": count,
+            "first_peak": format_time(first),
+            "last_peak": format_time(last),
+            "backfilled_ranges": ranges,
+            "coverage_start": format_time(covered_from),
+            "coverage_end": format_time(covered_to),
+        }
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def date_chunks(start, end, chunk_days=BACKFILL_CHUNK_DAYS):
+    """[(first_day, last_day)] inclusive date ranges covering start..end"""
+    chunks = []
+    day = start
+    while day <= end:
+        last = min(day + timedelta(days=chunk_days - 1), end)
+        chunks.append((day, last))
+        day = last + timedelta(days=1)
+    return chunks
+
+
+class BackfillError(Exception):
+    """A DONKI range could not be fetched (non-retryable status, or retries exhausted)"""
+
+
+async def fetch_range(client, url, api_key, first_day, last_day, max_retries=BACKFILL_MAX_RETRIES,
+                      base_delay=BACKFILL_BASE_DELAY, stats=None):
+    """One DONKI FLR page (both days inclusive) with retry/backoff; returns the event list"""
+    params = {"startDate": first_day.isoformat(), "endDate": last_day.isoformat(), "api_key": api_key}
+    for attempt in range(max_retries + 1):
+        retry_after = None
+        try:
+            response = await client.get(url, params=params)
+            if response.status_code == 429 or response.status_code >= 500:
+                retry_after = response.headers.get("Retry-After")
+                error = f"HTTP {response.status_code}"
+            elif response.status_code >= 400:
+                raise BackfillError(f"{first_day}..{last_day}: HTTP {response.status_code}")
+            else:
+                # DONKI answers an empty range with an empty body
+                return response.json() if response.content.strip() else []
+        except httpx.HTTPError as e:
+            error = f"{type(e).__name__}: {e}"
+        if attempt == max_retries:
+            raise BackfillError(f"{first_day}..{last_day}: {error} after {max_retries} retries")
+        delay = base_delay * 2 ** attempt * (0.5 + random.random())
+        if retry_after is not None:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                pass
+        if stats is not None:
+            stats["retries"] += 1
+        logger.debug("🔁 DONKI %s..%s: %s, retrying in %.1fs", first_day, last_day, error, delay)
+        await asyncio.sleep(delay)
+
+
+async def backfill(store, start, end, chunk_days=BACKFILL_CHUNK_DAYS, concurrency=BACKFILL_CONCURRENCY,
+                   url=None, api_key=None, client=None, max_retries=BACKFILL_MAX_RETRIES,
+                   base_delay=BACKFILL_BASE_DELAY, force=False):
+    """
+    Fetch every DONKI flare with start <= peak day <= end (datetime.date)
+    into the store. Ranges already fetched (and settled) are skipped unless
+    force=True. Returns a summary dict; failed ranges are listed, not raised.
+    """
+    import upstream
+
+    url = url or upstream.NASA_DONKI_URL
+    api_key = api_key or upstream.NASA_API_KEY
+    client = client or upstream.get_http_client()
+    started = time.perf_counter()
+    stats = {"chunks": 0, "skipped": 0, "fetched": 0, "events": 0, "retries": 0, "failed": []}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_chunk(first_day, last_day):
+        start_time = parse_time(first_day.isoformat())
+        end_time = parse_time(last_day.isoformat()) + DAY
+        if not force and await asyncio.to_thread(store.is_covered, start_time, end_time):
+            stats["skipped"] += 1
+            return
+        async with semaphore:
+            try:
+                events = await fetch_range(client, url, api_key, first_day, last_day, max_retries, base_delay, stats)
+            except BackfillError as e:
+                stats["failed"].append(str(e))
+                logger.warning("⚠️ DONKI backfill: %s", e)
+                return
+
+        def save():
+            added = store.add_events(events)
+            store.record_range(start_time, end_time, added)
+            return added
+
+        added = await asyncio.to_thread(save)
+        stats["events"] += added
+        stats["fetched"] += 1
+
+    chunks = date_chunks(start, end, chunk_days)
+    stats["chunks"] = len(chunks)
+    await asyncio.gather(*(run_chunk(first_day, last_day) for first_day, last_day in chunks))
+    stats["elapsed_seconds"] = round(time.perf_counter() - started, 2)
+    logger.info("📚 DONKI backfill %s..%s: %d ranges fetched, %d skipped, %d failed, %d events, %d retries (%.1fs)",
+                start, end, stats["fetched"], stats["skipped"], len(stats["failed"]), stats["events"],
+                stats["retries"], stats["elapsed_seconds"])
+    return stats
+
+
+def create_flare_store_from_env():
+    """
+    Environment variables:
+      FLARE_STORE_PATH             SQLite file (default cache/flares.sqlite, empty disables)
+      FLARE_BACKFILL_CHUNK_DAYS    days per DONKI request (default 30)
+      FLARE_BACKFILL_CONCURRENCY   DONKI requests in flight (default 4)
+    Returns None when disabled.
+    """
+    if not FLARE_STORE_PATH:
+        return None
+    return FlareStore(FLARE_STORE_PATH)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="DONKI flare history store")
+    commands = parser.add_subparsers(dest="command", required=True)
+    fill = commands.add_parser("backfill", help="fetch a date range from DONKI into the store")
+    fill.add_argument("--start", type=date.fromisoformat, required=True)
+    fill.add_argument("--end", type=date.fromisoformat, default=datetime.now(timezone.utc).date())
+    fill.add_argument("--chunk-days", type=int, default=BACKFILL_CHUNK_DAYS)
+    fill.add_argument("--concurrency", type=int, default=BACKFILL_CONCURRENCY)
+    fill.add_argument("--force", action="store_true", help="refetch ranges that are already stored")
+    commands.add_parser("stats", help="print what the store holds")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    store = FlareStore()
+    if args.command == "backfill":
+        import upstream
+
+        async def run():
+            try:
+                return await backfill(store, args.start, args.end, args.chunk_days, args.concurrency, force=args.force)
+            finally:
+                await upstream.close_http_client()
+
+        result = asyncio.run(run())
+        for failure in result["failed"]:
+            print(f"❌ {failure}")
+    print(store.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# backend/inference_pool.py
+"""
+Bounded executor for model inference.
+
+sklearn calls are CPU-bound and synchronous, so running them directly inside
+an async endpoint blocks the uvicorn event loop (and every other endpoint with
+it). The pool runs them on worker threads (or processes) and admits at most
+`max_workers + queue_depth` jobs at once; anything beyond that is rejected
+immediately with InferencePoolFull so the API can answer 503 instead of
+letting latency grow without limit.
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+
+class InferencePoolFull(Exception):
+    """Raised when every worker is busy and the wait queue is full"""
+
+
+class InferencePool:
+    def __init__(self, max_workers=4, queue_depth=32, kind="thread"):
+        self.max_workers = max_workers
+        self.queue_depth = queue_depth
+        self.kind = kind
+        self.capacity = max_workers + queue_depth
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._rejected = 0
+        self._completed = 0
+
+        if max_workers <= 0:
+            # Inline mode: run on the event loop (the old blocking behaviour)
+            self._executor = None
+        elif kind == "process":
+            self._executor = ProcessPoolExecutor(max_workers=max_workers)
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="inference")
+
+    def _release(self, _future=None):
+        with self._lock:
+            self._in_flight -= 1
+            self._completed += 1
+
+    async def run(self, fn, *args):
+        """Run fn(*args) on the pool and await its result"""
+        if self._executor is None:
+            return fn(*args)
+
+        with self._lock:
+            if self._in_flight >= self.capacity:
+                self._rejected += 1
+                raise InferencePoolFull(
+                    f"Inference queue full ({self._in_flight} jobs in flight, capacity {self.capacity})"
+                )
+            self._in_flight += 1
+
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._release()
+            raise
+        # Release the slot when the job really finishes, even if the caller
+        # was cancelled (e.g. the client disconnected) while it was running
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "kind": self.kind if self._executor is not None else "inline",
+                "workers": self.max_workers,
+                "queue_depth": self.queue_depth,
+                "in_flight": self._in_flight,
+                "completed": self._completed,
+                "rejected": self._rejected,
+            }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def create_inference_pool_from_env():
+    """
+    Build the pool from environment variables:
+      INFERENCE_WORKERS      worker count (0 = run inline on the event loop)
+      INFERENCE_QUEUE_DEPTH  jobs allowed to wait for a worker before 503
+      INFERENCE_POOL_KIND    'thread' (default) or 'process'
+    """
+    max_workers = int(os.environ.get("INFERENCE_WORKERS", min(4, os.cpu_count() or 1)))
+    queue_depth = int(os.environ.get("INFERENCE_QUEUE_DEPTH", 32))
+    kind = os.environ.get("INFERENCE_POOL_KIND", "thread")
+    return InferencePool(max_workers=max_workers, queue_depth=queue_depth, kind=kind)
@@ -0,0 +1,242 @@
+# backend/labeling.py
+"""
+Label SHARP feature rows with the flares that follow them.
+
+For every row observed at time t (optionally in NOAA region r) the label
+is the strongest flare whose peak falls in [t, t + horizon) - in the same
+region when a region column is given - written as the two columns the
+training code reads: flare_category (GOES letter A/B/C/M/X, empty when no
+flare follows) and peak_datetime (that flare's peak). With daily rows and
+a 24 h horizon this is "the strongest flare of the day", the labelling
+HMI_CLEANED_DATA.csv was made with.
+
+The join never builds the rows x events product:
+
+- events are sorted once by (region, peak time) into one int64 key array
+  and a sparse table of "index of the strongest event in [i, i + 2^k)" is
+  built over them - O(m log m) for m events
+- each row's window becomes a [lo, hi) slice of that key array via two
+  searchsorted calls, and the strongest event in the slice is the better
+  of two sparse-table lookups - O(log m) per row, all vectorized
+- rows are streamed through in chunks (label_csv), so memory is one chunk
+  plus the event index, however many millions of rows there are
+
+Run from the backend directory:
+    python train_models.py label --events cache/flares.sqlite --out HMI_LABELED_DATA.csv
+"""
+import os
+import time
+
+import numpy as np
+
+CLASS_LETTERS = 'ABCMX'
+HORIZON_HOURS = 24
+CHUNK_ROWS = 100_000
+NAT = np.iinfo(np.int64).min
+
+_TIME_BITS = 33  # peak times are stored relative to the first event, in seconds (~272 years)
+
+
+def _class_codes(class_types):
+    """'M2.3' -> 3 (index into CLASS_LETTERS), -1 if unknown"""
+    lookup = {letter: i for i, letter in enumerate(CLASS_LETTERS)}
+    return np.array([lookup.get(str(c).strip()[:1].upper(), -1) for c in class_types], dtype=np.int8)
+
+
+class FlareIndex:
+    """
+    Flare events prepared for windowed "strongest flare" lookups. Built with
+    `regions` it answers region joins only, without them time-only joins.
+    """
+
+    def __init__(self, peak_times, fluxes, class_codes, regions=None):
+        peak_times = np.asarray(peak_times, dtype=np.int64)
+        fluxes = np.asarray(fluxes, dtype=np.float64)
+        class_codes = np.asarray(class_codes, dtype=np.int8)
+        self.by_region = regions is not None
+        regions = np.asarray(regions, dtype=np.int64) if self.by_region else np.zeros(len(peak_times), dtype=np.int64)
+        usable = (class_codes >= 0) & np.isfinite(fluxes)
+        peak_times, fluxes, class_codes, regions = (a[usable] for a in (peak_times, fluxes, class_codes, regions))
+
+        self.origin = int(peak_times.min()) if len(peak_times) else 0
+        keys = (regions << _TIME_BITS) | (peak_times - self.origin)
+        order = np.argsort(keys, kind='stable')
+        self.keys = keys[order]
+        self.peak_times = peak_times[order]
+        self.fluxes = fluxes[order]
+        self.class_codes = class_codes[order]
+
+        # levels[k][i]: index of the strongest event in [i, i + 2^k); ties go to the earlier event
+        self.levels = [np.arange(len(self.keys), dtype=np.int64)]
+        width = 1
+        while 2 * width <= len(self.keys):
+            previous = self.levels[-1]
+            left, right = previous[:-width], previous[width:]
+            self.levels.append(np.where(self.fluxes[right] > self.fluxes[left], right, left))
+            width *= 2
+
+    def __len__(self):
+        return len(self.keys)
+
+    @classmethod
+    def from_records(cls, events, by_region=False, time_field='peakTime', class_field='classType',
+                     region_field='activeRegion'):
+        """From DONKI-style dicts (e.g. the DONKI FLR JSON)"""
+        from flare_store import class_flux, parse_time
+
+        events = [e for e in events if e.get(time_field) and e.get(class_field)]
+        return cls(
+            [parse_time(e[time_field]) for e in events],
+            [class_flux(e[class_field]) or np.nan for e in events],
+            _class_codes(e[class_field] for e in events),
+            [int(e.get(region_field) or 0) for e in events] if by_region else None,
+        )
+
+    @classmethod
+    def from_store(cls, store, by_region=False):
+        """Every event in a FlareStore (flare_store.py)"""
+        rows = store.conn.execute(
+            "SELECT peak_time, class_flux, class_type, active_region FROM flares WHERE class_flux IS NOT NULL").fetchall()
+        peak_times, fluxes, class_types, regions = zip(*rows) if rows else ((), (), (), ())
+        return cls(peak_times, fluxes, _class_codes(class_types), regions if by_region else None)
+
+    @classmethod
+    def from_csv(cls, path, by_region=False, time_column='peakTime', class_column='classType',
+                 region_column='activeRegion'):
+        """From an event CSV (DONKI column names by default)"""
+        import pandas as pd
+        from flare_store import class_flux
+
+        usecols = [time_column, class_column] + ([region_column] if by_region else [])
+        df = pd.read_csv(path, usecols=usecols).dropna(subset=[time_column, class_column])
+        peak_times = pd.to_datetime(df[time_column], utc=True).to_numpy(dtype='datetime64[s]').astype(np.int64)
+        regions = df[region_column].fillna(0).to_numpy(dtype=np.int64) if by_region else None
+        return cls(peak_times, [class_flux(c) or np.nan for c in df[class_column]],
+                   _class_codes(df[class_column]), regions)
+
+    def strongest(self, times, horizon_seconds, regions=None):
+        """
+        Index (into this index's arrays) of the strongest event peaking in
+        [t, t + horizon) - in the same region when `regions` is given - or -1
+        """
+        times = np.asarray(times, dtype=np.int64)
+        result = np.full(len(times), -1, dtype=np.int64)
+        if len(self.keys) == 0:
+            return result
+        if (regions is not None) != self.by_region:
+            raise ValueError("region join needs an index built with regions, time-only join one without")
+        if regions is None:
+            regions = np.zeros(len(times), dtype=np.int64)
+            valid = times != NAT
+        else:
+            regions = np.asarray(regions, dtype=np.int64)
+            # Rows without a region can't be attributed to a region's flares (nor can events without one)
+            valid = (times != NAT) & (regions > 0)
+        limit = (1 << _TIME_BITS) - 1
+        start = np.clip(times - self.origin, 0, limit)
+        end = np.clip(times - self.origin + horizon_seconds, 0, limit)
+        lo = np.searchsorted(self.keys, (regions << _TIME_BITS) | start, side='left')
+        hi = np.searchsorted(self.keys, (regions << _TIME_BITS) | end, side='left')
+        counts = np.where(valid, hi - lo, 0)
+
+        found = counts > 0
+        levels = np.zeros(len(times), dtype=np.int64)
+        levels[found] = np.floor(np.log2(counts[found])).astype(np.int64)
+        # One vectorized pass per sparse-table level present in this batch
+        for k in np.unique(levels[found]):
+            rows = np.flatnonzero(found & (levels == k))
+            table = self.levels[k]
+            first = table[lo[rows]]
+            second = table[hi[rows] - (1 << int(k))]
+            result[rows] = np.where(self.fluxes[second] > self.fluxes[first], second, first)
+        return result
+
+
+def label_rows(times, index, horizon_hours=HORIZON_HOURS, regions=None):
+    """
+    (flare_category object array - None for no flare, peak epoch seconds
+    int64 - NAT for no flare) for rows observed at `times` (epoch seconds)
+    """
+    best = index.strongest(times, int(horizon_hours * 3600), regions)
+    found = best >= 0
+    letters = np.array(list(CLASS_LETTERS) + [None], dtype=object)
+    categories = letters[np.where(found, index.class_codes[best], len(CLASS_LETTERS))]
+    peaks = np.where(found, index.peak_times[best], NAT)
+    return categories, peaks
+
+
+def _epochs(series):
+    import pandas as pd
+
+    values = pd.to_datetime(series, errors='coerce', utc=True)
+    epochs = values.to_numpy(dtype='datetime64[s]').astype(np.int64)
+    epochs[values.isna().to_numpy()] = NAT
+    return epochs
+
+
+def label_frame(df, index, horizon_hours=HORIZON_HOURS, time_column='DATE', region_column=None):
+    """Set flare_category / peak_datetime on a DataFrame of SHARP rows (in place) and return it"""
+    import pandas as pd
+
+    regions = None
+    if region_column is not None:
+        regions = pd.to_numeric(df[region_column], errors='coerce').fillna(0).to_numpy(dtype=np.int64)
+    categories, peaks = label_rows(_epochs(df[time_column]), index, horizon_hours, regions)
+    df['peak_datetime'] = pd.to_datetime(np.where(peaks == NAT, np.datetime64('NaT'), peaks.astype('datetime64[s]')))
+    df['flare_category'] = categories
+    return df
+
+
+def label_csv(rows_csv, index, out_csv, horizon_hours=HORIZON_HOURS, time_column='DATE', region_column=None,
+              chunksize=CHUNK_ROWS):
+    """
+    Stream rows_csv through label_frame chunk by chunk into out_csv
+    (written to a temporary file and renamed). Returns a summary dict.
+    """
+    import pandas as pd
+
+    start = time.perf_counter()
+    rows = 0
+    counts = dict.fromkeys(CLASS_LETTERS, 0)
+    tmp_path = out_csv + '.tmp'
+    try:
+        with open(tmp_path, 'w', newline='') as out:
+            for i, chunk in enumerate(pd.read_csv(rows_csv, chunksize=chunksize)):
+                label_frame(chunk, index, horizon_hours, time_column, region_column)
+                chunk.to_csv(out, header=(i == 0), index=False, date_format='%Y-%m-%d %H:%M:%S')
+                rows += len(chunk)
+                for letter, n in chunk['flare_category'].value_counts().items():
+                    counts[letter] += int(n)
+        os.replace(tmp_path, out_csv)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    elapsed = time.perf_counter() - start
+    summary = {
+        'rows': rows,
+        'events': len(index),
+        'horizon_hours': horizon_hours,
+        'region_join': region_column is not None,
+        'labeled': sum(counts.values()),
+        'categories': counts,
+        'seconds': round(elapsed, 2),
+    }
+    print(f"🏷️ Labeled {rows} rows against {len(index)} flares ({horizon_hours} h horizon"
+          f"{', by region' if region_column else ''}) in {elapsed:.1f}s -> {out_csv}")
+    print(f"   {summary['labeled']} rows have a flare: {counts}")
+    return summary
+
+
+def load_flare_index(events_path, by_region=False):
+    """FlareIndex from a flare store (.sqlite) or an event CSV"""
+    if events_path.endswith(('.sqlite', '.db')):
+        from flare_store import FlareStore
+
+        store = FlareStore(events_path)
+        try:
+            return FlareIndex.from_store(store, by_region)
+        finally:
+            store.close()
+    return FlareIndex.from_csv(events_path, by_region)
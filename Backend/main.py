@@ -1,15 +1,136 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Header, Request
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-import pandas as pd
+from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse, Response
+from pydantic import BaseModel, ValidationError
 import numpy as np
-import requests
-import joblib
-from model_utils import predict_flare_anomaly
-from datetime import datetime, timedelta
+from model_utils import (predict_flare_anomaly, predict_flare_anomaly_batch, predict_flare_anomaly_rows, probe_bundle,
+                         HMI_FEATURE_RANGES)
+from model_registry import registry, ModelWatcher
+from upstream import get_donki_flares, get_latest_xray_sample, close_http_client, fetch_json, NOAA_XRAY_URL, DonkiFlareWatcher, cache as upstream_cache
+from xray_buffer import FluxRingBuffer, XrayIngestor, parse_resample, time_tags_to_epoch, epoch_to_time_tags, XRAY_ENERGY_BAND
+from inference_pool import InferencePoolFull, create_inference_pool_from_env
+from micro_batcher import create_micro_batcher_from_env
+from prediction_cache import prediction_cache
+from backtest import load_backtest_results
+from broadcaster import Broadcaster
+from flare_store import create_flare_store_from_env, backfill as backfill_flares, class_flux, parse_time
+from region_features import StaleUpdate, create_region_engine_from_env
+from wire_format import NPY_MEDIA_TYPE, is_npy, accepts_npy, decode_npy, encode_predictions_npy, npy_headers
+import metrics
+from metrics import PREDICT_STAGE_SECONDS, PREDICT_REQUEST_SECONDS, PREDICT_REQUESTS, PREDICT_ERRORS
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+import asyncio
+import logging
 import os
+import time
+from typing import Dict, List, Optional
 
-app = FastAPI(title="Solar Flare Prediction API", version="2.0.0")
+# Hot paths log at DEBUG; LOG_LEVEL=DEBUG brings the per-request messages back
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO").upper(),
+                    format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logger = logging.getLogger("main")
+
+# sklearn inference runs here, off the event loop, so cheap endpoints stay responsive
+inference_pool = create_inference_pool_from_env()
+
+# Server-push fan-out for /stream
+broadcaster = Broadcaster()
+
+def _publish_xray_samples(epochs, fluxes):
+    broadcaster.publish("xray", {
+        "time_tag": epoch_to_time_tags([epochs[-1]])[0],
+        "flux": float(fluxes[-1]),
+        "energy": XRAY_ENERGY_BAND,
+        "new_samples": len(fluxes),
+    })
+
+# In-flight flare store writes (referenced so they aren't garbage collected mid-run)
+_flare_writes = set()
+
+async def _store_then_publish_flares(flares):
+    try:
+        # INSERT + commit can wait on the disk or another writer's lock: keep it off the event loop
+        await asyncio.to_thread(flare_store.add_events, flares)
+    except Exception as e:
+        logger.error("❌ Storing %d new flares failed: %s", len(flares), e)
+    # Published after the write, so a client reacting to the event finds it in /flares
+    for flare in flares:
+        broadcaster.publish("flare", flare)
+
+def _publish_new_flares(flares):
+    if not flare_store:
+        for flare in flares:
+            broadcaster.publish("flare", flare)
+        return
+    task = asyncio.get_running_loop().create_task(_store_then_publish_flares(flares))
+    _flare_writes.add(task)
+    task.add_done_callback(_flare_writes.discard)
+
+# Local DONKI flare history behind /flares (see flare_store.py)
+flare_store = create_flare_store_from_env()
+# Optional: backfill the last N days from DONKI in the background at startup
+FLARE_BACKFILL_DAYS = int(os.environ.get("FLARE_BACKFILL_DAYS", 0))
+
+# Rolling X-ray flux history, filled by a background NOAA poller
+xray_buffer = FluxRingBuffer()
+xray_ingestor = (
+    XrayIngestor(xray_buffer, fetch_json, NOAA_XRAY_URL, on_new_samples=_publish_xray_samples)
+    if os.environ.get("XRAY_INGEST", "1") != "0" else None
+)
+donki_watcher = DonkiFlareWatcher(_publish_new_flares) if os.environ.get("DONKI_POLL", "1") != "0" else None
+# Serve /xray-flux from memory while the newest sample is at most this old
+XRAY_MAX_SAMPLE_AGE = float(os.environ.get("XRAY_MAX_SAMPLE_AGE", 900))
+
+# Per-region SHARP state and rolling temporal features behind /regions/{id}/update
+region_engine = create_region_engine_from_env(list(HMI_FEATURE_RANGES))
+
+# Optional: coalesce concurrent /predict calls into vectorized batches
+micro_batcher = create_micro_batcher_from_env(predict_flare_anomaly_rows, inference_pool.run)
+
+def _warmup_probe(bundle):
+    """Score the probe batch so the first real request is fast"""
+    return probe_bundle(bundle)
+
+# Optional: hot-reload when models/ changes (POST /admin/reload works either way)
+model_watcher = ModelWatcher(registry, probe=_warmup_probe) if os.environ.get("MODEL_WATCH", "0") == "1" else None
+# When set, /admin endpoints require a matching X-Admin-Token header
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load models in the background instead of at import time
+    if os.environ.get("MODEL_WARMUP", "1") != "0":
+        registry.warmup_in_background(probe=_warmup_probe)
+    if micro_batcher:
+        await micro_batcher.start()
+    if xray_ingestor:
+        xray_ingestor.start()
+    if donki_watcher:
+        donki_watcher.start()
+    if model_watcher:
+        model_watcher.start()
+    backfill_task = None
+    if flare_store and FLARE_BACKFILL_DAYS > 0:
+        today = datetime.now(timezone.utc).date()
+        backfill_task = asyncio.create_task(
+            backfill_flares(flare_store, today - timedelta(days=FLARE_BACKFILL_DAYS), today))
+    yield
+    if backfill_task:
+        backfill_task.cancel()
+    if model_watcher:
+        await model_watcher.stop()
+    if donki_watcher:
+        await donki_watcher.stop()
+    if xray_ingestor:
+        await xray_ingestor.stop()
+    if micro_batcher:
+        await micro_batcher.stop()
+    inference_pool.shutdown()
+    await close_http_client()
+
+app = FastAPI(title="Solar Flare Prediction API", version="2.0.0", lifespan=lifespan)
 
 # CORS for frontend connection
 app.add_middleware(
@@ -19,19 +140,52 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Load your trained model
-try:
-    model = joblib.load('models/random_forest_flare_model.pkl')
-    feature_names = joblib.load('models/feature_names.pkl')
-    print("✅ ML Model loaded successfully")
-except Exception as e:
-    print(f"⚠️ Model files not found: {e}")
-    model = None
-    feature_names = []
-
 class PredictionRequest(BaseModel):
     features: list
 
+class BatchPredictionRequest(BaseModel):
+    # Either a row-major matrix (N rows x 23 features)...
+    features: Optional[List[List[Optional[float]]]] = None
+    # ...or columnar arrays keyed by HMI feature name
+    columns: Optional[Dict[str, List[Optional[float]]]] = None
+
+class RegionUpdateRequest(BaseModel):
+    # Raw SHARP parameters by name; omitted / null ones are carried forward
+    parameters: Dict[str, Optional[float]]
+    # Observation time (ISO 8601, UTC if no offset); defaults to now
+    time: Optional[str] = None
+
+MAX_BATCH_ROWS = 10000
+
+async def _read_prediction_body(http_request: Request, model):
+    """
+    (model instance, None) for JSON bodies, or (None, matrix) for
+    application/x-npy bodies (see wire_format.py)
+    """
+    body = await http_request.body()
+    if is_npy(http_request.headers.get("content-type")):
+        try:
+            return None, decode_npy(body)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    try:
+        return model.model_validate_json(body), None
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+
+def _prediction_openapi(model):
+    """Request body docs for endpoints that take JSON or .npy"""
+    return {"requestBody": {"required": True, "content": {
+        "application/json": {"schema": model.model_json_schema()},
+        NPY_MEDIA_TYPE: {"schema": {"type": "string", "format": "binary"}},
+    }}}
+
+def _npy_response(probabilities, flare_classes):
+    # The worker has loaded the models by now; never risk loading them on the event loop
+    version = registry.get().version if registry.loaded else None
+    return Response(encode_predictions_npy(probabilities, flare_classes), media_type=NPY_MEDIA_TYPE,
+                    headers=npy_headers(version))
+
 @app.get("/")
 async def root():
     return {
@@ -45,22 +199,17 @@ async def root():
 async def get_live_solar_data():
     """Get real-time solar data from NASA APIs with robust fallbacks"""
     try:
-        print("🌞 Attempting to fetch NASA flare data...")
+        logger.debug("🌞 Attempting to fetch NASA flare data...")
         
-        # NASA DONKI API for flares - with better error handling
-        nasa_url = "https://api.nasa.gov/DONKI/FLR?startDate={}&endDate={}&api_key=DEMO_KEY".format(
-            (datetime.now() - timedelta(days=3)).strftime("%Y-%m-%d"),  # Reduced to 3 days for better results
-            datetime.now().strftime("%Y-%m-%d")
-        )
-        
-        nasa_response = requests.get(nasa_url, timeout=10)
+        # NASA DONKI API for flares - pooled client + TTL cache (see upstream.py)
         flare_data = []
-        
-        if nasa_response.status_code == 200:
-            flare_data = nasa_response.json()
-            print(f"✅ NASA API returned {len(flare_data)} flares")
-        else:
-            print(f"⚠️ NASA API returned status {nasa_response.status_code}")
+        nasa_ok = False
+        try:
+            flare_data = await get_donki_flares(days=3)  # Reduced to 3 days for better results
+            nasa_ok = True
+            logger.debug("✅ NASA API returned %d flares", len(flare_data))
+        except Exception as e:
+            logger.warning("⚠️ NASA API unavailable: %s", e)
         
         # If no flares from NASA, provide realistic educational data
         if not flare_data:
@@ -82,7 +231,7 @@ async def get_live_solar_data():
                     "activeRegion": "AR13425"
                 }
             ]
-            print("📚 Using educational flare data")
+            logger.info("📚 Using educational flare data")
         
         # Calculate active regions from unique sources
         active_regions = len(set(flare.get('activeRegion', 'Unknown') for flare in flare_data))
@@ -92,13 +241,13 @@ async def get_live_solar_data():
             "timestamp": datetime.now().isoformat(),
             "status": "success",
             "active_regions": active_regions if active_regions > 0 else 2,  # Minimum 2 for demo
-            "data_source": "NASA DONKI API" if nasa_response.status_code == 200 else "Educational Data",
+            "data_source": "NASA DONKI API" if nasa_ok else "Educational Data",
             "flare_count": len(flare_data),
             "message": "Solar data retrieved successfully"
         }
         
     except Exception as e:
-        print(f"❌ Error in solar-now: {e}")
+        logger.error("❌ Error in solar-now: %s", e)
         # Robust fallback for presentation
         return {
             "live_flares": [
@@ -125,72 +274,335 @@ async def get_live_solar_data():
             "message": "Solar data retrieved from educational sources"
         }
 
-@app.post("/predict")
-async def predict_flare(request: PredictionRequest):
-    """Make flare prediction using YOUR ML model"""
+async def _served_feature_names():
+    """Feature names of the served models, loading them in a worker thread if that hasn't happened yet"""
+    if registry.loaded:
+        return registry.get().feature_names
+    return await asyncio.to_thread(lambda: registry.get().feature_names)
+
+def _can_micro_batch(features):
+    """Only well-formed numeric rows are coalesced, so one bad request can't fail a whole batch"""
+    if not registry.loaded:
+        # Don't block the event loop on the initial model load
+        return False
+    bundle = registry.get()
+    return (
+        bundle.available
+        and len(features) == len(bundle.feature_names)
+        and all(value is None or (isinstance(value, (int, float)) and not isinstance(value, bool)) for value in features)
+    )
+
+@app.post("/predict", openapi_extra=_prediction_openapi(PredictionRequest))
+async def predict_flare(http_request: Request):
+    """
+    Make flare prediction using YOUR ML model.
+    Takes {"features": [...]} or one .npy row (Content-Type: application/x-npy);
+    Accept: application/x-npy returns a one-record .npy instead of JSON.
+    """
+    PREDICT_REQUESTS.inc("predict")
+    start = time.perf_counter()
     try:
-        flare_probability, flare_class = predict_flare_anomaly(request.features)
+        request, matrix = await _read_prediction_body(http_request, PredictionRequest)
+        if matrix is None:
+            features = request.features
+        elif len(matrix) == 1:
+            features = matrix[0].astype(np.float64).tolist()
+        else:
+            raise HTTPException(status_code=400, detail=f"/predict takes one row, got {len(matrix)}; use /predict/batch")
+
+        if micro_batcher and _can_micro_batch(features):
+            flare_probability, flare_class = await micro_batcher.submit(features)
+        else:
+            flare_probability, flare_class = await inference_pool.run(predict_flare_anomaly, features)
         
+        with PREDICT_STAGE_SECONDS.time("serialization"):
+            if flare_probability > 0.6:
+                confidence = "high"
+            elif flare_probability > 0.3:
+                confidence = "medium"
+            else:
+                confidence = "low"
+                
+            result = {
+                "prediction": float(flare_probability),
+                "confidence": confidence,
+                "flare_class": flare_class,
+                "timestamp": datetime.now().isoformat(),
+                "model_used": "Random Forest + Isolation Forest Ensemble",
+                "status": "prediction_success"
+            }
+            if accepts_npy(http_request.headers.get("accept")):
+                response = _npy_response([flare_probability], [flare_class])
+            else:
+                response = JSONResponse(result)
+        if len(broadcaster):
+            broadcaster.publish("prediction", result)
+        return response
+    except (HTTPException, RequestValidationError):
+        PREDICT_ERRORS.inc("predict")
+        raise
+    except InferencePoolFull as e:
+        PREDICT_ERRORS.inc("predict")
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except Exception as e:
+        PREDICT_ERRORS.inc("predict")
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        PREDICT_REQUEST_SECONDS.observe(time.perf_counter() - start, "predict")
+
+@app.post("/predict/batch", openapi_extra=_prediction_openapi(BatchPredictionRequest))
+async def predict_flare_batch(http_request: Request):
+    """
+    Score many HMI feature vectors in one vectorized two-stage pass.
+    Besides JSON, takes an (N, n_features) float32/float64 .npy matrix
+    (Content-Type: application/x-npy) and, with Accept: application/x-npy,
+    answers with a compact .npy record array (see wire_format.py).
+    """
+    PREDICT_REQUESTS.inc("predict_batch")
+    start = time.perf_counter()
+    try:
+        request, matrix = await _read_prediction_body(http_request, BatchPredictionRequest)
+        return await _predict_flare_batch(request, matrix, accepts_npy(http_request.headers.get("accept")))
+    except (HTTPException, RequestValidationError):
+        PREDICT_ERRORS.inc("predict_batch")
+        raise
+    finally:
+        PREDICT_REQUEST_SECONDS.observe(time.perf_counter() - start, "predict_batch")
+
+async def _predict_flare_batch(request: Optional[BatchPredictionRequest], matrix=None, binary=False):
+    if matrix is None and (request.features is None) == (request.columns is None):
+        raise HTTPException(status_code=400, detail="Provide exactly one of 'features' (row matrix) or 'columns' (columnar arrays)")
+
+    if matrix is not None:
+        # Read-only view over the request body; preprocessing makes the one float64 copy
+        rows = matrix
+    elif request.columns is not None:
+        feature_names = await _served_feature_names()
+        missing = [name for name in feature_names if name not in request.columns]
+        if missing:
+            raise HTTPException(status_code=400, detail=f"Missing feature columns: {missing}")
+        lengths = {len(request.columns[name]) for name in feature_names}
+        if len(lengths) > 1:
+            raise HTTPException(status_code=400, detail="All feature columns must have the same length")
+        rows = np.array([request.columns[name] for name in feature_names], dtype=np.float64).T
+    else:
+        rows = request.features
+
+    if len(rows) == 0:
+        raise HTTPException(status_code=400, detail="Batch is empty")
+    if len(rows) > MAX_BATCH_ROWS:
+        raise HTTPException(status_code=413, detail=f"Batch too large: {len(rows)} rows (max {MAX_BATCH_ROWS})")
+
+    try:
+        probabilities, flare_classes = await inference_pool.run(predict_flare_anomaly_batch, rows)
+    except InferencePoolFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    with PREDICT_STAGE_SECONDS.time("serialization"):
+        if binary:
+            return _npy_response(probabilities, flare_classes)
+        confidence = np.select([probabilities > 0.6, probabilities > 0.3], ["high", "medium"], default="low")
+
+        return JSONResponse({
+            "predictions": probabilities.tolist(),
+            "confidence": confidence.tolist(),
+            "flare_class": flare_classes.tolist(),
+            "count": len(probabilities),
+            "timestamp": datetime.now().isoformat(),
+            "model_used": "Random Forest + Isolation Forest Ensemble",
+            "status": "prediction_success"
+        })
+
+@app.post("/regions/{region_id}/update")
+async def update_region(region_id: str, request: RegionUpdateRequest):
+    """
+    Push a SHARP update for one active region and get a fresh prediction.
+    The region's rolling deltas / slopes / EWMA of the tracked parameters
+    are updated in O(1) (see region_features.py) and returned alongside the
+    prediction, which scores the region's gap-filled 23-feature snapshot.
+    """
+    if region_engine is None:
+        raise HTTPException(status_code=503, detail="Region tracking disabled (REGION_CAPACITY=0)")
+    PREDICT_REQUESTS.inc("region_update")
+    start = time.perf_counter()
+    try:
+        try:
+            epoch = parse_time(request.time) if request.time else int(time.time())
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid time: {e}")
+        try:
+            temporal, carried = region_engine.update(region_id, epoch, request.parameters)
+        except StaleUpdate as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        features = region_engine.snapshot(region_id, await _served_feature_names())
+        try:
+            flare_probability, flare_class = await inference_pool.run(predict_flare_anomaly, features)
+        except InferencePoolFull as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
         if flare_probability > 0.6:
             confidence = "high"
         elif flare_probability > 0.3:
             confidence = "medium"
         else:
             confidence = "low"
-            
         return {
+            "region": region_id,
+            "time": datetime.fromtimestamp(epoch, timezone.utc).isoformat(),
             "prediction": float(flare_probability),
             "confidence": confidence,
             "flare_class": flare_class,
-            "timestamp": datetime.now().isoformat(),
+            "temporal_features": temporal,
+            "carried_forward": carried,
             "model_used": "Random Forest + Isolation Forest Ensemble",
             "status": "prediction_success"
         }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    except HTTPException:
+        PREDICT_ERRORS.inc("region_update")
+        raise
+    finally:
+        PREDICT_REQUEST_SECONDS.observe(time.perf_counter() - start, "region_update")
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prediction pipeline timings and counters in the Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+# Research numbers from the dissertation, used when no metrics files exist
+DEFAULT_MODEL_PERFORMANCE = {
+    "accuracy": 0.914,
+    "precision": 0.209,
+    "recall": 0.237,
+    "f1_score": 0.222,
+    "auc_roc": 0.755,
+    "training_date": "2024-01-15",
+    "features_used": 23,
+    "model_type": "Random Forest + Isolation Forest Ensemble",
+    "significant_flares": 154,
+}
 
 @app.get("/model-performance")
-async def get_model_performance():
-    """Get your model's research performance metrics"""
+async def get_model_performance(windows: bool = False):
+    """
+    Get your model's research performance metrics.
+    Headline numbers come from the walk-forward backtest (backtest_results.json in
+    MODEL_DIR, see backtest.py) when it was run for the served Random Forest, else
+    from the training run's random split; a stale backtest is still listed.
+    ?windows=true adds the per-window metrics (column-wise).
+    """
+    result = dict(DEFAULT_MODEL_PERFORMANCE)
+    result["evaluation"] = "dissertation"
+    bundle = registry.get() if registry.loaded else None
+    if bundle and bundle.performance_metrics:
+        result.update(bundle.performance_metrics)
+        result["evaluation"] = "random_split"
+
+    backtest = load_backtest_results()
+    if backtest:
+        summary = backtest["summary"]
+        stale = bool(bundle and bundle.available and backtest.get("rf_sha256") != bundle.rf_sha256)
+        if not stale:
+            result.update({name: summary[name] for name in ("accuracy", "precision", "recall", "f1_score", "auc_roc")})
+            result["significant_flares"] = summary["significant_flares"]
+            result["evaluation"] = backtest["evaluation"]
+        result["backtest"] = {"generated_at": backtest["generated_at"], "params": backtest["params"], "summary": summary,
+                              "model_version": backtest.get("model_version"), "stale": stale}
+        if windows:
+            result["backtest"]["windows"] = backtest["windows"]
+
+    result["status"] = "metrics_loaded"
+    return result
+
+@app.post("/admin/reload")
+async def reload_models(force: bool = False, x_admin_token: Optional[str] = Header(None)):
+    """
+    Load the current models/ artifacts in the background, validate them on the
+    probe batch and swap them in atomically; requests are served throughout
+    """
+    if ADMIN_TOKEN and x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    report = await asyncio.to_thread(registry.reload, _warmup_probe, force)
+    if report["status"] in ("rejected", "in_progress"):
+        return JSONResponse(report, status_code=409)
+    return report
+
+FLARES_MAX_LIMIT = 10000
+
+@app.get("/flares")
+async def get_flares(start: Optional[str] = None, end: Optional[str] = None, min_class: Optional[str] = None,
+                     region: Optional[int] = None, limit: int = 1000):
+    """
+    Historical DONKI flares from the local store, oldest first.
+    start/end are ISO dates or datetimes (a date-only end includes that day),
+    min_class a GOES class such as "M" or "M5.0" (that flux or stronger).
+    Fill the store with `python flare_store.py backfill`.
+    """
+    if flare_store is None:
+        raise HTTPException(status_code=503, detail="Flare store disabled (FLARE_STORE_PATH is empty)")
+    try:
+        start_time = parse_time(start)
+        end_time = parse_time(end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid date: {e}")
+    if end_time is not None and len(end) == 10:
+        end_time += 86400
+    min_flux = None
+    if min_class:
+        min_flux = class_flux(min_class)
+        if min_flux is None:
+            raise HTTPException(status_code=400, detail=f"Invalid flare class {min_class!r} (expected e.g. C, M1.0, X)")
+    if not 1 <= limit <= FLARES_MAX_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {FLARES_MAX_LIMIT}")
+
+    flares = await asyncio.to_thread(flare_store.query, start_time, end_time, min_flux, region, limit + 1)
     return {
-        "accuracy": 0.914,
-        "precision": 0.209,
-        "recall": 0.237,
-        "f1_score": 0.222,
-        "auc_roc": 0.755,
-        "training_date": "2024-01-15",
-        "features_used": 23,
-        "model_type": "Random Forest + Isolation Forest Ensemble",
-        "significant_flares": 154,
-        "status": "metrics_loaded"
+        "flares": flares[:limit],
+        "count": min(len(flares), limit),
+        "truncated": len(flares) > limit,
+        "start": start,
+        "end": end,
+        "min_class": min_class,
+        "data_source": "Local DONKI flare store",
     }
 
 @app.get("/xray-flux")
 async def get_real_xray_flux():
     """Get REAL X-Ray flux data from NOAA with robust error handling"""
     try:
-        print("📡 Fetching NOAA X-ray data...")
-        
-        noaa_response = requests.get(
-            "https://services.swpc.noaa.gov/json/goes/primary/xrays-7-day.json",
-            timeout=10
-        )
+        # Answer from the in-memory ring buffer when the poller is keeping it fresh
+        latest = xray_buffer.latest()
+        if latest and time.time() - latest[0] <= XRAY_MAX_SAMPLE_AGE:
+            return {
+                "flux": latest[1],
+                "energy": XRAY_ENERGY_BAND,
+                "timestamp": epoch_to_time_tags([latest[0]])[0],
+                "source": "NOAA GOES Satellite",
+                "status": "live",
+                "message": "Real-time X-ray data from NOAA"
+            }
+
+        logger.debug("📡 Fetching NOAA X-ray data...")
         
-        if noaa_response.status_code == 200:
-            xray_data = noaa_response.json()
-            if xray_data and len(xray_data) > 0:
-                latest_flux = xray_data[-1]
-                print(f"✅ NOAA X-ray flux: {latest_flux.get('flux', 'N/A')}")
-                return {
-                    "flux": latest_flux.get('flux', 1.3e-6),  # Default to B1.3
-                    "energy": latest_flux.get('energy', '0.1-0.8nm'),
-                    "timestamp": latest_flux.get('time_tag', datetime.now().isoformat()),
-                    "source": "NOAA GOES Satellite",
-                    "status": "live",
-                    "message": "Real-time X-ray data from NOAA"
-                }
+        latest_flux = await get_latest_xray_sample()
+        if latest_flux:
+            logger.debug("✅ NOAA X-ray flux: %s", latest_flux.get('flux', 'N/A'))
+            return {
+                "flux": latest_flux.get('flux', 1.3e-6),  # Default to B1.3
+                "energy": latest_flux.get('energy', '0.1-0.8nm'),
+                "timestamp": latest_flux.get('time_tag', datetime.now().isoformat()),
+                "source": "NOAA GOES Satellite",
+                "status": "live",
+                "message": "Real-time X-ray data from NOAA"
+            }
         
-        print("⚠️ Using fallback X-ray data")
+        logger.warning("⚠️ Using fallback X-ray data")
         # Educational fallback
         return {
             "flux": 1.3e-6,  # B1.3 in scientific notation
@@ -202,7 +614,7 @@ async def get_real_xray_flux():
         }
         
     except Exception as e:
-        print(f"❌ X-ray flux error: {e}")
+        logger.error("❌ X-ray flux error: %s", e)
         return {
             "flux": 1.3e-6,
             "energy": "0.1-0.8nm",
@@ -212,6 +624,41 @@ async def get_real_xray_flux():
             "message": "Satellite data stream active"
         }
 
+@app.get("/xray-flux/history")
+async def get_xray_flux_history(since: Optional[str] = None, resample: Optional[str] = None, agg: str = "mean"):
+    """X-ray flux series from the in-memory buffer (default: last 6 hours)"""
+    try:
+        since_epoch = (
+            int(time_tags_to_epoch([since])[0]) if since
+            else int(time.time()) - 6 * 3600
+        )
+        resample_seconds = parse_resample(resample)
+        epochs, fluxes = xray_buffer.history(since_epoch, resample_seconds, agg)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {
+        "time_tag": epoch_to_time_tags(epochs),
+        "flux": fluxes.tolist(),
+        "count": len(fluxes),
+        "energy": XRAY_ENERGY_BAND,
+        "resample": resample,
+        "source": "NOAA GOES Satellite",
+        "status": "live" if len(xray_buffer) else "no_data"
+    }
+
+@app.get("/stream")
+async def stream_updates():
+    """Server-Sent Events: 'xray', 'flare' and 'prediction' updates as they happen"""
+    subscription = broadcaster.subscribe()
+    if subscription is None:
+        raise HTTPException(status_code=503, detail="Too many stream subscribers", headers={"Retry-After": "5"})
+    return StreamingResponse(
+        broadcaster.stream(subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @app.get("/system-status")
 async def get_system_status():
     """Get overall system status for monitoring"""
@@ -222,9 +669,18 @@ async def get_system_status():
         "components": {
             "solar_data": "active",
             "xray_flux": "active", 
-            "ml_model": "active" if model else "demo_mode",
+            "ml_model": ("active" if registry.get().available else "demo_mode") if registry.loaded else "loading",
             "api": "healthy"
         },
+        "models": registry.status(),
+        "inference_pool": inference_pool.stats(),
+        "micro_batching": micro_batcher.stats() if micro_batcher else "disabled",
+        "prediction_cache": prediction_cache.stats() if prediction_cache else "disabled",
+        "upstream_cache": dict(upstream_cache.stats),
+        "xray_ingestion": xray_ingestor.stats() if xray_ingestor else "disabled",
+        "flare_store": await asyncio.to_thread(flare_store.stats) if flare_store else "disabled",
+        "regions": region_engine.stats() if region_engine else "disabled",
+        "stream": broadcaster.stats(),
         "data_sources": ["NASA DONKI", "NOAA GOES", "SDO/AIA"],
         "message": "Solar Flare Prediction System Operational"
     }
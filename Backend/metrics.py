@@ -0,0 +1,195 @@
+# backend/metrics.py
+"""
+In-process, Prometheus-style metrics for the prediction hot path.
+
+Counters and fixed-bucket histograms are plain Python lists behind one
+lock per metric (no client library needed); render() produces the text
+exposition format served by GET /metrics. Recording a value costs a
+perf_counter() call, a bisect and a few list updates, and METRICS_ENABLED=0
+turns every call into an early return.
+
+Metrics are per process: with INFERENCE_POOL_KIND=process the stage
+timings recorded inside worker processes are not visible to /metrics,
+only the request-level ones recorded by the API process.
+"""
+import bisect
+import os
+import threading
+import time
+
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") != "0"
+
+# Seconds; tuned for stages that take tens of microseconds to a few hundred ms
+STAGE_BUCKETS = (25e-6, 50e-6, 100e-6, 250e-6, 500e-6, 1e-3, 2.5e-3, 5e-3, 10e-3, 25e-3, 50e-3, 100e-3, 250e-3, 1.0)
+
+_metrics = []
+
+
+def set_enabled(enabled):
+    """Turn recording on/off at runtime (used by the overhead benchmark)"""
+    global METRICS_ENABLED
+    METRICS_ENABLED = bool(enabled)
+
+
+def _format_labels(label, value, extra=""):
+    parts = []
+    if label is not None:
+        parts.append(f'{label}="{value}"')
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with at most one label"""
+
+    def __init__(self, name, help, label=None):
+        self.name = name
+        self.help = help
+        self.label = label
+        self._values = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def inc(self, label_value=None, amount=1):
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    def value(self, label_value=None):
+        return self._values.get(label_value, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for label_value, value in sorted(self._values.items(), key=lambda kv: str(kv[0])):
+            lines.append(f"{self.name}{_format_labels(self.label, label_value)} {_format_value(value)}")
+        return lines
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+class _Timer:
+    __slots__ = ("_histogram", "_label_value", "_start")
+
+    def __init__(self, histogram, label_value):
+        self._histogram = histogram
+        self._label_value = label_value
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._histogram.observe(time.perf_counter() - self._start, self._label_value)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Histogram:
+    """Fixed-bucket histogram with at most one label"""
+
+    def __init__(self, name, help, label=None, buckets=STAGE_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label value -> [per-bucket counts (+Inf last), sum, count]
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def observe(self, value, label_value=None):
+        if not METRICS_ENABLED:
+            return
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, label_value=None):
+        """Context manager that observes the elapsed wall time of its block"""
+        if not METRICS_ENABLED:
+            return _NULL_TIMER
+        return _Timer(self, label_value)
+
+    def count(self, label_value=None):
+        series = self._series.get(label_value)
+        return series[2] if series else 0
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: (list(counts), total, n) for key, (counts, total, n) in self._series.items()}
+        for label_value, (counts, total, n) in sorted(series.items(), key=lambda kv: str(kv[0])):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label, label_value, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label, label_value)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label, label_value)} {n}")
+        return lines
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+def render():
+    """Every registered metric in the Prometheus text exposition format"""
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def reset_all():
+    for metric in _metrics:
+        metric.reset()
+
+
+# === Prediction pipeline metrics ===
+
+# stage: validation, cap_outliers, rf, iso, serialization
+PREDICT_STAGE_SECONDS = Histogram(
+    "flare_predict_stage_seconds", "Wall time of each prediction pipeline stage", label="stage")
+PREDICT_REQUEST_SECONDS = Histogram(
+    "flare_predict_request_seconds", "End-to-end handler time of prediction endpoints", label="endpoint")
+PREDICT_REQUESTS = Counter(
+    "flare_predict_requests_total", "Prediction requests received", label="endpoint")
+PREDICT_ROWS = Counter(
+    "flare_predict_rows_total", "Feature rows scored by the two-stage model")
+PREDICT_ERRORS = Counter(
+    "flare_predict_errors_total", "Prediction failures (HTTP errors per endpoint, or swallowed pipeline errors)", label="source")
+MOCK_FALLBACKS = Counter(
+    "flare_predict_mock_fallbacks_total", "Rows answered with a mock prediction because no model is loaded")
+ANOMALY_GATE_HITS = Counter(
+    "flare_predict_anomaly_gate_hits_total", "Rows whose significance probability passed the gate into the Isolation Forest stage")
+ANOMALIES_DETECTED = Counter(
+    "flare_predict_anomalies_total", "Gated rows the Isolation Forest flagged as anomalous (X-class candidates)")
+PREDICTION_CACHE_EVENTS = Counter(
+    "flare_prediction_cache_events_total", "Prediction cache hits, misses, evictions, expirations and invalidations", label="event")
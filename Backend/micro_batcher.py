@@ -0,0 +1,117 @@
+# backend/micro_batcher.py
+"""
+Dynamic micro-batching for /predict.
+
+Concurrent single-row requests are collected for up to `max_wait_ms`
+milliseconds or `max_batch` rows (whichever comes first), scored with one
+vectorized two-stage pass, and each caller gets back its own
+(probability, flare_class) pair - exactly what predict_flare_anomaly
+returns, so the /predict response does not change. With
+model_utils.predict_flare_anomaly_rows as predict_batch_fn that holds on
+errors too: a failed batch is rescored row by row, and each row gets the
+single-row pipeline's safe default instead of a 500.
+"""
+import asyncio
+import os
+
+
+class MicroBatcher:
+    def __init__(self, predict_batch_fn, runner, max_wait_ms=5.0, max_batch=64):
+        """
+        predict_batch_fn: matrix -> (probabilities, flare_classes)
+        runner: async callable used to execute predict_batch_fn off the event
+                loop, e.g. InferencePool.run
+        """
+        self.predict_batch_fn = predict_batch_fn
+        self.runner = runner
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_batch = max_batch
+        self._queue = None
+        self._collector = None
+        self._running_batches = set()
+        self.batches = 0
+        self.rows = 0
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._collector = asyncio.create_task(self._collect())
+
+    async def stop(self):
+        if self._collector is not None:
+            self._collector.cancel()
+            try:
+                await self._collector
+            except asyncio.CancelledError:
+                pass
+            self._collector = None
+        if self._running_batches:
+            await asyncio.gather(*self._running_batches, return_exceptions=True)
+
+    async def submit(self, features):
+        """Queue one feature vector and wait for its (probability, flare_class)"""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((features, future))
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # Score this batch in the background and go straight back to
+            # collecting, so several batches can use the pool's workers at once
+            task = asyncio.create_task(self._run_batch(batch))
+            self._running_batches.add(task)
+            task.add_done_callback(self._running_batches.discard)
+
+    async def _run_batch(self, batch):
+        rows = [features for features, _ in batch]
+        try:
+            probabilities, flare_classes = await self.runner(self.predict_batch_fn, rows)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.rows += len(batch)
+        for (_, future), probability, flare_class in zip(batch, probabilities, flare_classes):
+            if not future.done():
+                future.set_result((float(probability), str(flare_class)))
+
+    def stats(self):
+        return {
+            "max_wait_ms": self.max_wait * 1000.0,
+            "max_batch": self.max_batch,
+            "batches": self.batches,
+            "rows": self.rows,
+            "mean_batch_size": self.rows / self.batches if self.batches else 0.0,
+        }
+
+
+def create_micro_batcher_from_env(predict_batch_fn, runner):
+    """
+    Opt-in via environment variables:
+      PREDICT_MICROBATCH=1        enable coalescing of concurrent /predict calls
+      MICROBATCH_MAX_WAIT_MS      how long to wait for more rows (default 5)
+      MICROBATCH_MAX_BATCH        rows per vectorized pass (default 64)
+    Returns None when disabled.
+    """
+    if os.environ.get("PREDICT_MICROBATCH", "0").lower() not in ("1", "true", "yes"):
+        return None
+    return MicroBatcher(
+        predict_batch_fn,
+        runner,
+        max_wait_ms=float(os.environ.get("MICROBATCH_MAX_WAIT_MS", 5)),
+        max_batch=int(os.environ.get("MICROBATCH_MAX_BATCH", 64)),
+    )
@@ -0,0 +1,446 @@
+# backend/model_registry.py
+"""
+Lazy model registry.
+
+Nothing is loaded at import time. The first call to registry.get() (or a
+background warmup thread started by the API) loads the model bundle:
+
+- feature names and performance metrics (tiny pickles)
+- the learned quantile outlier bounds (feature_bounds.json), if present
+- the fitted class-assignment table (class_assignment.npz, see
+  class_assignment.py), if present and fitted on this Random Forest
+- the compiled forests from models/compiled/, memory-mapped read-only so
+  several uvicorn workers share the same page-cache pages; with
+  MODEL_FORMAT=compact the smaller, possibly quantized / pruned ones from
+  models/compact/ (compact_models.py), which then serve every batch size
+- the sklearn estimators only if the compiled arrays are missing/stale, or
+  later on demand for large batches (importing sklearn alone costs ~1 s)
+
+Load time is recorded per artifact and reported by status().
+
+Incremental updates (model_update.py) write complete artifact sets to
+models/versions/<version>/ and then point models/CURRENT at the new one;
+the registry loads whatever CURRENT names, or models/ itself without it.
+
+Hot reload: reload() (POST /admin/reload, or ModelWatcher when models/
+changes) loads and warms a new bundle on the calling worker thread while
+requests keep using the active one, checks it against the fixed probe
+batch and then swaps it in with a single reference assignment. Requests
+take one bundle reference up front, so each is scored by exactly one
+version. With INFERENCE_POOL_KIND=process the worker processes keep the
+version they loaded; restart them (or use threads) to pick up a reload.
+"""
+import asyncio
+import collections
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+from class_assignment import CLASS_ASSIGNMENT_FILE, LEGACY, load_class_table
+
+logger = logging.getLogger(__name__)
+
+MODEL_DIR = os.environ.get('MODEL_DIR', 'models')
+COMPILED_SUBDIR = 'compiled'
+COMPACT_SUBDIR = 'compact'
+# 'compiled' (models/compiled/, sklearn for large batches) or 'compact' (models/compact/ only)
+MODEL_FORMAT = os.environ.get('MODEL_FORMAT', 'compiled')
+COMPILED_ARRAYS = ('feature', 'threshold', 'children', 'value', 'roots')
+VERSIONS_SUBDIR = 'versions'
+ACTIVE_VERSION_FILE = 'CURRENT'
+# A reload is rejected when the probe batch's mean |probability change| exceeds this
+RELOAD_MAX_DRIFT = float(os.environ.get('RELOAD_MAX_DRIFT', 0.25))
+MODEL_WATCH_INTERVAL = float(os.environ.get('MODEL_WATCH_INTERVAL', 5))
+
+
+def read_active_version(model_dir=MODEL_DIR):
+    """Name of the version models/CURRENT points at, or None"""
+    try:
+        with open(os.path.join(model_dir, ACTIVE_VERSION_FILE)) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def resolve_model_dir(model_dir=MODEL_DIR):
+    """Directory holding the active artifact set"""
+    version = read_active_version(model_dir)
+    if version is None:
+        return model_dir
+    return os.path.join(model_dir, VERSIONS_SUBDIR, version)
+
+
+def write_active_version(model_dir, version):
+    """Atomically point models/CURRENT at versions/<version> (None: back to models/ itself)"""
+    path = os.path.join(model_dir, ACTIVE_VERSION_FILE)
+    if version is None:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    with open(path + '.tmp', 'w') as f:
+        f.write(version + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + '.tmp', path)
+
+
+def artifact_signature(model_dir=MODEL_DIR):
+    """Cheap fingerprint (CURRENT + size/mtime of the model files) used to notice new artifacts"""
+    active_dir = resolve_model_dir(model_dir)
+    signature = [read_active_version(model_dir)]
+    for name in ('rf_significance_model.pkl', 'iso_anomaly_model.pkl', 'feature_names.pkl',
+                 os.path.join(COMPILED_SUBDIR, 'rf_significance_meta.json'),
+                 os.path.join(COMPILED_SUBDIR, 'iso_anomaly_meta.json'),
+                 os.path.join(COMPACT_SUBDIR, 'rf_significance_meta.json'), CLASS_ASSIGNMENT_FILE):
+        try:
+            stat = os.stat(os.path.join(active_dir, name))
+            signature.append((name, stat.st_size, stat.st_mtime_ns))
+        except OSError:
+            signature.append((name, None, None))
+    return tuple(signature)
+
+
+def make_compiled_forest(arrays, meta):
+    """Bundle packed node arrays + header into the dict the evaluator uses"""
+    forest = dict(arrays)
+    forest['meta'] = meta
+    # Interleaved (left, right) pairs: child = children_flat[2 * node + go_right]
+    forest['children_flat'] = np.asarray(arrays['children']).reshape(-1)
+    return forest
+
+
+def file_sha256(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def load_compiled_forest(name, source_path, directory=os.path.join(MODEL_DIR, COMPILED_SUBDIR), mmap_mode='r'):
+    """
+    Load a forest flattened by train_models.export_compiled_forests.
+    Returns None when it is missing or was compiled from a different
+    pickle than the one at source_path (i.e. the models were retrained
+    without re-exporting).
+    """
+    meta_path = os.path.join(directory, f'{name}_meta.json')
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path) as f:
+        meta = json.load(f)
+    if os.path.exists(source_path) and file_sha256(source_path) != meta.get('source_sha256'):
+        logger.warning("⚠️ Compiled %s is stale, using sklearn model", name)
+        return None
+    arrays = {key: np.load(os.path.join(directory, f'{name}_{key}.npy'), mmap_mode=mmap_mode)
+              for key in COMPILED_ARRAYS}
+    return make_compiled_forest(arrays, meta)
+
+
+class ModelBundle:
+    """One loaded set of model artifacts. Treated as immutable once built."""
+
+    def __init__(self, model_dir):
+        self.model_dir = model_dir
+        self.feature_names = []
+        self.performance_metrics = {}
+        self.compiled_rf = None
+        self.compiled_iso = None
+        self.iso_available = False
+        # 'sklearn', 'compiled' or 'compact': where compiled_rf / compiled_iso came from
+        self.model_format = 'sklearn'
+        self.learned_bounds = None
+        self.loaded_at = None
+        # (lower, upper) clip vectors aligned to feature_names, built once by model_utils
+        self.feature_bounds = None
+        # Probability calibration + class thresholds (class_assignment.ClassTable)
+        self.class_table = LEGACY
+        # sha256 of the Random Forest pickle the served forest came from
+        self.rf_sha256 = None
+        self.version = None
+        self.load_times = {}
+        self.error = None
+        self._rf_model = None
+        self._iso_model = None
+        self._sklearn_lock = threading.Lock()
+
+    def _path(self, filename):
+        return os.path.join(self.model_dir, filename)
+
+    def _timed(self, name, fn):
+        start = time.perf_counter()
+        result = fn()
+        self.load_times[name] = round((time.perf_counter() - start) * 1000, 2)
+        return result
+
+    @property
+    def available(self):
+        """True when real models are loaded (False means mock mode)"""
+        return bool(self.feature_names) and (self.compiled_rf is not None or self._rf_model is not None)
+
+    def load(self, use_compiled=True, mmap_mode='r', model_format=MODEL_FORMAT):
+        import joblib
+
+        self.feature_names = self._timed('feature_names', lambda: joblib.load(self._path('feature_names.pkl')))
+        try:
+            self.performance_metrics = self._timed('performance_metrics', lambda: joblib.load(self._path('performance_metrics.pkl')))
+        except Exception:
+            self.performance_metrics = {}
+            logger.warning("⚠️ Performance metrics not available")
+
+        self.learned_bounds = self._timed('feature_bounds', self._load_learned_bounds)
+
+        rf_path = self._path('rf_significance_model.pkl')
+        iso_path = self._path('iso_anomaly_model.pkl')
+        compiled_dir = self._path(COMPILED_SUBDIR)
+        if use_compiled and model_format == 'compact':
+            compact_dir = self._path(COMPACT_SUBDIR)
+            self.compiled_rf = self._timed('compact_rf', lambda: load_compiled_forest('rf_significance', rf_path, compact_dir, mmap_mode))
+            if self.compiled_rf is not None:
+                self.compiled_iso = self._timed('compact_iso', lambda: load_compiled_forest('iso_anomaly', iso_path, compact_dir, mmap_mode))
+                self.model_format = 'compact'
+            else:
+                logger.warning("⚠️ No compact forests in %s, using the compiled ones", compact_dir)
+        if use_compiled and self.compiled_rf is None:
+            self.compiled_rf = self._timed('compiled_rf', lambda: load_compiled_forest('rf_significance', rf_path, compiled_dir, mmap_mode))
+            self.compiled_iso = self._timed('compiled_iso', lambda: load_compiled_forest('iso_anomaly', iso_path, compiled_dir, mmap_mode))
+            if self.compiled_rf is not None:
+                self.model_format = 'compiled'
+
+        # Fall back to the sklearn estimators when there are no compiled arrays
+        if self.compiled_rf is None:
+            self._rf_model = self._timed('rf_model', lambda: joblib.load(rf_path))
+        self.iso_available = self.compiled_iso is not None or (os.path.exists(iso_path) and self.iso_model is not None)
+        if not self.iso_available:
+            logger.warning("⚠️ Anomaly detection model not available")
+
+        if self.compiled_rf is not None:
+            rf_sha256 = self.compiled_rf['meta']['source_sha256']
+        else:
+            rf_sha256 = file_sha256(rf_path)
+        self.rf_sha256 = rf_sha256
+        self.class_table = self._timed('class_assignment', lambda: load_class_table(self._path(CLASS_ASSIGNMENT_FILE), rf_sha256))
+        self.version = rf_sha256[:12]
+        if self.model_format == 'compact':
+            # Quantized / pruned forests score differently from the full ones
+            self.version += '-' + self.compiled_rf['meta']['variant']
+        if self.class_table is not LEGACY:
+            # Cached predictions and reload checks must see a new table as a new version
+            self.version += '-' + self.class_table.digest()
+        return self
+
+    def _load_learned_bounds(self):
+        """Quantile bounds from training, aligned by name to feature_names (None if missing)"""
+        path = self._path('feature_bounds.json')
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            bounds = json.load(f)
+        by_name = dict(zip(bounds['feature_names'], zip(bounds['lower'], bounds['upper'])))
+        lower = np.array([by_name.get(name, (-np.inf, np.inf))[0] for name in self.feature_names], dtype=np.float64)
+        upper = np.array([by_name.get(name, (-np.inf, np.inf))[1] for name in self.feature_names], dtype=np.float64)
+        return lower, upper
+
+    @property
+    def rf_model(self):
+        """sklearn RandomForestClassifier, unpickled on first use"""
+        if self._rf_model is None:
+            with self._sklearn_lock:
+                if self._rf_model is None:
+                    import joblib
+                    self._rf_model = self._timed('rf_model', lambda: joblib.load(self._path('rf_significance_model.pkl')))
+        return self._rf_model
+
+    @property
+    def iso_model(self):
+        """sklearn IsolationForest, unpickled on first use (None if missing)"""
+        if self._iso_model is None:
+            with self._sklearn_lock:
+                if self._iso_model is None:
+                    import joblib
+                    try:
+                        self._iso_model = self._timed('iso_model', lambda: joblib.load(self._path('iso_anomaly_model.pkl')))
+                    except Exception:
+                        return None
+        return self._iso_model
+
+
+class ModelRegistry:
+    def __init__(self, model_dir=MODEL_DIR):
+        self.model_dir = model_dir
+        self._bundle = None
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._warmup_thread = None
+        self.reloads = collections.deque(maxlen=10)
+
+    def get(self):
+        """The active ModelBundle, loading it on first use"""
+        bundle = self._bundle
+        if bundle is None:
+            with self._lock:
+                if self._bundle is None:
+                    self._bundle = self._load()
+                bundle = self._bundle
+        return bundle
+
+    def _load(self):
+        use_compiled = os.environ.get('USE_COMPILED_FORESTS', '1') != '0'
+        bundle = ModelBundle(resolve_model_dir(self.model_dir))
+        start = time.perf_counter()
+        try:
+            bundle.load(use_compiled=use_compiled)
+            logger.info("🎉 Models loaded (version %s, %d features) in %.0f ms: %s", bundle.version,
+                        len(bundle.feature_names), (time.perf_counter() - start) * 1000, bundle.load_times)
+        except Exception as e:
+            logger.error("❌ Model loading failed: %s", e)
+            logger.warning("⚠️ Using mock mode")
+            bundle = ModelBundle(bundle.model_dir)
+            bundle.error = str(e)
+        bundle.load_times['total'] = round((time.perf_counter() - start) * 1000, 2)
+        bundle.loaded_at = time.time()
+        return bundle
+
+    def reload(self, probe=None, force=False):
+        """
+        Load the current artifacts into a new bundle, warm and validate it with
+        probe(bundle) -> probabilities for the fixed probe batch, then swap it
+        in atomically. The active bundle keeps serving throughout, and also
+        when the candidate is rejected. Returns a report dict.
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            return {'status': 'in_progress'}
+        try:
+            start = time.perf_counter()
+            current = self._bundle
+            candidate = self._load()
+            report = {
+                'previous_version': current.version if current else None,
+                'version': candidate.version,
+                'artifacts': candidate.model_dir,
+                'load_ms': candidate.load_times['total'],
+            }
+            try:
+                if candidate.error:
+                    raise ValueError(f"load failed: {candidate.error}")
+                if (not force and current is not None and current.available
+                        and candidate.version == current.version and candidate.model_dir == current.model_dir):
+                    report['status'] = 'unchanged'
+                else:
+                    if probe is not None:
+                        report['probe_drift'] = self._validate(candidate, current, probe)
+                    self._bundle = candidate  # the atomic swap
+                    report['status'] = 'swapped'
+                    logger.info("🔄 Model version %s -> %s", report['previous_version'], candidate.version)
+            except Exception as e:
+                report['status'] = 'rejected'
+                report['error'] = str(e)
+                logger.error("❌ Model reload rejected, keeping version %s: %s", report['previous_version'], e)
+            report['total_ms'] = round((time.perf_counter() - start) * 1000, 2)
+            report['finished_at'] = time.time()
+            self.reloads.append(report)
+            return report
+        finally:
+            self._reload_lock.release()
+
+    @staticmethod
+    def _validate(candidate, current, probe):
+        """Probe-batch checks; returns the mean |probability change| vs the active bundle"""
+        if not candidate.available:
+            raise ValueError("candidate has no model")
+        if current is not None and current.available and list(candidate.feature_names) != list(current.feature_names):
+            raise ValueError("feature names changed")
+        probabilities = np.asarray(probe(candidate), dtype=np.float64)  # also warms the candidate up
+        if not np.all(np.isfinite(probabilities)) or probabilities.min() < 0 or probabilities.max() > 1:
+            raise ValueError("probe batch gave probabilities outside [0, 1]")
+        if current is None or not current.available:
+            return None
+        drift = float(np.mean(np.abs(probabilities - np.asarray(probe(current), dtype=np.float64))))
+        if drift > RELOAD_MAX_DRIFT:
+            raise ValueError(f"probe drift {drift:.3f} exceeds RELOAD_MAX_DRIFT={RELOAD_MAX_DRIFT}")
+        return round(drift, 6)
+
+    @property
+    def loaded(self):
+        return self._bundle is not None
+
+    def warmup_in_background(self, probe=None):
+        """
+        Load the bundle on a daemon thread so the first request doesn't pay
+        for it; `probe(bundle)` can run a throwaway prediction afterwards.
+        """
+        def warmup():
+            bundle = self.get()
+            if probe is not None and bundle.available:
+                try:
+                    probe(bundle)
+                except Exception as e:
+                    logger.warning("⚠️ Warmup prediction failed: %s", e)
+
+        self._warmup_thread = threading.Thread(target=warmup, name='model-warmup', daemon=True)
+        self._warmup_thread.start()
+        return self._warmup_thread
+
+    def status(self):
+        bundle = self._bundle
+        if bundle is None:
+            return {'state': 'not_loaded'}
+        return {
+            'state': 'loaded' if bundle.available else 'mock_mode',
+            'version': bundle.version,
+            'artifacts': bundle.model_dir,
+            'engine': bundle.model_format,
+            'anomaly_detection': bundle.iso_available,
+            'class_assignment': bundle.class_table.method,
+            'load_times_ms': dict(bundle.load_times),
+            'load_latency_ms': bundle.load_times.get('total'),
+            'loaded_at': bundle.loaded_at,
+            'error': bundle.error,
+            'last_reload': self.reloads[-1] if self.reloads else None,
+            'reload_count': len(self.reloads),
+        }
+
+
+class ModelWatcher:
+    """Polls the models/ directory and hot-reloads the registry when its artifacts change"""
+
+    def __init__(self, registry, probe=None, interval=MODEL_WATCH_INTERVAL):
+        self.registry = registry
+        self.probe = probe
+        self.interval = interval
+        self._signature = None
+        self._task = None
+
+    async def poll_once(self):
+        signature = await asyncio.to_thread(artifact_signature, self.registry.model_dir)
+        if self._signature is not None and signature != self._signature:
+            logger.info("👀 Model artifacts changed, reloading")
+            await asyncio.to_thread(self.registry.reload, self.probe)
+        self._signature = signature
+
+    async def _run(self):
+        while True:
+            try:
+                await self.poll_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("⚠️ Model watch failed: %s", e)
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+registry = ModelRegistry()
@@ -0,0 +1,227 @@
+# backend/model_sweep.py
+"""
+Parallel hyperparameter / cross-validation sweep for the two-stage model
+(used by `python train_models.py sweep`).
+
+- Every config is scored with stratified K-fold CV in a process pool that
+  uses all cores (each worker fits with n_jobs=1).
+- The training matrix is written once as .npy and every worker opens it
+  with mmap_mode='r', so it is shared through the page cache rather than
+  pickled to each process.
+- Each finished config is appended to results.jsonl right away; rerunning
+  the same sweep skips configs that are already there, so an interrupted
+  sweep resumes where it stopped. A result only counts as done for the
+  same folds, seed and training data (the columnar cache manifest's
+  sha256 of the CSV): those are part of its key.
+- leaderboard.json / leaderboard.csv rank the configs per model.
+"""
+import hashlib
+import itertools
+import json
+import os
+import random
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+SWEEP_DIR = 'sweeps'
+
+RF_GRID = {
+    'n_estimators': [100, 200],
+    'max_depth': [6, 10, 14, None],
+    'min_samples_split': [2, 5],
+    'min_samples_leaf': [1, 2, 5],
+    'class_weight': ['balanced', 'balanced_subsample'],
+}
+
+ISO_GRID = {
+    'n_estimators': [100, 200],
+    'max_samples': ['auto', 64, 128],
+    'max_features': [1.0, 0.75],
+    'contamination': [0.05, 0.1, 0.2],
+}
+
+# Per-worker shared arrays, opened once by _init_worker
+_shared = {}
+
+
+def config_key(kind, params, **context):
+    """Short hash of a config; context (folds, seed, data_sha256) makes it a checkpoint key"""
+    blob = json.dumps({'kind': kind, 'params': params, **context}, sort_keys=True)
+    return hashlib.sha1(blob.encode()).hexdigest()[:16]
+
+
+def expand_grid(grid):
+    names = sorted(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[n] for n in names))]
+
+
+def build_configs(n_iter=None, seed=42, rf_grid=RF_GRID, iso_grid=ISO_GRID):
+    """Full grid, or a random sample of n_iter configs per model"""
+    configs = []
+    for kind, grid in (('random_forest', rf_grid), ('isolation_forest', iso_grid)):
+        params = expand_grid(grid)
+        if n_iter is not None and n_iter < len(params):
+            params = random.Random(seed).sample(params, n_iter)
+        configs += [(kind, p, config_key(kind, p)) for p in params]
+    return configs
+
+
+def _init_worker(data_dir):
+    warnings.filterwarnings('ignore')
+    _shared['X'] = np.load(os.path.join(data_dir, 'X.npy'), mmap_mode='r')
+    _shared['y_significant'] = np.load(os.path.join(data_dir, 'y_significant.npy'), mmap_mode='r')
+    _shared['y_xclass'] = np.load(os.path.join(data_dir, 'y_xclass.npy'), mmap_mode='r')
+
+
+def _evaluate_rf(params, folds, seed):
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.metrics import f1_score, precision_score, recall_score, roc_auc_score
+    from sklearn.model_selection import StratifiedKFold
+
+    X, y = _shared['X'], np.asarray(_shared['y_significant'])
+    scores = {'auc_roc': [], 'f1_score': [], 'precision': [], 'recall': []}
+    for train, test in StratifiedKFold(folds, shuffle=True, random_state=seed).split(X, y):
+        model = RandomForestClassifier(random_state=seed, n_jobs=1, **params).fit(X[train], y[train])
+        prob = model.predict_proba(X[test])[:, 1]
+        pred = (prob > 0.5).astype(int)
+        scores['auc_roc'].append(roc_auc_score(y[test], prob))
+        scores['f1_score'].append(f1_score(y[test], pred, zero_division=0))
+        scores['precision'].append(precision_score(y[test], pred, zero_division=0))
+        scores['recall'].append(recall_score(y[test], pred, zero_division=0))
+    return scores
+
+
+def _evaluate_iso(params, folds, seed):
+    """
+    The Isolation Forest is trained on significant (M/X) flares and should
+    single out the X-class ones: score = AUC of the anomaly score for X vs M.
+    """
+    from sklearn.ensemble import IsolationForest
+    from sklearn.metrics import roc_auc_score
+    from sklearn.model_selection import StratifiedKFold
+
+    significant = np.asarray(_shared['y_significant']) == 1
+    X = np.asarray(_shared['X'][significant])
+    y = np.asarray(_shared['y_xclass'])[significant]
+    folds = max(2, min(folds, int(y.sum())))
+    scores = {'auc_x_vs_m': []}
+    for train, test in StratifiedKFold(folds, shuffle=True, random_state=seed).split(X, y):
+        model = IsolationForest(random_state=seed, **params).fit(X[train])
+        scores['auc_x_vs_m'].append(roc_auc_score(y[test], -model.decision_function(X[test])))
+    return scores
+
+
+def evaluate_config(kind, params, key, folds=5, seed=42, data_sha256=None):
+    """Cross-validate one config in a worker process; returns a result row"""
+    start = time.perf_counter()
+    evaluate = _evaluate_rf if kind == 'random_forest' else _evaluate_iso
+    scores = evaluate(params, folds, seed)
+    return {
+        'key': key,
+        'kind': kind,
+        'params': params,
+        'folds': folds,
+        'seed': seed,
+        'data_sha256': data_sha256,
+        'metrics': {name: float(np.mean(values)) for name, values in scores.items()},
+        'metrics_std': {name: float(np.std(values)) for name, values in scores.items()},
+        'fit_seconds': round(time.perf_counter() - start, 3),
+        'worker_pid': os.getpid(),
+    }
+
+
+def prepare_shared_data(data_dir, csv_path='HMI_CLEANED_DATA.csv'):
+    """
+    Write the training matrix + targets as .npy once for the workers to
+    mmap; returns (matrix shape, sha256 of the CSV they came from)
+    """
+    import data_cache
+    from train_models import FEATURE_COLUMNS, SIGNIFICANT_CLASSES
+
+    os.makedirs(data_dir, exist_ok=True)
+    X = data_cache.load_feature_matrix(FEATURE_COLUMNS, csv_path)
+    codes, categories = data_cache.load_flare_categories(csv_path)
+    significant = np.isin(codes, [categories.index(c) for c in SIGNIFICANT_CLASSES])
+    np.save(os.path.join(data_dir, 'X.npy'), X)
+    np.save(os.path.join(data_dir, 'y_significant.npy'), significant.astype(np.int8))
+    np.save(os.path.join(data_dir, 'y_xclass.npy'), (codes == categories.index('X')).astype(np.int8))
+    return X.shape, data_cache.ensure_columnar_cache(csv_path)['source']['sha256']
+
+
+def _load_checkpoint(results_path):
+    done = {}
+    if os.path.exists(results_path):
+        with open(results_path) as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    try:
+                        row = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line from an interrupted run
+                    done[row['key']] = row
+    return done
+
+
+def write_leaderboard(rows, sweep_dir):
+    ranking = {'random_forest': 'auc_roc', 'isolation_forest': 'auc_x_vs_m'}
+    leaderboard = {}
+    for kind, metric in ranking.items():
+        ranked = sorted((r for r in rows if r['kind'] == kind), key=lambda r: r['metrics'][metric], reverse=True)
+        leaderboard[kind] = {'metric': metric, 'results': ranked}
+
+    with open(os.path.join(sweep_dir, 'leaderboard.json'), 'w') as f:
+        json.dump(leaderboard, f, indent=2)
+    with open(os.path.join(sweep_dir, 'leaderboard.csv'), 'w') as f:
+        f.write('kind,rank,metric,score,std,params\n')
+        for kind, board in leaderboard.items():
+            for rank, r in enumerate(board['results'], 1):
+                metric = board['metric']
+                params = json.dumps(r['params'], sort_keys=True).replace('"', '""')
+                f.write(f'{kind},{rank},{metric},{r["metrics"][metric]:.4f},{r["metrics_std"][metric]:.4f},"{params}"\n')
+    return leaderboard
+
+
+def run_sweep(name='default', n_workers=None, n_iter=None, folds=5, seed=42, configs=None,
+              csv_path='HMI_CLEANED_DATA.csv', sweep_root=SWEEP_DIR):
+    """Run (or resume) a sweep; returns the leaderboard dict"""
+    n_workers = n_workers or os.cpu_count() or 1
+    sweep_dir = os.path.join(sweep_root, name)
+    data_dir = os.path.join(sweep_dir, 'data')
+    results_path = os.path.join(sweep_dir, 'results.jsonl')
+
+    shape, data_sha256 = prepare_shared_data(data_dir, csv_path)
+    configs = configs if configs is not None else build_configs(n_iter, seed)
+    # Results of other folds / seeds / data in results.jsonl don't match these keys and are redone
+    configs = [(kind, params, config_key(kind, params, folds=folds, seed=seed, data_sha256=data_sha256))
+               for kind, params, _ in configs]
+    done = _load_checkpoint(results_path)
+    todo = [c for c in configs if c[2] not in done]
+    print(f"🔧 Sweep '{name}': {len(configs)} configs ({len(configs) - len(todo)} already done), "
+          f"{n_workers} workers, {folds}-fold CV on {shape[0]}x{shape[1]} matrix")
+
+    start = time.perf_counter()
+    if todo:
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker, initargs=(data_dir,)) as pool, \
+                open(results_path, 'a') as checkpoint:
+            futures = [pool.submit(evaluate_config, kind, params, key, folds, seed, data_sha256)
+                       for kind, params, key in todo]
+            for i, future in enumerate(as_completed(futures), 1):
+                row = future.result()
+                checkpoint.write(json.dumps(row) + '\n')
+                checkpoint.flush()
+                os.fsync(checkpoint.fileno())
+                done[row['key']] = row
+                print(f"   [{i}/{len(todo)}] {row['kind']} {row['params']} -> {row['metrics']}")
+
+    wanted = {c[2] for c in configs}
+    leaderboard = write_leaderboard([r for k, r in done.items() if k in wanted], sweep_dir)
+    print(f"✅ Sweep finished in {time.perf_counter() - start:.1f}s, leaderboard in {sweep_dir}/leaderboard.csv")
+    for kind, board in leaderboard.items():
+        if board['results']:
+            best = board['results'][0]
+            print(f"   Best {kind}: {board['metric']}={best['metrics'][board['metric']]:.3f} {best['params']}")
+    return leaderboard
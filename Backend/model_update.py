@@ -0,0 +1,293 @@
+# backend/model_update.py
+"""
+Incremental model update (python train_models.py update).
+
+Instead of refitting everything for each new day of SHARP data:
+
+- only rows newer than the training watermark (training_state.json) are
+  taken from the columnar cache, plus the `context_rows` rows dated just
+  before them (rows, not days) so the new trees see both classes
+- the Random Forest grows `replace_trees` new trees on that window with
+  warm_start and drops the same number of its oldest trees, so the forest
+  keeps its size and is refreshed a slice at a time. Both forests are fitted
+  on the active version's feature_names.pkl columns and seeded from the new
+  watermark, so successive updates don't grow identical trees
+- a stratified CLASS_HOLDOUT share of the window is kept out of the new
+  trees' fit, and the class-assignment table (class_assignment.npz) is
+  refitted on it with the method the active table used. Held-out new rows
+  are still trained on by the next update, as part of its context
+- the Isolation Forest is refitted on a reservoir sample (Algorithm R) of
+  every significant flare seen so far, kept in reservoir.npy - it never
+  needs the full history again
+- the new artifact set (pickles, compiled arrays, class table, bounds,
+  state, and compact forests with the active ones' settings when those
+  exist, so MODEL_FORMAT=compact keeps serving compact) is
+  written to models/versions/.staging-<version>, renamed into place and
+  only then made active by atomically rewriting models/CURRENT
+"""
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+import data_cache
+from class_assignment import CALIBRATION_METHODS, CLASS_ASSIGNMENT_FILE, ClassTable, category_classes
+from model_registry import (MODEL_DIR, resolve_model_dir, read_active_version, write_active_version,
+                            VERSIONS_SUBDIR)
+
+STATE_FILE = 'training_state.json'
+RESERVOIR_FILE = 'reservoir.npy'
+RESERVOIR_CAPACITY = 512
+REPLACE_TREES = 10
+CONTEXT_ROWS = 730
+CLASS_HOLDOUT = 0.2
+KEEP_VERSIONS = 5
+
+
+def reservoir_update(reservoir, seen, rows, capacity=RESERVOIR_CAPACITY, rng=None):
+    """
+    Algorithm R: after this call `reservoir` is a uniform sample of all
+    seen + len(rows) rows offered so far. Returns (reservoir, seen).
+    """
+    rng = rng or np.random.default_rng()
+    reservoir = list(reservoir)
+    for row in rows:
+        seen += 1
+        if len(reservoir) < capacity:
+            reservoir.append(row)
+        else:
+            slot = rng.integers(0, seen)
+            if slot < capacity:
+                reservoir[slot] = row
+    return np.array(reservoir, dtype=np.float32).reshape(-1, rows.shape[1]), seen
+
+
+def read_training_state(model_dir):
+    """(state dict, reservoir array) of an artifact directory, or (None, None)"""
+    try:
+        with open(os.path.join(model_dir, STATE_FILE)) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None, None
+    reservoir_path = os.path.join(model_dir, RESERVOIR_FILE)
+    reservoir = np.load(reservoir_path) if os.path.exists(reservoir_path) else None
+    return state, reservoir
+
+
+def write_training_state(model_dir, state, reservoir):
+    np.save(os.path.join(model_dir, RESERVOIR_FILE), reservoir)
+    with open(os.path.join(model_dir, STATE_FILE), 'w') as f:
+        json.dump(state, f, indent=2)
+
+
+def full_training_state(X, y, dates, seed=42):
+    """Watermark + reservoir for a model trained from scratch on X/y/dates"""
+    rng = np.random.default_rng(seed)
+    significant = np.asarray(X, dtype=np.float32)[np.asarray(y) == 1]
+    reservoir, seen = reservoir_update(np.empty((0, significant.shape[1]), np.float32), 0, significant, rng=rng)
+    watermark = int(np.max(dates))
+    state = {
+        'watermark': watermark,
+        'watermark_date': time.strftime('%Y-%m-%d', time.gmtime(watermark)),
+        'rows_trained': int(len(dates)),
+        'reservoir_seen': seen,
+        'reservoir_capacity': RESERVOIR_CAPACITY,
+        'mode': 'full',
+        'updates': 0,
+        'trained_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+    }
+    return state, reservoir
+
+
+def _load_dataset(csv_path):
+    from train_models import SIGNIFICANT_CLASSES
+
+    dates = np.asarray(data_cache.load_columns(['DATE'], csv_path)['DATE'])
+    codes, categories = data_cache.load_flare_categories(csv_path)
+    y = np.isin(codes, [categories.index(c) for c in SIGNIFICANT_CLASSES]).astype(int)
+    return dates, y, category_classes(codes, categories)
+
+
+def _served_feature_names(source_dir):
+    """Feature columns the active models were fitted on, in their order"""
+    import joblib
+
+    return list(joblib.load(os.path.join(source_dir, 'feature_names.pkl')))
+
+
+def _split_holdout(y_window, fraction=CLASS_HOLDOUT, seed=42):
+    """(fit, held-out) row indices of the training window, stratified; nothing held out without 2 rows per class"""
+    from sklearn.model_selection import train_test_split
+
+    index = np.arange(len(y_window))
+    if fraction <= 0 or np.bincount(y_window, minlength=2).min() < 2:
+        return index, index[:0]
+    fit, held_out = train_test_split(index, test_size=fraction, random_state=seed, stratify=y_window)
+    return np.sort(fit), np.sort(held_out)
+
+
+def _class_assignment_method(source_dir):
+    """Calibration method of the active class table (isotonic when there is none)"""
+    path = os.path.join(source_dir, CLASS_ASSIGNMENT_FILE)
+    method = ClassTable.load(path).method if os.path.exists(path) else 'isotonic'
+    return method if method in CALIBRATION_METHODS else 'isotonic'
+
+
+def _new_version_name(model_dir):
+    base = time.strftime('%Y%m%d-%H%M%S', time.gmtime())
+    name, n = base, 1
+    while os.path.exists(os.path.join(model_dir, VERSIONS_SUBDIR, name)):
+        n += 1
+        name = f'{base}-{n}'
+    return name
+
+
+def _prune_versions(model_dir, keep=KEEP_VERSIONS):
+    versions_dir = os.path.join(model_dir, VERSIONS_SUBDIR)
+    active = read_active_version(model_dir)
+    names = sorted(n for n in os.listdir(versions_dir) if not n.startswith('.'))
+    for name in names[:-keep]:
+        if name != active:
+            shutil.rmtree(os.path.join(versions_dir, name), ignore_errors=True)
+
+
+def _compact_settings(source_dir):
+    """export_compact_models arguments reproducing the active compact forests (None without any)"""
+    from compact_models import COMPACT_SUBDIR
+
+    try:
+        with open(os.path.join(source_dir, COMPACT_SUBDIR, 'report.json')) as f:
+            report = json.load(f)
+    except (OSError, ValueError):
+        return None
+    # Different widths per forest can only have come from 'auto'
+    leaf_bits = report['rf_leaf_bits'] if report['rf_leaf_bits'] == report['iso_leaf_bits'] else 'auto'
+    return {'leaf_bits': leaf_bits, 'keep_trees': report['rf_trees']}
+
+
+def update_models(csv_path='HMI_CLEANED_DATA.csv', model_dir=MODEL_DIR, replace_trees=REPLACE_TREES,
+                  context_rows=CONTEXT_ROWS, activate=True, seed=None):
+    """
+    Fold rows newer than the watermark into the active models.
+    Returns the new version name, or None when there is nothing new.
+    """
+    import joblib
+    import pandas as pd
+    from sklearn.ensemble import IsolationForest
+    from train_models import export_compiled_forests, fit_class_assignment
+
+    start = time.perf_counter()
+    source_dir = resolve_model_dir(model_dir)
+    dates, y, classes = _load_dataset(csv_path)
+    feature_columns = _served_feature_names(source_dir)
+    state, reservoir = read_training_state(source_dir)
+    if state is None:
+        # Models from before watermarks existed were trained on the whole CSV
+        print(f"⚠️ No {STATE_FILE} in {source_dir}; assuming it was trained on all of {csv_path}")
+        X_all = data_cache.load_feature_matrix(feature_columns, csv_path)
+        state, reservoir = full_training_state(X_all, y, dates)
+
+    order = np.argsort(dates, kind='stable')
+    new_rows = order[dates[order] > state['watermark']]
+    if len(new_rows) == 0:
+        print(f"✅ Models are up to date (watermark {state['watermark_date']})")
+        return None
+
+    # Only the new rows and the recent context are read from the memory-mapped columns
+    first_new = np.searchsorted(dates[order], state['watermark'], side='right')
+    window = order[max(0, first_new - context_rows):]
+    watermark = int(dates[new_rows].max())
+    # Fresh seeds per update, or every update would grow the same trees
+    update_seed = seed if seed is not None else watermark % 2**32
+    columns = data_cache.load_columns(feature_columns, csv_path)
+    X_window = np.column_stack([np.asarray(columns[name])[window] for name in feature_columns]).astype(np.float32)
+    y_window, classes_window = y[window], classes[window]
+    X_new, y_new = X_window[-len(new_rows):], y_window[-len(new_rows):]
+    fit_rows, held_out = _split_holdout(y_window, seed=update_seed)
+    print(f"🔧 Incremental update: {len(new_rows)} new rows after {state['watermark_date']} "
+          f"({len(window)}-row training window, {len(held_out)} held out for the class thresholds)")
+
+    rf_model = joblib.load(os.path.join(source_dir, 'rf_significance_model.pkl'))
+    replaced = 0
+    if y_window[fit_rows].min() != y_window[fit_rows].max() and replace_trees > 0:
+        n_trees = len(rf_model.estimators_)
+        replaced = min(replace_trees, n_trees)
+        rf_model.set_params(warm_start=True, n_estimators=n_trees + replaced, random_state=update_seed)
+        rf_model.fit(pd.DataFrame(X_window[fit_rows], columns=feature_columns), y_window[fit_rows])
+        # Drop the oldest trees so the forest keeps its size
+        rf_model.estimators_ = rf_model.estimators_[replaced:]
+        rf_model.set_params(warm_start=False, n_estimators=n_trees)
+    else:
+        print("⚠️ Training window has a single class, keeping every existing tree")
+
+    rng = np.random.default_rng(seed if seed is not None else state['reservoir_seen'])
+    reservoir, seen = reservoir_update(reservoir, state['reservoir_seen'], X_new[y_new == 1],
+                                       capacity=state.get('reservoir_capacity', RESERVOIR_CAPACITY), rng=rng)
+    iso_model = None
+    if len(reservoir):
+        iso_model = IsolationForest(contamination=0.1, random_state=update_seed)
+        iso_model.fit(pd.DataFrame(reservoir, columns=feature_columns))
+
+    # Write the complete artifact set to a staging dir, then rename it into place
+    version = _new_version_name(model_dir)
+    versions_dir = os.path.join(model_dir, VERSIONS_SUBDIR)
+    staging = os.path.join(versions_dir, f'.staging-{version}')
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    try:
+        joblib.dump(rf_model, os.path.join(staging, 'rf_significance_model.pkl'))
+        # The class table is tied to this exact pickle: refit it, as a full training does
+        if len(held_out) and y_window[held_out].min() != y_window[held_out].max():
+            probabilities = rf_model.predict_proba(pd.DataFrame(X_window[held_out], columns=feature_columns))[:, 1]
+            fit_class_assignment(probabilities, classes_window[held_out], staging, _class_assignment_method(source_dir))
+        else:
+            print(f"⚠️⚠️ No held-out rows of both classes in the training window: version {version} will assign "
+                  f"classes with the LEGACY thresholds (run with more --context-rows to refit them)")
+        if iso_model is not None:
+            joblib.dump(iso_model, os.path.join(staging, 'iso_anomaly_model.pkl'))
+        joblib.dump(list(feature_columns), os.path.join(staging, 'feature_names.pkl'))
+        for name in ('feature_bounds.json',):
+            if os.path.exists(os.path.join(source_dir, name)):
+                shutil.copy2(os.path.join(source_dir, name), os.path.join(staging, name))
+
+        metrics = {}
+        try:
+            metrics = dict(joblib.load(os.path.join(source_dir, 'performance_metrics.pkl')))
+        except Exception:
+            pass
+        metrics.update({'training_date': time.strftime('%Y-%m-%d', time.gmtime()),
+                        'significant_flares': int(seen)})
+        joblib.dump(metrics, os.path.join(staging, 'performance_metrics.pkl'))
+
+        export_compiled_forests(rf_model, iso_model, X_window[-256:], model_dir=staging)
+        compact = _compact_settings(source_dir)
+        if compact is not None:
+            from compact_models import export_compact_models
+
+            export_compact_models(staging, csv_path=csv_path, **compact)
+        write_training_state(staging, {
+            **state,
+            'watermark': watermark,
+            'watermark_date': time.strftime('%Y-%m-%d', time.gmtime(watermark)),
+            'rows_trained': state['rows_trained'] + len(new_rows),
+            'reservoir_seen': int(seen),
+            'mode': 'incremental',
+            'updates': state.get('updates', 0) + 1,
+            'trees_replaced': replaced,
+            'base_version': read_active_version(model_dir),
+            'trained_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        }, reservoir)
+        os.rename(staging, os.path.join(versions_dir, version))
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    if activate:
+        write_active_version(model_dir, version)
+        _prune_versions(model_dir)
+    print(f"🎉 Version {version} written in {time.perf_counter() - start:.2f}s "
+          f"({replaced} trees replaced, reservoir {len(reservoir)}/{seen} significant flares)"
+          + (", now active" if activate else ""))
+    return version
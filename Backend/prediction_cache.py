@@ -0,0 +1,140 @@
+# backend/prediction_cache.py
+"""
+In-process LRU + TTL cache of two-stage predictions.
+
+Dashboards and retry loops resubmit the same SHARP vectors, so results are
+cached per preprocessed feature vector (after NaN fill and outlier capping,
+so inputs that preprocess identically share an entry). The key is a
+16-byte BLAKE2b digest of the vector's float64 bytes plus the model
+version; a different version also clears the cache, so a model reload
+never serves stale predictions.
+
+Optional quantization keeps only the top `mantissa_bits` of each float64
+mantissa before hashing - a relative tolerance that works across features
+spanning 1e-9 to 1e33 - so near-identical vectors share an entry. The
+default (52 bits) is exact.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from metrics import PREDICTION_CACHE_EVENTS
+
+
+class PredictionCache:
+    def __init__(self, max_entries=10000, ttl=300.0, mantissa_bits=52):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.mantissa_bits = mantissa_bits
+        drop = 52 - mantissa_bits
+        self._mask = np.uint64(~((1 << drop) - 1) & 0xFFFFFFFFFFFFFFFF) if drop > 0 else None
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def keys(self, matrix, version):
+        """One key per row of a preprocessed (N, n_features) float64 matrix"""
+        matrix = np.ascontiguousarray(matrix, dtype=np.float64)
+        if matrix.ndim == 1:
+            matrix = matrix[None, :]
+        if self._mask is not None:
+            matrix = (matrix.view(np.uint64) & self._mask)
+        row_bytes = matrix.shape[1] * 8
+        buffer = memoryview(matrix.tobytes())
+        return [(version, hashlib.blake2b(buffer[i:i + row_bytes], digest_size=16).digest())
+                for i in range(0, len(buffer), row_bytes)]
+
+    def _check_version(self, version):
+        # Called with the lock held: a new model version drops every entry
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+                PREDICTION_CACHE_EVENTS.inc("invalidation")
+                self._entries.clear()
+            self._version = version
+
+    def get(self, key):
+        """Cached value for key, or None"""
+        now = time.monotonic()
+        with self._lock:
+            self._check_version(key[0])
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    PREDICTION_CACHE_EVENTS.inc("hit")
+                    return entry[1]
+                del self._entries[key]
+                self.expirations += 1
+                PREDICTION_CACHE_EVENTS.inc("expired")
+            self.misses += 1
+            PREDICTION_CACHE_EVENTS.inc("miss")
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._check_version(key[0])
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+                PREDICTION_CACHE_EVENTS.inc("eviction")
+
+    def clear(self):
+        with self._lock:
+            if self._entries:
+                self.invalidations += 1
+                PREDICTION_CACHE_EVENTS.inc("invalidation")
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "mantissa_bits": self.mantissa_bits,
+            "model_version": self._version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+def create_prediction_cache_from_env():
+    """
+    Environment variables:
+      PREDICTION_CACHE_SIZE      max cached vectors (default 10000, 0 disables)
+      PREDICTION_CACHE_TTL       seconds an entry stays valid (default 300)
+      PREDICTION_CACHE_BITS      float64 mantissa bits kept when hashing
+                                 (default 52 = exact; e.g. 20 ~ 6 significant digits)
+    Returns None when disabled.
+    """
+    max_entries = int(os.environ.get("PREDICTION_CACHE_SIZE", 10000))
+    if max_entries <= 0:
+        return None
+    return PredictionCache(
+        max_entries=max_entries,
+        ttl=float(os.environ.get("PREDICTION_CACHE_TTL", 300)),
+        mantissa_bits=int(os.environ.get("PREDICTION_CACHE_BITS", 52)),
+    )
+
+
+prediction_cache = create_prediction_cache_from_env()
@@ -0,0 +1,353 @@
+# backend/region_features.py
+"""
+Per-active-region SHARP state for streaming updates.
+
+Clients push raw SHARP parameters for a NOAA region as they arrive
+(POST /regions/{id}/update). RegionFeatureEngine keeps, for every region,
+the latest full 23-parameter snapshot plus rolling temporal features of
+the tracked parameters (USFLUX, TOTPOT, R_VALUE by default) over each
+window (6 / 12 / 24 h by default):
+
+- delta:  value now minus value one window ago
+- slope:  least-squares slope over the window, per hour
+- ewma:   exponentially weighted mean with the window as time constant
+
+Everything lives in preallocated arrays indexed by a region row - no
+per-region history lists or DataFrames. Updates are binned to the SHARP
+cadence (12 min) into a per-region ring of window-length slots, and the
+slope sums (n, sum t, sum t^2, sum v, sum t*v) are maintained by adding
+the new bin and subtracting the bins that leave each window, so an
+update costs O(1) however long a region has been tracked.
+
+Gap filling:
+- parameters missing from an update are carried forward from the
+  region's last snapshot (what ffill does for a time series - something
+  a single-row /predict can't do)
+- missed cadence bins up to REGION_GAP_FILL_HOURS are linearly
+  interpolated; longer gaps stay empty, and deltas that would reach
+  across them are reported as null
+"""
+import logging
+import math
+import os
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+REGION_TRACKED = [p.strip() for p in os.environ.get("REGION_TRACKED", "USFLUX,TOTPOT,R_VALUE").split(",") if p.strip()]
+REGION_WINDOWS_HOURS = [float(h) for h in os.environ.get("REGION_WINDOWS_HOURS", "6,12,24").split(",")]
+REGION_CADENCE_MINUTES = float(os.environ.get("REGION_CADENCE_MINUTES", 12))  # SHARP cadence
+REGION_CAPACITY = int(os.environ.get("REGION_CAPACITY", 1024))
+REGION_GAP_FILL_HOURS = float(os.environ.get("REGION_GAP_FILL_HOURS", 2))
+REGION_IDLE_HOURS = float(os.environ.get("REGION_IDLE_HOURS", 72))
+
+# Stamp of an empty ring slot / last bin of a fresh row. Not -1: bins are plain
+# epoch // cadence, so a window reaching back from bin 3 asks for bin -1 and
+# must not find an empty slot there
+EMPTY_BIN = np.iinfo(np.int64).min
+
+# Running sums are rebuilt from the ring this often (per region) to bound float drift
+RESYNC_EVERY = 1024
+
+
+class StaleUpdate(ValueError):
+    """An update older than the region's newest cadence bin"""
+
+
+def _hours_label(hours):
+    return f"{hours:g}h"
+
+
+class RegionFeatureEngine:
+    def __init__(self, feature_names, tracked=REGION_TRACKED, windows_hours=REGION_WINDOWS_HOURS,
+                 cadence_minutes=REGION_CADENCE_MINUTES, capacity=REGION_CAPACITY,
+                 gap_fill_hours=REGION_GAP_FILL_HOURS, idle_hours=REGION_IDLE_HOURS):
+        self.feature_names = list(feature_names)
+        self._feature_index = {name: i for i, name in enumerate(self.feature_names)}
+        missing = [p for p in tracked if p not in self._feature_index]
+        if missing:
+            raise ValueError(f"Tracked parameters {missing} are not features")
+        self.tracked = list(tracked)
+        self._tracked_index = np.array([self._feature_index[p] for p in self.tracked])
+        self.windows_hours = list(windows_hours)
+        self.cadence = int(round(cadence_minutes * 60))
+        self._window_bins = np.array([max(1, int(round(h * 3600 / self.cadence))) for h in windows_hours])
+        self._tau_bins = self._window_bins.astype(np.float64)
+        self._alpha_step = -np.expm1(-1 / self._tau_bins)  # EWMA weight of one new bin at the regular cadence
+        self._n_tracked = len(self.tracked)
+        self.slots = int(self._window_bins.max()) + 1  # the bin one full window back is still needed for deltas
+        self.capacity = capacity
+        self.max_gap_bins = int(gap_fill_hours * 3600 // self.cadence)
+        self.idle_seconds = idle_hours * 3600
+        self.temporal_feature_names = [
+            f"{param}_{kind}_{_hours_label(h)}"
+            for param in self.tracked for kind in ("delta", "slope", "ewma") for h in self.windows_hours
+        ]
+
+        R, S, P, W, F = capacity, self.slots, len(self.tracked), len(self.windows_hours), len(self.feature_names)
+        self._values = np.full((R, S, P), np.nan)
+        self._stamps = np.full((R, S), EMPTY_BIN, dtype=np.int64)   # absolute bin held by each ring slot
+        # Per window, packed: n, sum t, sum t^2, sum v (P), sum t*v (P) - t in bins since the region's first
+        self._sums = np.zeros((R, W, 3 + 2 * P))
+        self._terms_buffer = np.empty((W, 3 + 2 * P))
+        self._features_buffer = np.empty((P, 3, W))  # temporal_feature_names order
+        self._ewma = np.full((R, W, P), np.nan)
+        self._ewma_before = np.full((R, W, P), np.nan)  # EWMA before the newest bin, for same-bin corrections
+        self._alpha = np.ones((R, W))
+        self._last_bin = np.full(R, EMPTY_BIN, dtype=np.int64)
+        self._origin_bin = np.zeros(R, dtype=np.int64)
+        self._bins_added = np.zeros(R, dtype=np.int64)
+        self._last_seen = np.zeros(R)
+        self._snapshot = np.full((R, F), np.nan)
+
+        self._rows = {}
+        self._free = list(range(R - 1, -1, -1))
+        self._lock = threading.Lock()
+        self.updates = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, region_id):
+        return region_id in self._rows
+
+    # -- region rows --------------------------------------------------------------
+
+    def _reset_row(self, row):
+        self._values[row] = np.nan
+        self._stamps[row] = EMPTY_BIN
+        self._sums[row] = 0
+        self._ewma[row] = np.nan
+        self._ewma_before[row] = np.nan
+        self._alpha[row] = 1
+        self._last_bin[row] = EMPTY_BIN
+        self._bins_added[row] = 0
+        self._snapshot[row] = np.nan
+
+    def _row_for(self, region_id, epoch):
+        row = self._rows.get(region_id)
+        if row is not None:
+            return row
+        if not self._free:
+            self._evict(epoch)
+        row = self._free.pop()
+        self._reset_row(row)
+        self._rows[region_id] = row
+        return row
+
+    def _evict(self, epoch):
+        """Free rows of regions idle for longer than idle_hours, or else the least recently updated one"""
+        idle = [rid for rid, row in self._rows.items() if epoch - self._last_seen[row] > self.idle_seconds]
+        if not idle:
+            idle = [min(self._rows, key=lambda rid: self._last_seen[self._rows[rid]])]
+        for rid in idle:
+            self._free.append(self._rows.pop(rid))
+        self.evictions += len(idle)
+        logger.debug("🧹 Evicted %d region(s)", len(idle))
+
+    def remove(self, region_id):
+        with self._lock:
+            row = self._rows.pop(region_id, None)
+            if row is not None:
+                self._free.append(row)
+            return row is not None
+
+    # -- ring + running sums ------------------------------------------------------
+
+    def _terms(self, t, values):
+        """Per-bin contribution to the packed sums: [1, t, t^2, v..., t*v...]"""
+        return np.concatenate(((1.0, t, t * t), values, t * values))
+
+    def _advance(self, row, b, values):
+        """Append bin b (> the last bin) to the ring and every window"""
+        last = int(self._last_bin[row])
+        sums = self._sums[row]
+        if last != EMPTY_BIN:
+            emptied = None
+            if b - last >= self._window_bins.min():
+                # Everything these windows held has left them
+                emptied = b - self._window_bins >= last
+                sums[emptied] = 0
+            # The other windows each lose the bins (last - window, b - window]: one
+            # vectorized step per missed bin, i.e. a single step at the regular cadence
+            for k in range(1, min(b - last, self.slots) + 1):
+                leaving = last - self._window_bins + k
+                slots = leaving % self.slots
+                present = self._stamps[row, slots] == leaving
+                if emptied is not None:
+                    present &= ~emptied
+                if not present.all():
+                    if not present.any():
+                        continue
+                    leaving, slots = leaving[present], slots[present]
+                t = (leaving - self._origin_bin[row]).astype(np.float64)
+                old = self._values[row, slots]
+                terms = self._terms_buffer[:len(t)]
+                terms[:, 0] = 1.0
+                terms[:, 1] = t
+                terms[:, 2] = t * t
+                terms[:, 3:3 + self._n_tracked] = old
+                terms[:, 3 + self._n_tracked:] = t[:, None] * old
+                if len(t) == len(present):
+                    sums -= terms
+                else:
+                    sums[present] -= terms
+
+        slot = b % self.slots
+        self._stamps[row, slot] = b
+        self._values[row, slot] = values
+        sums += self._terms(float(b - self._origin_bin[row]), values)
+
+        previous = self._ewma[row]
+        if last == EMPTY_BIN:
+            self._ewma_before[row] = values
+            self._ewma[row] = values
+        else:
+            alpha = self._alpha_step if b - last == 1 else -np.expm1(-(b - last) / self._tau_bins)
+            self._alpha[row] = alpha
+            self._ewma_before[row] = previous
+            self._ewma[row] = previous + alpha[:, None] * (values - previous)
+        self._last_bin[row] = b
+        self._bins_added[row] += 1
+        if self._bins_added[row] % RESYNC_EVERY == 0:
+            self._resync(row)
+
+    def _replace(self, row, b, values):
+        """A second update within the newest bin replaces its values"""
+        slot = b % self.slots
+        t = float(b - self._origin_bin[row])
+        self._sums[row] += self._terms(t, values) - self._terms(t, self._values[row, slot])
+        self._values[row, slot] = values
+        before = self._ewma_before[row]
+        if self._bins_added[row] == 1:
+            self._ewma_before[row] = values
+            self._ewma[row] = values
+        else:
+            self._ewma[row] = before + self._alpha[row][:, None] * (values - before)
+
+    def _resync(self, row):
+        """Rebuild the running sums exactly from the ring"""
+        b = self._last_bin[row]
+        stamps = self._stamps[row]
+        for w, window in enumerate(self._window_bins):
+            inside = (stamps > b - window) & (stamps <= b)
+            t = (stamps[inside] - self._origin_bin[row]).astype(np.float64)
+            values = self._values[row][inside]
+            self._sums[row, w] = np.concatenate((
+                (len(t), t.sum(), (t * t).sum()), values.sum(axis=0), (t[:, None] * values).sum(axis=0)))
+
+    # -- public API ---------------------------------------------------------------
+
+    def update(self, region_id, epoch, parameters):
+        """
+        Apply one SHARP update ({parameter: value}, None = missing) observed at
+        `epoch` (seconds). Returns (temporal features {name: float | None},
+        names of the features carried forward from earlier updates).
+        """
+        unknown = [name for name in parameters if name not in self._feature_index]
+        if unknown:
+            raise ValueError(f"Unknown SHARP parameters: {unknown}")
+        b = int(epoch) // self.cadence
+
+        with self._lock:
+            new_region = region_id not in self._rows
+            if not new_region and b < self._last_bin[self._rows[region_id]]:
+                raise StaleUpdate(f"Update for region {region_id} is older than its latest one")
+            if new_region:
+                absent = [p for p in self.tracked if parameters.get(p) is None]
+                if absent:
+                    raise ValueError(f"The first update for a region needs {absent}")
+            row = self._row_for(region_id, epoch)
+
+            snapshot = self._snapshot[row]
+            given = [(self._feature_index[name], value) for name, value in parameters.items()
+                     if value is not None and math.isfinite(value)]
+            if given:
+                indices, given_values = zip(*given)
+                snapshot[list(indices)] = given_values
+            carried = [name for name, value in zip(self.feature_names, snapshot.tolist())
+                       if value == value and parameters.get(name) is None]
+            values = snapshot[self._tracked_index]
+
+            last = self._last_bin[row]
+            if new_region:
+                self._origin_bin[row] = b
+                self._advance(row, b, values)
+            elif b == last:
+                self._replace(row, b, values)
+            else:
+                gap = b - last
+                if 1 < gap <= self.max_gap_bins + 1:
+                    previous = self._values[row, last % self.slots].copy()
+                    for k in range(1, gap):
+                        self._advance(row, last + k, previous + (values - previous) * (k / gap))
+                self._advance(row, b, values)
+            self._last_seen[row] = epoch
+            self.updates += 1
+            return self._temporal_features(row), carried
+
+    def _temporal_features(self, row):
+        b = self._last_bin[row]
+        current = self._values[row, b % self.slots]
+        back = b - self._window_bins
+        back_slots = back % self.slots
+        present = self._stamps[row, back_slots] == back
+        out = self._features_buffer
+        out[:, 0, :] = np.where(present[:, None], current - self._values[row, back_slots], np.nan).T
+
+        sums = self._sums[row]
+        n, st, stt = sums[:, 0:1], sums[:, 1:2], sums[:, 2:3]
+        sum_v, sum_tv = sums[:, 3:3 + self._n_tracked], sums[:, 3 + self._n_tracked:]
+        # Least-squares slope per bin, scaled to per hour; undefined below two bins
+        slopes = out[:, 1, :].T
+        slopes[:] = np.nan
+        np.divide((n * sum_tv - st * sum_v) * (3600 / self.cadence), n * stt - st * st, out=slopes, where=n >= 2)
+        out[:, 2, :] = self._ewma[row].T
+        return {name: (v if v == v else None) for name, v in zip(self.temporal_feature_names, out.ravel().tolist())}
+
+    def snapshot(self, region_id, feature_names=None):
+        """Latest gap-filled feature row of a region (None for never-seen features), in feature_names order"""
+        with self._lock:
+            row = self._rows.get(region_id)
+            if row is None:
+                raise KeyError(region_id)
+            values = self._snapshot[row]
+            if feature_names is not None:
+                values = values[[self._feature_index[name] for name in feature_names]]
+            return [v if v == v else None for v in values.tolist()]
+
+    def temporal_features(self, region_id):
+        with self._lock:
+            row = self._rows.get(region_id)
+            if row is None:
+                raise KeyError(region_id)
+            return self._temporal_features(row)
+
+    def stats(self):
+        return {
+            "regions": len(self._rows),
+            "capacity": self.capacity,
+            "updates": self.updates,
+            "evictions": self.evictions,
+            "tracked": self.tracked,
+            "windows_hours": self.windows_hours,
+            "cadence_minutes": self.cadence / 60,
+        }
+
+
+def create_region_engine_from_env(feature_names):
+    """
+    Build the engine from environment variables:
+    REGION_CAPACITY (0 disables /regions), REGION_TRACKED, REGION_WINDOWS_HOURS,
+    REGION_CADENCE_MINUTES, REGION_GAP_FILL_HOURS, REGION_IDLE_HOURS
+    """
+    if REGION_CAPACITY <= 0:
+        return None
+    engine = RegionFeatureEngine(feature_names)
+    logger.info("🛰️ Region feature engine: %d regions x %d slots, tracking %s over %s h",
+                engine.capacity, engine.slots, ",".join(engine.tracked),
+                "/".join(_hours_label(h)[:-1] for h in engine.windows_hours))
+    return engine
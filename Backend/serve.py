@@ -0,0 +1,158 @@
+# backend/serve.py
+"""
+Multi-worker launcher (pre-fork).
+
+`uvicorn main:app --workers N` spawns N fresh interpreters, and each one
+imports FastAPI/numpy and loads its own model bundle. Here the parent
+process does that once:
+
+- imports main (FastAPI, numpy, every backend module)
+- loads the active model bundle; the compiled forests are np.load()ed with
+  mmap_mode='r', so the node arrays live in the page cache exactly once
+- scores the probe batch, which touches every array page before forking
+- binds the listening socket
+
+and then forks the workers. Each worker runs its own uvicorn server and
+event loop on the inherited socket. The model arrays are never copied:
+every worker maps the same file pages, and the interpreter heap built
+before the fork is shared copy-on-write. The parent restarts workers that
+die and forwards SIGINT/SIGTERM.
+
+Workers keep the compiled evaluator for every batch size (COMPILED_MAX_ROWS
+defaults to MAX_BATCH_ROWS here), so none of them imports sklearn or
+unpickles the estimators. Per-worker state stays per worker: the
+prediction cache, /metrics, the X-ray buffer, upstream polling and
+/admin/reload (use MODEL_WATCH=1 so every worker picks up new versions).
+
+Platforms without fork() fall back to `uvicorn main:app --workers N`,
+where the workers still share the memory-mapped arrays through the page
+cache.
+
+Run from the backend directory:  python serve.py --workers 4 --port 8000
+"""
+import argparse
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+
+logger = logging.getLogger("serve")
+
+RESTART_BACKOFF = 1.0
+
+
+def preload():
+    """Import the app and load + warm the model bundle in this process"""
+    import main
+    from model_registry import registry, COMPILED_ARRAYS
+
+    start = time.perf_counter()
+    bundle = registry.get()
+    if bundle.available:
+        main._warmup_probe(bundle)
+    shared = sum(array.nbytes for forest in (bundle.compiled_rf, bundle.compiled_iso) if forest
+                 for key, array in forest.items() if key in COMPILED_ARRAYS)
+    logger.info("📦 Model version %s preloaded in %.0f ms (%s, %.1f KB of memory-mapped forest arrays)",
+                bundle.version, (time.perf_counter() - start) * 1000,
+                bundle.model_format, shared / 1024)
+    if bundle.compiled_rf is None:
+        logger.warning("⚠️ No compiled forests: every worker will unpickle its own sklearn models "
+                       "(run python train_models.py export)")
+    return main.app
+
+
+def bind_socket(host, port, backlog=2048):
+    sock = socket.socket(socket.AF_INET6 if ':' in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app, sock, log_level):
+    """Body of a forked worker: one uvicorn server on the shared socket"""
+    import uvicorn
+
+    # The parent's handlers belong to the supervisor loop; uvicorn installs its own
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    config = uvicorn.Config(app, log_level=log_level, timeout_graceful_shutdown=10)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def _fork_worker(app, sock, log_level):
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            run_worker(app, sock, log_level)
+        except BaseException:
+            logger.exception("❌ Worker %d crashed", os.getpid())
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def serve(host='0.0.0.0', port=8000, workers=None, log_level='info'):
+    workers = workers or os.cpu_count() or 1
+    # main.MAX_BATCH_ROWS: no request is large enough to fall back to sklearn
+    os.environ.setdefault('COMPILED_MAX_ROWS', '10000')
+
+    if not hasattr(os, 'fork'):
+        import uvicorn
+        logger.warning("⚠️ fork() is not available, starting uvicorn --workers %d instead", workers)
+        uvicorn.run('main:app', host=host, port=port, workers=workers, log_level=log_level)
+        return
+
+    app = preload()
+    sock = bind_socket(host, port)
+    children = {_fork_worker(app, sock, log_level) for _ in range(workers)}
+    logger.info("🚀 Serving on http://%s:%d with %d workers (pids %s)", host, port, workers, sorted(children))
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        children.discard(pid)
+        if not stopping:
+            logger.warning("⚠️ Worker %d exited (status %d), restarting", pid, status)
+            time.sleep(RESTART_BACKOFF)
+            children.add(_fork_worker(app, sock, log_level))
+    sock.close()
+    logger.info("👋 All workers stopped")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the API with N pre-forked workers")
+    parser.add_argument('--host', default=os.environ.get('HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 8000)))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('WEB_WORKERS', 0)) or None,
+                        help='worker processes (default: WEB_WORKERS or the CPU count)')
+    parser.add_argument('--log-level', default=os.environ.get('LOG_LEVEL', 'info').lower())
+    args = parser.parse_args(argv)
+    serve(args.host, args.port, args.workers, args.log_level)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,14 +3,86 @@ import pandas as pd
 import numpy as np
 import joblib
 from sklearn.ensemble import RandomForestClassifier, IsolationForest
-from sklearn.model_selection import train_test_split, cross_val_score
+from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, roc_auc_score
+import json
+import os
 import warnings
 warnings.filterwarnings('ignore')
 
+from model_registry import MODEL_DIR, make_compiled_forest, file_sha256, write_active_version
+import data_cache
 
-def train_flare_models():
+CSV_PATH = 'HMI_CLEANED_DATA.csv'
+SIGNIFICANT_CLASSES = ['M', 'X']
+# Lower/upper quantiles used for the data-driven outlier caps
+BOUNDS_QUANTILES = (0.001, 0.999)
+
+FEATURE_COLUMNS = [
+    'R_VALUE', 'QUALITY', 'MEANGBZ', 'TOTUSJH', 'USFLUX', 'TOTPOT', 'MEANPOT',
+    'AREA_ACR', 'LON_MIN', 'LON_MAX', 'LAT_MIN', 'LAT_MAX', 'MEANGAM', 'MEANGBT',
+    'MEANGBH', 'MEANJZD', 'TOTUSJZ', 'MEANALP', 'MEANJZH', 'ABSNJZH', 'SAVNCPP',
+    'MEANSHR', 'SHRGT45'
+]
+
+
+def load_training_data(csv_path=CSV_PATH, use_cache=True):
+    """
+    Feature matrix (DataFrame) + significance target (1 = M/X flare).
+    With use_cache the 23 feature columns and flare_category are read from
+    the typed columnar cache (data_cache.py) instead of parsing the CSV.
+    """
+    if use_cache:
+        columns = data_cache.available_columns(csv_path)
+        available_features = [col for col in FEATURE_COLUMNS if col in columns]
+        X = pd.DataFrame(data_cache.load_feature_matrix(available_features, csv_path), columns=available_features, copy=False)
+        if 'flare_category' in columns:
+            codes, categories = data_cache.load_flare_categories(csv_path)
+            significant_codes = [categories.index(c) for c in SIGNIFICANT_CLASSES]
+            y_significant = pd.Series(np.isin(codes, significant_codes).astype(int))
+        else:
+            y_significant = None
+    else:
+        df = pd.read_csv(csv_path)
+        available_features = [col for col in FEATURE_COLUMNS if col in df.columns]
+        X = df[available_features]
+        y_significant = (df['flare_category'].isin(SIGNIFICANT_CLASSES)).astype(int) if 'flare_category' in df.columns else None
+
+    if y_significant is None:
+        # Fallback: create dummy target for demonstration
+        print("⚠️ No flare_category column found, creating dummy target (label the rows with `train_models.py label`)")
+        y_significant = pd.Series((np.random.random(len(X)) > 0.8).astype(int))
+    return X, y_significant, available_features
+
+def load_training_dates(csv_path=CSV_PATH, use_cache=True):
+    """DATE of every training row as int64 epoch seconds"""
+    if use_cache:
+        return np.asarray(data_cache.load_columns(['DATE'], csv_path)['DATE'])
+    dates = pd.to_datetime(pd.read_csv(csv_path, usecols=['DATE'])['DATE'])
+    return dates.to_numpy(dtype='datetime64[s]').astype(np.int64)
+
+def load_flare_classes(csv_path=CSV_PATH, use_cache=True):
+    """True flare class of every row as an index into class_assignment.LABELS (None without labels)"""
+    from class_assignment import category_classes
+
+    if use_cache:
+        if 'flare_category' not in data_cache.available_columns(csv_path):
+            return None
+        codes, categories = data_cache.load_flare_categories(csv_path)
+        return category_classes(codes, categories)
+    df = pd.read_csv(csv_path)
+    if 'flare_category' not in df.columns:
+        return None
+    categories = pd.Categorical(df['flare_category'].astype(str))
+    return category_classes(categories.codes, list(categories.categories))
+
+def make_probe_batch(X, n_rows=32):
+    """Evenly spaced rows across the (time-ordered) dataset"""
+    X = np.asarray(X, dtype=np.float64)
+    return X[np.linspace(0, len(X) - 1, min(n_rows, len(X))).astype(int)]
+
+def train_flare_models(csv_path=CSV_PATH, model_dir=MODEL_DIR, use_cache=True):
     """
     TRAIN THE ACTUAL MODELS USING YOUR HMI DATASET
     This replicates your dissertation model training
@@ -18,40 +90,17 @@ def train_flare_models():
     print("🚀 STARTING MODEL TRAINING...")
     
     try:
-        # Load your cleaned HMI data
-        # Replace this with your actual HMI_CLEANED_DATA.csv path
-        df = pd.read_csv('HMI_CLEANED_DATA.csv')
-        print(f"✅ Loaded dataset with {len(df)} samples and {len(df.columns)} features")
-        
-        # Prepare features and target
-        # Assuming your target column is 'flare_category' or similar
-        feature_columns = [
-            'R_VALUE', 'QUALITY', 'MEANGBZ', 'TOTUSJH', 'USFLUX', 'TOTPOT', 'MEANPOT', 
-            'AREA_ACR', 'LON_MIN', 'LON_MAX', 'LAT_MIN', 'LAT_MAX', 'MEANGAM', 'MEANGBT', 
-            'MEANGBH', 'MEANJZD', 'TOTUSJZ', 'MEANALP', 'MEANJZH', 'ABSNJZH', 'SAVNCPP', 
-            'MEANSHR', 'SHRGT45'
-        ]
-        
-        # Check which features exist in your data
-        available_features = [col for col in feature_columns if col in df.columns]
-        print(f"✅ Using {len(available_features)} available features")
-        
-        X = df[available_features]
-        
-        # Create target variable: 1 for significant flares (M/X class), 0 for insignificant
-        # Adjust this based on your actual target column
-        if 'flare_category' in df.columns:
-            y_significant = (df['flare_category'].isin(['M', 'X'])).astype(int)
-        else:
-            # Fallback: create dummy target for demonstration
-            print("⚠️ No flare_category column found, creating dummy target")
-            y_significant = (np.random.random(len(df)) > 0.8).astype(int)
+        # Load your cleaned HMI data (only the feature columns + target)
+        X, y_significant, available_features = load_training_data(csv_path, use_cache)
+        print(f"✅ Loaded dataset with {len(X)} samples, using {len(available_features)} available features")
         
         print(f"✅ Target distribution: {y_significant.value_counts().to_dict()}")
         
-        # Split data
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y_significant, test_size=0.2, random_state=42, stratify=y_significant
+        # Split data (the row order is the same with or without the class array)
+        classes = load_flare_classes(csv_path, use_cache)
+        X_train, X_test, y_train, y_test, _, classes_test = train_test_split(
+            X, y_significant, np.zeros(len(X), dtype=int) if classes is None else classes,
+            test_size=0.2, random_state=42, stratify=y_significant
         )
         
         # Train Stage 1: Random Forest for Significance Classification
@@ -105,18 +154,17 @@ def train_flare_models():
         print("💾 Saving models and metadata...")
         
         # Create models directory if it doesn't exist
-        import os
-        os.makedirs('models', exist_ok=True)
+        os.makedirs(model_dir, exist_ok=True)
         
         # Save Stage 1 model
-        joblib.dump(rf_model, 'models/rf_significance_model.pkl')
+        joblib.dump(rf_model, os.path.join(model_dir, 'rf_significance_model.pkl'))
         
         # Save Stage 2 model if trained
         if iso_forest:
-            joblib.dump(iso_forest, 'models/iso_anomaly_model.pkl')
+            joblib.dump(iso_forest, os.path.join(model_dir, 'iso_anomaly_model.pkl'))
         
         # Save feature names and scaler
-        joblib.dump(available_features, 'models/feature_names.pkl')
+        joblib.dump(available_features, os.path.join(model_dir, 'feature_names.pkl'))
         
         # Save performance metrics
         metrics = {
@@ -131,7 +179,28 @@ def train_flare_models():
             'significant_flares': len(X_significant)
         }
         
-        joblib.dump(metrics, 'models/performance_metrics.pkl')
+        joblib.dump(metrics, os.path.join(model_dir, 'performance_metrics.pkl'))
+
+        # Data-driven outlier caps for the serving preprocessing (FEATURE_BOUNDS=learned)
+        save_feature_bounds(learn_feature_bounds(X), model_dir)
+
+        # Flatten both forests into packed arrays for the fast serving path
+        export_compiled_forests(rf_model, iso_forest, X_test.values, model_dir=model_dir)
+
+        # Probability calibration + class thresholds, fitted on the held-out rows
+        if classes is not None:
+            fit_class_assignment(y_prob, classes_test, model_dir)
+
+        # Watermark + significant-flare reservoir for `train_models.py update`
+        from model_update import full_training_state, write_training_state
+        state, reservoir = full_training_state(X.values, y_significant.values, load_training_dates(csv_path, use_cache))
+        write_training_state(model_dir, state, reservoir)
+        # Fixed probe rows for validating hot reloads (kept once created)
+        probe_path = os.path.join(model_dir, 'probe_batch.npy')
+        if not os.path.exists(probe_path):
+            np.save(probe_path, make_probe_batch(X.values))
+        # A full retrain supersedes any incrementally updated version
+        write_active_version(model_dir, None)
         
         print("🎉 MODEL TRAINING COMPLETED SUCCESSFULLY!")
         print(f"📊 Final Model Performance:")
@@ -147,5 +216,269 @@ def train_flare_models():
         print(f"❌ Model training failed: {e}")
         return None
 
+def fit_class_assignment(probabilities, classes, model_dir=MODEL_DIR, method='isotonic'):
+    """
+    Fit and save models/class_assignment.npz from held-out Random Forest
+    probabilities and true classes; prints it against the legacy thresholds
+    """
+    from class_assignment import CLASS_ASSIGNMENT_FILE, LEGACY, evaluate_class_table, fit_class_table
+
+    rf_sha256 = file_sha256(os.path.join(model_dir, 'rf_significance_model.pkl'))
+    table = fit_class_table(probabilities, classes, method=method, source_sha256=rf_sha256)
+    table.save(os.path.join(model_dir, CLASS_ASSIGNMENT_FILE))
+    print(f"✅ Class assignment ({method}) fitted on {len(classes)} held-out rows, "
+          f"edges {np.round(table.edges, 4).tolist()}, anomaly edge {table.anomaly_edge:.4f}")
+    for name, candidate in (('legacy', LEGACY), (method, table)):
+        quality = evaluate_class_table(candidate, probabilities, classes)
+        print(f"   {name:>8}: class accuracy {quality['class_accuracy']:.3f}, Brier {quality['brier']:.4f}, "
+              f"assigned {quality['assigned_shares']}")
+    return table
+
+def calibrate_existing_models(csv_path=CSV_PATH, model_dir=MODEL_DIR, method='isotonic', use_cache=True):
+    """Fit the class-assignment table for the already-trained models (same held-out split as training)"""
+    rf_model = joblib.load(os.path.join(model_dir, 'rf_significance_model.pkl'))
+    feature_names = joblib.load(os.path.join(model_dir, 'feature_names.pkl'))
+    X, y_significant, _ = load_training_data(csv_path, use_cache)
+    classes = load_flare_classes(csv_path, use_cache)
+    if classes is None:
+        print("❌ No flare_category column to fit the class thresholds on")
+        return None
+    _, X_test, _, classes_test = train_test_split(X[feature_names], classes, test_size=0.2,
+                                                  random_state=42, stratify=y_significant)
+    return fit_class_assignment(rf_model.predict_proba(X_test)[:, 1], classes_test, model_dir, method)
+
+def learn_feature_bounds(X, quantiles=BOUNDS_QUANTILES):
+    """Per-feature quantile caps learned from the training matrix (DataFrame)"""
+    values = np.asarray(X, dtype=np.float64)
+    lower, upper = np.nanquantile(values, quantiles, axis=0)
+    return {
+        'feature_names': list(X.columns),
+        'quantiles': list(quantiles),
+        'lower': lower.tolist(),
+        'upper': upper.tolist(),
+        'rows': len(values),
+    }
+
+def save_feature_bounds(bounds, model_dir=MODEL_DIR):
+    """Write feature_bounds.json next to the models (atomic replace)"""
+    path = os.path.join(model_dir, 'feature_bounds.json')
+    with open(path + '.tmp', 'w') as f:
+        json.dump(bounds, f, indent=2)
+    os.replace(path + '.tmp', path)
+    print(f"✅ Saved {bounds['quantiles']} quantile bounds for {len(bounds['feature_names'])} features to {path}")
+    return path
+
+def export_feature_bounds(csv_path=CSV_PATH, model_dir=MODEL_DIR):
+    """Learn the quantile bounds for the existing models without retraining"""
+    X, _, _ = load_training_data(csv_path)
+    return save_feature_bounds(learn_feature_bounds(X), model_dir)
+
+def _pack_trees(trees, feature_maps=None):
+    """
+    Concatenate sklearn Tree objects into flat node arrays.
+    Child indices are global (offset per tree) and leaves point to
+    themselves, so a fixed number of traversal steps always ends on a leaf.
+    """
+    features, thresholds, children, leaf_nodes, roots = [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for i, tree in enumerate(trees):
+        n = tree.node_count
+        is_leaf = tree.children_left == -1
+        node_ids = np.arange(n, dtype=np.int32) + offset
+
+        feature = np.where(is_leaf, 0, tree.feature).astype(np.int32)
+        if feature_maps is not None:
+            feature = np.asarray(feature_maps[i], dtype=np.int32)[feature]
+
+        features.append(feature)
+        thresholds.append(np.where(is_leaf, 0.0, tree.threshold))
+        children.append(np.stack([
+            np.where(is_leaf, node_ids, tree.children_left + offset),
+            np.where(is_leaf, node_ids, tree.children_right + offset),
+        ], axis=1).astype(np.int32))
+        leaf_nodes.append(is_leaf)
+        roots.append(offset)
+        offset += n
+        max_depth = max(max_depth, tree.max_depth)
+
+    return {
+        'feature': np.concatenate(features),
+        'threshold': np.concatenate(thresholds).astype(np.float64),
+        'children': np.concatenate(children),
+        'roots': np.array(roots, dtype=np.int32),
+    }, np.concatenate(leaf_nodes), max_depth
+
+def flatten_random_forest(rf_model, keep=None):
+    """
+    Packed arrays for a binary RandomForestClassifier.
+    'value' holds each node's class-1 probability, so predict_proba is the
+    mean of the reached leaf values over all trees (or over the trees
+    whose indices are in keep).
+    """
+    estimators = rf_model.estimators_ if keep is None else [rf_model.estimators_[i] for i in keep]
+    trees = [est.tree_ for est in estimators]
+    arrays, _, max_depth = _pack_trees(trees)
+    values = []
+    for tree in trees:
+        counts = tree.value[:, 0, :]
+        normalizer = counts.sum(axis=1)
+        normalizer[normalizer == 0.0] = 1.0
+        values.append(counts[:, 1] / normalizer)
+    arrays['value'] = np.concatenate(values).astype(np.float64)
+    meta = {'kind': 'random_forest', 'max_depth': int(max_depth), 'n_trees': len(trees),
+            'n_features': int(rf_model.n_features_in_)}
+    return arrays, meta
+
+def flatten_isolation_forest(iso_model):
+    """
+    Packed arrays for an IsolationForest.
+    'value' holds each leaf's path length (depth + average path length of
+    the samples left in it - 1), so
+        decision_function = -2 ** (-sum(values) / denominator) - offset
+    """
+    from sklearn.ensemble._iforest import _average_path_length
+
+    trees = [est.tree_ for est in iso_model.estimators_]
+    feature_maps = None
+    if iso_model._max_features != iso_model.n_features_in_:
+        feature_maps = iso_model.estimators_features_
+    arrays, _, max_depth = _pack_trees(trees, feature_maps)
+    arrays['value'] = np.concatenate([
+        iso_model._decision_path_lengths[i] + iso_model._average_path_length_per_tree[i] - 1.0
+        for i in range(len(trees))
+    ]).astype(np.float64)
+    denominator = len(trees) * _average_path_length([iso_model._max_samples])[0]
+    meta = {'kind': 'isolation_forest', 'max_depth': int(max_depth), 'n_trees': len(trees),
+            'n_features': int(iso_model.n_features_in_), 'offset': float(iso_model.offset_),
+            'denominator': float(denominator)}
+    return arrays, meta
+
+def save_compiled_forest(arrays, meta, name, directory):
+    """Write one .npy per array plus a small JSON header"""
+    os.makedirs(directory, exist_ok=True)
+    for key, array in arrays.items():
+        np.save(os.path.join(directory, f'{name}_{key}.npy'), np.ascontiguousarray(array))
+    with open(os.path.join(directory, f'{name}_meta.json'), 'w') as f:
+        json.dump(meta, f, indent=2)
+
+def export_compiled_forests(rf_model, iso_model, X_check, model_dir=MODEL_DIR, tolerance=1e-9):
+    """
+    Flatten the RF (and Isolation Forest, if any) into packed NumPy arrays
+    under <model_dir>/compiled/, after checking the flat evaluator reproduces
+    sklearn on X_check. Nothing is written if the parity check fails.
+    """
+    import model_utils
+
+    directory = os.path.join(model_dir, 'compiled')
+    print("🔧 Compiling forests into flat node arrays...")
+    X_check = np.asarray(X_check, dtype=np.float64)
+
+    rf_arrays, rf_meta = flatten_random_forest(rf_model)
+    rf_meta['source_sha256'] = file_sha256(os.path.join(model_dir, 'rf_significance_model.pkl'))
+    expected = rf_model.predict_proba(X_check)[:, 1]
+    actual = model_utils.compiled_predict_proba(make_compiled_forest(rf_arrays, rf_meta), X_check)
+    rf_error = float(np.max(np.abs(expected - actual)))
+    if rf_error > tolerance:
+        raise ValueError(f"Compiled Random Forest does not match sklearn (max error {rf_error:.3g})")
+
+    iso_error = None
+    if iso_model is not None:
+        iso_arrays, iso_meta = flatten_isolation_forest(iso_model)
+        iso_meta['source_sha256'] = file_sha256(os.path.join(model_dir, 'iso_anomaly_model.pkl'))
+        expected = iso_model.decision_function(X_check)
+        actual = model_utils.compiled_decision_function(make_compiled_forest(iso_arrays, iso_meta), X_check)
+        iso_error = float(np.max(np.abs(expected - actual)))
+        if iso_error > tolerance:
+            raise ValueError(f"Compiled Isolation Forest does not match sklearn (max error {iso_error:.3g})")
+
+    save_compiled_forest(rf_arrays, rf_meta, 'rf_significance', directory)
+    if iso_model is not None:
+        save_compiled_forest(iso_arrays, iso_meta, 'iso_anomaly', directory)
+    elif os.path.exists(os.path.join(directory, 'iso_anomaly_meta.json')):
+        # Don't leave a stale compiled Isolation Forest behind
+        os.remove(os.path.join(directory, 'iso_anomaly_meta.json'))
+
+    print(f"✅ Compiled forests saved to {directory}/ "
+          f"(parity on {len(X_check)} rows: RF max error {rf_error:.1e}"
+          + (f", ISO max error {iso_error:.1e})" if iso_error is not None else ")"))
+    return {'rf_max_error': rf_error, 'iso_max_error': iso_error}
+
+def export_existing_models(model_dir=MODEL_DIR):
+    """Compile the already-trained models in models/ (no retraining)"""
+    iso_path = os.path.join(model_dir, 'iso_anomaly_model.pkl')
+    rf_model = joblib.load(os.path.join(model_dir, 'rf_significance_model.pkl'))
+    iso_model = joblib.load(iso_path) if os.path.exists(iso_path) else None
+    feature_names = joblib.load(os.path.join(model_dir, 'feature_names.pkl'))
+    X = data_cache.load_feature_matrix(feature_names).astype(np.float64)
+    return export_compiled_forests(rf_model, iso_model, X, model_dir=model_dir)
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Train, export or sweep the flare models")
+    commands = parser.add_subparsers(dest='command')
+    commands.add_parser('train', help="train the two-stage model (default)")
+    commands.add_parser('export', help="compile the existing models for serving")
+    commands.add_parser('bounds', help="learn quantile outlier bounds for the existing models")
+    compact = commands.add_parser('compact', help="write small quantized / pruned forests for serving (MODEL_FORMAT=compact)")
+    compact.add_argument('--leaf-bits', choices=['auto', '8', '16', '32', '64'], default='auto',
+                         help="leaf value width (auto: smallest within --tolerance, per forest)")
+    compact.add_argument('--tolerance', type=float, default=1e-3, help="largest score change auto accepts")
+    compact.add_argument('--keep-trees', type=int, default=None, help="Random Forest trees to keep (default: all)")
+    compact.add_argument('--report', action='store_true', help="first compare every leaf width x tree count")
+    calibrate = commands.add_parser('calibrate', help="fit probability calibration + class thresholds for the existing models")
+    calibrate.add_argument('--method', choices=['isotonic', 'platt'], default='isotonic')
+    sweep = commands.add_parser('sweep', help="parallel hyperparameter / CV sweep")
+    sweep.add_argument('--name', default='default', help="sweep name (reuse it to resume)")
+    sweep.add_argument('--workers', type=int, default=None, help="worker processes (default: all cores)")
+    sweep.add_argument('--n-iter', type=int, default=None, help="random-search configs per model (default: full grid)")
+    sweep.add_argument('--folds', type=int, default=5, help="stratified CV folds")
+    update = commands.add_parser('update', help="fold rows newer than the training watermark into the models")
+    update.add_argument('--replace-trees', type=int, default=10, help="oldest trees replaced by new ones")
+    update.add_argument('--context-rows', type=int, default=730, help="recent rows trained on with the new ones")
+    update.add_argument('--no-activate', action='store_true', help="write the version without making it active")
+    backtest = commands.add_parser('backtest', help="walk-forward evaluation over time")
+    backtest.add_argument('--train-days', type=int, default=730, help="minimum (or sliding) training span")
+    backtest.add_argument('--horizon-days', type=int, default=30, help="days scored per window")
+    backtest.add_argument('--window', choices=['expanding', 'sliding'], default='expanding')
+    backtest.add_argument('--workers', type=int, default=None, help="worker processes (default: all cores)")
+    label = commands.add_parser('label', help="(re)label feature rows with the flares that follow them")
+    label.add_argument('--events', default='cache/flares.sqlite', help="flare store (.sqlite) or event CSV")
+    label.add_argument('--rows', default=CSV_PATH, help="SHARP feature rows to label")
+    label.add_argument('--out', required=True, help="labeled CSV to write")
+    label.add_argument('--horizon-hours', type=float, default=24, help="flares peaking within this many hours count")
+    label.add_argument('--time-column', default='DATE')
+    label.add_argument('--region-column', default=None, help="join on NOAA region as well as time")
+    label.add_argument('--chunk-rows', type=int, default=100_000, help="rows labeled per streamed chunk")
+    args = parser.parse_args(argv)
+
+    if args.command in (None, 'train'):
+        train_flare_models()
+    elif args.command == 'export':
+        export_existing_models()
+    elif args.command == 'bounds':
+        export_feature_bounds()
+    elif args.command == 'compact':
+        from compact_models import export_compact_models
+        export_compact_models(leaf_bits=args.leaf_bits, keep_trees=args.keep_trees,
+                              tolerance=args.tolerance, report=args.report)
+    elif args.command == 'calibrate':
+        calibrate_existing_models(method=args.method)
+    elif args.command == 'sweep':
+        from model_sweep import run_sweep
+        run_sweep(name=args.name, n_workers=args.workers, n_iter=args.n_iter, folds=args.folds)
+    elif args.command == 'update':
+        from model_update import update_models
+        update_models(replace_trees=args.replace_trees, context_rows=args.context_rows, activate=not args.no_activate)
+    elif args.command == 'backtest':
+        from backtest import run_backtest
+        run_backtest(train_days=args.train_days, horizon_days=args.horizon_days,
+                     window=args.window, n_workers=args.workers)
+    elif args.command == 'label':
+        from labeling import label_csv, load_flare_index
+        label_csv(args.rows, load_flare_index(args.events, by_region=args.region_column is not None), args.out, horizon_hours=args.horizon_hours,
+                  time_column=args.time_column, region_column=args.region_column, chunksize=args.chunk_rows)
+
 if __name__ == "__main__":
-    train_flare_models()
\ No newline at end of file
+    main()
\ No newline at end of file
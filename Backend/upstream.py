@@ -0,0 +1,216 @@
+# backend/upstream.py
+"""
+Shared access to the NASA DONKI and NOAA SWPC upstream APIs.
+
+- One pooled httpx.AsyncClient (keep-alive) for the whole process instead
+  of a fresh blocking requests.get() per API call.
+- TTLCache with request coalescing: N concurrent callers for the same key
+  trigger at most one upstream fetch, and a value younger than its TTL is
+  served from memory.
+- Stale-while-revalidate: after the TTL a cached value is still served for
+  `stale_ttl` seconds while a single background refresh runs, so a slow
+  upstream never sits on the request path once the cache is warm.
+  Entries past TTL + stale_ttl are evicted whenever a new value is stored,
+  so keys that are never asked for again (DONKI date ranges) don't pile up.
+"""
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+NASA_DONKI_URL = os.environ.get("NASA_DONKI_URL", "https://api.nasa.gov/DONKI/FLR")
+NASA_API_KEY = os.environ.get("NASA_API_KEY", "DEMO_KEY")
+# The 6-hour feed is enough for the latest sample (the 7-day file is ~100x larger)
+NOAA_XRAY_URL = os.environ.get("NOAA_XRAY_URL", "https://services.swpc.noaa.gov/json/goes/primary/xrays-6-hour.json")
+
+DONKI_CACHE_TTL = float(os.environ.get("DONKI_CACHE_TTL", 300))
+XRAY_CACHE_TTL = float(os.environ.get("XRAY_CACHE_TTL", 60))
+UPSTREAM_STALE_TTL = float(os.environ.get("UPSTREAM_STALE_TTL", 600))
+UPSTREAM_TIMEOUT = float(os.environ.get("UPSTREAM_TIMEOUT", 10))
+
+_client = None
+
+
+def get_http_client():
+    """The process-wide pooled AsyncClient (created on first use)"""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=UPSTREAM_TIMEOUT,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60),
+            headers={"User-Agent": "solar-flare-prediction-api/2.0"},
+        )
+    return _client
+
+
+async def close_http_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+class TTLCache:
+    def __init__(self):
+        self._entries = {}    # key -> (value, fetched_at, expires_at)
+        self._inflight = {}   # key -> asyncio.Task
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "coalesced": 0,
+                      "upstream_calls": 0, "upstream_errors": 0, "evictions": 0}
+
+    def _evict_expired(self, now):
+        expired = [key for key, (_, _, expires_at) in self._entries.items() if expires_at <= now]
+        for key in expired:
+            del self._entries[key]
+        self.stats["evictions"] += len(expired)
+
+    def _start_fetch(self, key, fetch, keep_for):
+        async def runner():
+            self.stats["upstream_calls"] += 1
+            try:
+                value = await fetch()
+            except Exception:
+                self.stats["upstream_errors"] += 1
+                raise
+            finally:
+                self._inflight.pop(key, None)
+            now = time.monotonic()
+            self._evict_expired(now)
+            self._entries[key] = (value, now, now + keep_for)
+            return value
+
+        task = asyncio.create_task(runner())
+        # Background refreshes may fail with nobody awaiting them
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._inflight[key] = task
+        return task
+
+    async def get(self, key, fetch, ttl, stale_ttl=UPSTREAM_STALE_TTL):
+        """
+        Return the cached value for key, calling `await fetch()` at most once
+        at a time per key. Raises whatever fetch raises when there is no
+        usable cached value.
+        """
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        if entry is not None:
+            value, fetched_at, _ = entry
+            age = now - fetched_at
+            if age < ttl:
+                self.stats["hits"] += 1
+                return value
+            if age < ttl + stale_ttl:
+                # Serve stale, refresh once in the background
+                self.stats["stale_hits"] += 1
+                if key not in self._inflight:
+                    self._start_fetch(key, fetch, ttl + stale_ttl)
+                return value
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+        else:
+            self.stats["misses"] += 1
+            task = self._start_fetch(key, fetch, ttl + stale_ttl)
+        try:
+            return await asyncio.shield(task)
+        except Exception:
+            if entry is not None:
+                # Upstream failed - an old value beats no value
+                return entry[0]
+            raise
+
+
+cache = TTLCache()
+
+
+async def fetch_json(url, params=None):
+    response = await get_http_client().get(url, params=params)
+    response.raise_for_status()
+    return response.json()
+
+
+async def get_donki_flares(days=3):
+    """DONKI flare events for the last `days` days (cached per date range)"""
+    end = datetime.now().strftime("%Y-%m-%d")
+    start = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
+    params = {"startDate": start, "endDate": end, "api_key": NASA_API_KEY}
+    return await cache.get(("donki", start, end), lambda: fetch_json(NASA_DONKI_URL, params), DONKI_CACHE_TTL)
+
+
+async def get_latest_xray_sample():
+    """Most recent GOES X-ray sample (a dict), or None if the feed is empty"""
+    async def fetch():
+        xray_data = await fetch_json(NOAA_XRAY_URL)
+        return xray_data[-1] if xray_data else None
+
+    return await cache.get(("xray_latest",), fetch, XRAY_CACHE_TTL)
+
+
+class DonkiFlareWatcher:
+    """
+    Background task that re-reads the (cached) DONKI flare list and calls
+    on_new_flares(flares) with events it hasn't seen before. The first pass
+    only records what already exists. A seen key is kept until its peakTime
+    has left the lookback window, so an empty or partial response doesn't
+    make the next poll announce the whole window again.
+    """
+
+    def __init__(self, on_new_flares, interval=DONKI_CACHE_TTL, days=3):
+        self.on_new_flares = on_new_flares
+        self.interval = interval
+        self.days = days
+        self._seen = None     # key -> peak time (epoch seconds)
+        self._task = None
+
+    @staticmethod
+    def _flare_key(flare):
+        return flare.get("flrID") or (flare.get("peakTime"), flare.get("activeRegion"))
+
+    @staticmethod
+    def _peak_epoch(flare, default):
+        try:
+            return datetime.fromisoformat(flare["peakTime"]).timestamp()
+        except (KeyError, TypeError, ValueError):
+            return default
+
+    async def poll_once(self):
+        flares = await get_donki_flares(days=self.days)
+        now = time.time()
+        if self._seen is not None:
+            new_flares = [f for f in flares if self._flare_key(f) not in self._seen]
+            if new_flares:
+                self.on_new_flares(new_flares)
+            # A day of margin: the request window starts at a date, not a time
+            horizon = now - (self.days + 1) * 86400
+            self._seen = {key: peak for key, peak in self._seen.items() if peak >= horizon}
+        else:
+            self._seen = {}
+        for flare in flares:
+            self._seen[self._flare_key(flare)] = self._peak_epoch(flare, now)
+
+    async def _run(self):
+        while True:
+            try:
+                await self.poll_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("⚠️ DONKI flare watch failed: %s", e)
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,136 @@
+# backend/wire_format.py
+"""
+Binary request/response format for high-volume prediction clients.
+
+JSON feature matrices are parsed number by number (and validated by
+pydantic), and every prediction comes back as a verbose dict - for bulk
+scoring that costs more than the models. Clients can instead send and
+receive NumPy .npy bytes (Content-Type / Accept: application/x-npy):
+
+- request: a float32 or float64 array of shape (N, n_features), or
+  (n_features,) for one row. It is decoded with np.frombuffer straight
+  over the request body - no parsing and no copy before preprocessing
+  builds its float64 working matrix
+- response: a structured array, one 10-byte record per row:
+  probability <f8, flare_class u1, confidence u1 - the codes index the
+  labels in FLARE_CLASS_LABELS / CONFIDENCE_LABELS, which are also sent
+  in the X-Flare-Class-Labels / X-Confidence-Labels headers
+
+Reading a response needs nothing but NumPy:  np.load(io.BytesIO(content))
+"""
+import functools
+import io
+import struct
+
+import numpy as np
+
+NPY_MEDIA_TYPE = "application/x-npy"
+
+FLARE_CLASS_LABELS = ("Insignificant (A/B-class)", "C-Class", "M-Class", "X-Class")
+CONFIDENCE_LABELS = ("low", "medium", "high")
+
+PREDICTION_DTYPE = np.dtype([("probability", "<f8"), ("flare_class", "u1"), ("confidence", "u1")])
+
+_MAGIC_PREFIX = b"\x93NUMPY"
+_ACCEPTED_DTYPES = (np.dtype("<f4"), np.dtype("<f8"), np.dtype(">f4"), np.dtype(">f8"))
+
+
+def is_npy(content_type):
+    return (content_type or "").split(";")[0].strip().lower() == NPY_MEDIA_TYPE
+
+
+def accepts_npy(accept):
+    return NPY_MEDIA_TYPE in (accept or "").lower()
+
+
+@functools.lru_cache(maxsize=256)
+def _parse_header(prefix):
+    """(shape, fortran_order, dtype) of an .npy magic + header; clients repeat the same few"""
+    stream = io.BytesIO(prefix)
+    version = np.lib.format.read_magic(stream)
+    if version == (1, 0):
+        return np.lib.format.read_array_header_1_0(stream)
+    if version == (2, 0):
+        return np.lib.format.read_array_header_2_0(stream)
+    raise ValueError(f"unsupported .npy version {version}")
+
+
+def decode_npy(body):
+    """
+    Zero-copy view of a float32/float64 .npy payload as an (N, n_features)
+    matrix (read-only, backed by `body`). Raises ValueError for anything
+    else - object arrays are never unpickled.
+    """
+    if len(body) < 10 or body[:6] != _MAGIC_PREFIX or body[6] not in (1, 2):
+        raise ValueError("Invalid .npy payload: bad magic string")
+    if body[6] == 1:
+        offset = 10 + struct.unpack("<H", body[8:10])[0]
+    else:
+        offset = 12 + struct.unpack("<I", body[8:12])[0]
+    try:
+        shape, fortran_order, dtype = _parse_header(bytes(body[:offset]))
+    except ValueError as e:
+        raise ValueError(f"Invalid .npy payload: {e}") from None
+    if dtype not in _ACCEPTED_DTYPES:
+        raise ValueError(f"Expected a float32 or float64 array, got dtype {dtype}")
+    if len(shape) not in (1, 2):
+        raise ValueError(f"Expected a 1-D or 2-D array, got shape {shape}")
+
+    count = int(np.prod(shape))
+    if len(body) - offset != count * dtype.itemsize:
+        raise ValueError(f"Payload holds {len(body) - offset} data bytes, shape {shape} needs {count * dtype.itemsize}")
+    matrix = np.frombuffer(body, dtype=dtype, count=count, offset=offset)
+    matrix = matrix.reshape(shape, order="F" if fortran_order else "C")
+    return matrix.reshape(1, -1) if matrix.ndim == 1 else matrix
+
+
+_UNKNOWN_CODE = np.iinfo(np.uint8).max
+
+
+def flare_class_codes(flare_classes):
+    """Label strings -> uint8 indices into FLARE_CLASS_LABELS (ValueError for any other label)"""
+    flare_classes = np.asarray(flare_classes, dtype=object)
+    codes = np.full(len(flare_classes), _UNKNOWN_CODE, dtype=np.uint8)
+    for code, label in enumerate(FLARE_CLASS_LABELS):
+        codes[flare_classes == label] = code
+    unknown = codes == _UNKNOWN_CODE
+    if unknown.any():
+        raise ValueError(f"No wire code for flare class {flare_classes[unknown][0]!r} "
+                         f"({int(unknown.sum())} rows), expected one of {FLARE_CLASS_LABELS}")
+    return codes
+
+
+def confidence_codes(probabilities):
+    """Same cut-offs as the JSON responses: > 0.6 high, > 0.3 medium, else (NaN / inf included) low"""
+    probabilities = np.asarray(probabilities)
+    codes = np.searchsorted(np.array([0.3, 0.6]), probabilities, side="left").astype(np.uint8)
+    codes[~np.isfinite(probabilities)] = 0
+    return codes
+
+
+@functools.lru_cache(maxsize=256)
+def _response_header(n_rows):
+    buffer = io.BytesIO()
+    np.lib.format.write_array_header_1_0(buffer, {
+        "descr": np.lib.format.dtype_to_descr(PREDICTION_DTYPE), "fortran_order": False, "shape": (n_rows,)})
+    return buffer.getvalue()
+
+
+def encode_predictions_npy(probabilities, flare_classes):
+    """(probabilities, flare_classes) -> .npy bytes of a PREDICTION_DTYPE array"""
+    records = np.empty(len(probabilities), dtype=PREDICTION_DTYPE)
+    records["probability"] = probabilities
+    records["flare_class"] = flare_class_codes(flare_classes)
+    records["confidence"] = confidence_codes(records["probability"])
+    return _response_header(len(records)) + records.tobytes()
+
+
+def npy_headers(model_version=None):
+    """Response headers that make an .npy prediction payload self-describing"""
+    headers = {
+        "X-Flare-Class-Labels": ",".join(FLARE_CLASS_LABELS),
+        "X-Confidence-Labels": ",".join(CONFIDENCE_LABELS),
+    }
+    if model_version:
+        headers["X-Model-Version"] = model_version
+    return headers
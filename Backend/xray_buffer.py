@@ -0,0 +1,220 @@
+# backend/xray_buffer.py
+"""
+Rolling GOES X-ray flux history kept in memory.
+
+FluxRingBuffer stores samples in two preallocated arrays (int64 epoch
+seconds, float64 flux) - no per-sample dicts are kept. XrayIngestor polls
+NOAA in the background and appends only samples newer than the last
+time_tag it has seen, so /xray-flux and /xray-flux/history are answered
+from memory with vectorized slicing and downsampling.
+"""
+import asyncio
+import logging
+import os
+import re
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 0.1-0.8 nm is the long channel that defines the flare class
+XRAY_ENERGY_BAND = os.environ.get("XRAY_ENERGY_BAND", "0.1-0.8nm")
+XRAY_BUFFER_CAPACITY = int(os.environ.get("XRAY_BUFFER_CAPACITY", 7 * 24 * 60))  # 7 days @ 1 min
+XRAY_POLL_INTERVAL = float(os.environ.get("XRAY_POLL_INTERVAL", 60))
+NOAA_XRAY_BACKFILL_URL = os.environ.get(
+    "NOAA_XRAY_BACKFILL_URL", "https://services.swpc.noaa.gov/json/goes/primary/xrays-7-day.json"
+)
+
+_RESAMPLE_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_resample(spec):
+    """'30s', '1m', '5m', '1h' -> bin width in seconds (None/'' -> None)"""
+    if not spec:
+        return None
+    match = re.fullmatch(r"(\d+)\s*([smhd])", spec.strip().lower())
+    if not match or int(match.group(1)) == 0:
+        raise ValueError(f"Invalid resample interval {spec!r}, expected e.g. '30s', '1m', '1h'")
+    return int(match.group(1)) * _RESAMPLE_UNITS[match.group(2)]
+
+
+def time_tags_to_epoch(time_tags):
+    """ISO time tags ('2024-05-14T16:46:00Z') -> int64 epoch seconds"""
+    return np.array([t.rstrip("Z") for t in time_tags], dtype="datetime64[s]").astype(np.int64)
+
+
+def epoch_to_time_tags(epochs):
+    return [t + "Z" for t in np.asarray(epochs, dtype="datetime64[s]").astype(str).tolist()]
+
+
+class FluxRingBuffer:
+    def __init__(self, capacity=XRAY_BUFFER_CAPACITY):
+        self.capacity = capacity
+        self._epoch = np.zeros(capacity, dtype=np.int64)
+        self._flux = np.zeros(capacity, dtype=np.float64)
+        self._start = 0   # index of the oldest sample
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def last_epoch(self):
+        if self._size == 0:
+            return None
+        return int(self._epoch[(self._start + self._size - 1) % self.capacity])
+
+    def append(self, epochs, fluxes):
+        """
+        Append samples (sorted by time). Anything not newer than the last
+        stored sample is ignored. Returns the number of samples added.
+        """
+        epochs = np.asarray(epochs, dtype=np.int64)
+        fluxes = np.asarray(fluxes, dtype=np.float64)
+        if self._size:
+            keep = epochs > self.last_epoch
+            epochs, fluxes = epochs[keep], fluxes[keep]
+        if len(epochs) > self.capacity:
+            epochs, fluxes = epochs[-self.capacity:], fluxes[-self.capacity:]
+        n = len(epochs)
+        if n == 0:
+            return 0
+
+        positions = (self._start + self._size + np.arange(n)) % self.capacity
+        self._epoch[positions] = epochs
+        self._flux[positions] = fluxes
+        overflow = max(0, self._size + n - self.capacity)
+        self._start = (self._start + overflow) % self.capacity
+        self._size = min(self.capacity, self._size + n)
+        return n
+
+    def snapshot(self):
+        """(epochs, fluxes) in time order (copies)"""
+        order = (self._start + np.arange(self._size)) % self.capacity
+        return self._epoch[order], self._flux[order]
+
+    def latest(self):
+        """(epoch, flux) of the newest sample, or None"""
+        if self._size == 0:
+            return None
+        i = (self._start + self._size - 1) % self.capacity
+        return int(self._epoch[i]), float(self._flux[i])
+
+    def since(self, epoch=None):
+        """Samples at or after epoch, in time order"""
+        epochs, fluxes = self.snapshot()
+        if epoch is not None:
+            first = np.searchsorted(epochs, epoch, side="left")
+            epochs, fluxes = epochs[first:], fluxes[first:]
+        return epochs, fluxes
+
+    def history(self, since=None, resample_seconds=None, agg="mean"):
+        """
+        Samples since `since` (epoch seconds), optionally downsampled into
+        fixed bins of resample_seconds. agg is 'mean' or 'max' (max keeps
+        flare peaks visible at coarse resolutions).
+        """
+        epochs, fluxes = self.since(since)
+        if not resample_seconds or len(epochs) == 0:
+            return epochs, fluxes
+
+        bins = epochs // resample_seconds
+        # bins are sorted, so each group is a contiguous run
+        starts = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])
+        if agg == "max":
+            values = np.maximum.reduceat(fluxes, starts)
+        elif agg == "mean":
+            values = np.add.reduceat(fluxes, starts) / np.diff(np.r_[starts, len(fluxes)])
+        else:
+            raise ValueError(f"Unknown aggregation {agg!r}, expected 'mean' or 'max'")
+        return bins[starts] * resample_seconds, values
+
+
+def extract_new_samples(xray_data, last_epoch, energy=XRAY_ENERGY_BAND):
+    """
+    Pull (epochs, fluxes) for one energy band out of a NOAA GOES JSON feed,
+    keeping only samples newer than last_epoch. The feed is time-ordered, so
+    parsing stops at the first sample that is already stored.
+    """
+    tags, fluxes = [], []
+    last_tag = epoch_to_time_tags([last_epoch])[0] if last_epoch is not None else None
+    for sample in reversed(xray_data):
+        tag = sample.get("time_tag")
+        if tag is None:
+            continue
+        if last_tag is not None and tag.rstrip("Z") <= last_tag.rstrip("Z"):
+            break
+        if sample.get("energy") != energy or sample.get("flux") is None:
+            continue
+        tags.append(tag)
+        fluxes.append(sample["flux"])
+    tags.reverse()
+    fluxes.reverse()
+    return time_tags_to_epoch(tags), np.array(fluxes, dtype=np.float64)
+
+
+class XrayIngestor:
+    """Background task that keeps a FluxRingBuffer up to date from NOAA"""
+
+    def __init__(self, buffer, fetch_json, latest_url, backfill_url=NOAA_XRAY_BACKFILL_URL,
+                 interval=XRAY_POLL_INTERVAL, on_new_samples=None):
+        """
+        fetch_json: async callable(url) -> parsed JSON
+        on_new_samples: optional callable(epochs, fluxes) run after each append
+        """
+        self.buffer = buffer
+        self.fetch_json = fetch_json
+        self.latest_url = latest_url
+        self.backfill_url = backfill_url
+        self.interval = interval
+        self.on_new_samples = on_new_samples
+        self.polls = 0
+        self.errors = 0
+        self.last_error = None
+        self._task = None
+
+    async def poll_once(self):
+        # First poll backfills the whole week, later polls read the short feed
+        url = self.backfill_url if len(self.buffer) == 0 else self.latest_url
+        xray_data = await self.fetch_json(url)
+        epochs, fluxes = extract_new_samples(xray_data, self.buffer.last_epoch)
+        added = self.buffer.append(epochs, fluxes)
+        self.polls += 1
+        if added and self.on_new_samples is not None:
+            self.on_new_samples(epochs[-added:], fluxes[-added:])
+        return added
+
+    async def _run(self):
+        while True:
+            try:
+                await self.poll_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                self.last_error = str(e)
+                logger.warning("⚠️ X-ray ingestion failed: %s", e)
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self):
+        latest = self.buffer.latest()
+        return {
+            "samples": len(self.buffer),
+            "capacity": self.buffer.capacity,
+            "latest_time_tag": epoch_to_time_tags([latest[0]])[0] if latest else None,
+            "polls": self.polls,
+            "errors": self.errors,
+            "last_error": self.last_error,
+        }
@@ -1,19 +1,42 @@
 import React, { useState, useEffect } from 'react';
 
+interface FluxHistory {
+  time_tag: string[];
+  flux: number[];
+  count: number;
+}
+
+// GOES 0.1-0.8nm flux spans ~1e-8 (A) to ~1e-3 (X10+); plot it on a log scale
+const LOG_FLUX_MIN = -8;
+const LOG_FLUX_MAX = -3;
+
+const fluxToPercent = (flux: number): number => {
+  const logFlux = Math.log10(Math.max(flux, 10 ** LOG_FLUX_MIN));
+  return Math.min(100, ((logFlux - LOG_FLUX_MIN) / (LOG_FLUX_MAX - LOG_FLUX_MIN)) * 100);
+};
+
 const DataStream: React.FC = () => {
   const [streamData, setStreamData] = useState<number[]>([]);
   const [currentValue, setCurrentValue] = useState(0);
 
   useEffect(() => {
-    const interval = setInterval(() => {
-      const newValue = Math.random() * 100;
-      setCurrentValue(newValue);
-      setStreamData(prev => {
-        const updated = [...prev, newValue];
-        return updated.slice(-20); // Keep last 20 values
-      });
-    }, 1000);
+    const fetchHistory = async () => {
+      try {
+        // Last 20 minutes, one point per minute, served from the backend's ring buffer
+        const since = new Date(Date.now() - 20 * 60 * 1000).toISOString().slice(0, 19);
+        const response = await fetch(`http://localhost:8000/xray-flux/history?since=${since}&resample=1m`);
+        const history: FluxHistory = await response.json();
+        if (history.count > 0) {
+          setStreamData(history.flux.slice(-20)); // Keep last 20 values
+          setCurrentValue(history.flux[history.flux.length - 1]);
+        }
+      } catch (error) {
+        console.error('❌ Error fetching X-ray flux history:', error);
+      }
+    };
 
+    fetchHistory();
+    const interval = setInterval(fetchHistory, 60000); // GOES cadence is 1 minute
     return () => clearInterval(interval);
   }, []);
 
@@ -21,7 +44,7 @@ const DataStream: React.FC = () => {
     <div className="data-stream-container">
       <h3 className="stream-title">📡 LIVE X-RAY FLUX STREAM</h3>
       <div className="stream-value">
-        <span className="value">{currentValue.toFixed(1)}</span>
+        <span className="value">{currentValue.toExponential(2)}</span>
         <span className="unit">W/m²</span>
       </div>
       <div className="stream-graph">
@@ -30,8 +53,8 @@ const DataStream: React.FC = () => {
             key={index}
             className="stream-bar"
             style={{
-              height: `${value}%`,
-              backgroundColor: value > 70 ? '#ff4444' : value > 40 ? '#ffaa00' : '#44ff44'
+              height: `${fluxToPercent(value)}%`,
+              backgroundColor: value >= 1e-4 ? '#ff4444' : value >= 1e-5 ? '#ffaa00' : '#44ff44'
             }}
           />
         ))}
@@ -40,4 +63,4 @@ const DataStream: React.FC = () => {
   );
 };
 
-export default DataStream;
\ No newline at end of file
+export default DataStream;
@@ -51,8 +51,29 @@ const SolarMonitor: React.FC = () => {
     };
 
     fetchSolarData();
-    const interval = setInterval(fetchSolarData, 30000); // Update every 30 seconds
-    return () => clearInterval(interval);
+
+    // Server push: the backend streams new X-ray samples and DONKI flares as they arrive
+    const stream = new EventSource('http://localhost:8000/stream');
+    stream.addEventListener('xray', (event) => {
+      const sample = JSON.parse((event as MessageEvent).data);
+      setXrayData(prev => ({
+        ...(prev ?? { source: 'NOAA GOES Satellite', status: 'live' }),
+        flux: sample.flux,
+        energy: sample.energy,
+        timestamp: sample.time_tag,
+      }));
+      setLastUpdate(new Date().toLocaleTimeString());
+    });
+    stream.addEventListener('flare', () => {
+      fetchSolarData();
+    });
+
+    // Slow safety refresh in case the stream is interrupted
+    const interval = setInterval(fetchSolarData, 300000);
+    return () => {
+      stream.close();
+      clearInterval(interval);
+    };
   }, []);
 
   useEffect(() => {